@@ -1,6 +1,6 @@
 from .mqtt_adapter import MQTTAdapter
 from .tasmota_adapter import TasmotaAdapter
-from .persist_adapter import PersistAdapter
+from .persist_adapter import PersistAdapter, PersistStore
 
 # tasmota = TasmotaAdapter("EUI53EF3GD")
 # mqtt = tasmota.mqtt
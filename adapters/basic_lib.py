@@ -381,9 +381,12 @@ class MathModule:
         return random.randint(0, 100)
 
 class TimeModule:
-    @staticmethod
-    def time():
-        return std_time.time()
+    def __init__(self, wall_clock=std_time.time, monotonic_clock=std_time.perf_counter):
+        self.wall_clock = wall_clock
+        self.monotonic_clock = monotonic_clock
+
+    def time(self):
+        return self.wall_clock()
 
     @staticmethod
     def dump(ts):
@@ -398,9 +401,8 @@ class TimeModule:
             'weekday': tm.tm_wday + 1  # Make Sunday=1, ..., Saturday=7
         }
 
-    @staticmethod
-    def clock():
-        return std_time.perf_counter()
+    def clock(self):
+        return self.monotonic_clock()
 
 # adapters/string_wrapper.py
 class StringModule:
@@ -0,0 +1,166 @@
+import json
+import struct
+import sys
+from array import array
+from functools import lru_cache
+from .modbus_device import ModbusDevice
+
+# struct format characters by register type and encoded width in bytes
+TYPE_FORMATS = {
+    "uint16": {2: "H", 4: "I", 8: "Q"},
+    "int16": {2: "h", 4: "i", 8: "q"},
+    "uint32": {4: "I", 8: "Q"},
+    "int32": {4: "i", 8: "q"},
+    "float32": {4: "f", 8: "d"},
+}
+
+# Source byte index for every output byte of a 4-byte value, where "ABCD" is big-endian
+BYTE_ORDERS = {
+    "ABCD": (0, 1, 2, 3),
+    "CDAB": (2, 3, 0, 1),
+    "BADC": (1, 0, 3, 2),
+    "DCBA": (3, 2, 1, 0),
+}
+
+
+@lru_cache(maxsize=None)
+def compiled_struct(format_char, count):
+    return struct.Struct(f">{count}{format_char}")
+
+
+def byte_permutation(byteorder, width):
+    """Extend a 4-byte order pattern to any even width: word order and byte order within a word."""
+    pattern = BYTE_ORDERS[byteorder]
+    words = width // 2
+    swap_words = pattern[0] >= 2
+    swap_bytes = pattern[0] % 2 == 1
+    permutation = []
+    for word in range(words):
+        source_word = words - 1 - word if swap_words else word
+        for byte in (1, 0) if swap_bytes else (0, 1):
+            permutation.append(source_word * 2 + byte)
+    return tuple(permutation)
+
+
+class RegisterCodec:
+    """Encodes engineering values into 16-bit register words for one register type, width and byte order.
+
+    The count of a register definition sets the encoded width, so a "uint16" spanning 2 registers is an
+    unsigned 32-bit value.
+    """
+
+    def __init__(self, type, count, byteorder="ABCD"):
+        width = 2 * count
+        formats = TYPE_FORMATS.get(type)
+        if formats is None:
+            raise ValueError(f"Unsupported register type: {type}")
+        if width not in formats:
+            raise ValueError(f"Unsupported register count {count} for type {type}")
+        if byteorder not in BYTE_ORDERS:
+            raise ValueError(f"Unsupported byte order: {byteorder}")
+        self.format_char = formats[width]
+        self.count = count
+        self.width = width
+        self.is_float = type == "float32"
+        permutation = byte_permutation(byteorder, width)
+        self.permutation = None if permutation == tuple(range(width)) else permutation
+
+    def encode(self, raw_values):
+        """Pack raw (unscaled) values in one call and return count words per value."""
+        packed = compiled_struct(self.format_char, len(raw_values)).pack(*raw_values)
+        packed = self._reorder(packed)
+        words = array("H", packed)
+        if sys.byteorder == "little":
+            words.byteswap()
+        return words
+
+    def decode(self, words):
+        words = array("H", words)
+        if sys.byteorder == "little":
+            words.byteswap()
+        packed = self._reorder(words.tobytes(), inverse=True)
+        return list(compiled_struct(self.format_char, len(words) // self.count).unpack(packed))
+
+    def _reorder(self, packed, inverse=False):
+        if self.permutation is None:
+            return packed
+        reordered = bytearray(len(packed))
+        width = self.width
+        # One strided slice per byte position instead of per value
+        for target, source in enumerate(self.permutation):
+            if inverse:
+                reordered[source::width] = packed[target::width]
+            else:
+                reordered[target::width] = packed[source::width]
+        return bytes(reordered)
+
+
+class DeviceProfile:
+    def __init__(self, name, registers, requests=None):
+        self.name = name
+        self.registers = registers
+        self.requests = requests or []
+        self.registers_by_name = {register["name"]: register for register in registers}
+        # Registers sharing a codec are encoded together
+        self.codec_groups = {}
+        for register in registers:
+            key = (register.get("type", "uint16"), register.get("count", 1), register.get("byteorder", "ABCD"))
+            self.codec_groups.setdefault(key, []).append(register)
+        self.codecs = {key: RegisterCodec(*key) for key in self.codec_groups}
+
+    @classmethod
+    def from_dict(cls, name, profile):
+        return cls(name, profile.get("registers", []), profile.get("requests", []))
+
+
+class ProfileDevice(ModbusDevice):
+    """A simulated Modbus device whose registers hold typed values encoded from a device profile."""
+
+    def __init__(self, name, profile, address=None, values=None):
+        super().__init__(name, profile.name, profile.name, {}, address=address)
+        self.profile = profile
+        self.values = {register["name"]: register.get("value", 0) for register in profile.registers}
+        if values:
+            self.values.update(values)
+        self.encode(profile.registers)
+
+    def set_value(self, name, value):
+        self.set_values({name: value})
+
+    def set_values(self, values):
+        self.values.update(values)
+        self.encode([self.profile.registers_by_name[name] for name in values])
+
+    def get_value(self, name):
+        register = self.profile.registers_by_name[name]
+        codec = self.profile.codecs[(register.get("type", "uint16"), register.get("count", 1), register.get("byteorder", "ABCD"))]
+        raw = codec.decode(self.registers.read(register["address"], codec.count))[0]
+        return raw * register.get("scale", 1.0)
+
+    def encode(self, registers):
+        names = {register["name"] for register in registers}
+        for key, group in self.profile.codec_groups.items():
+            group = [register for register in group if register["name"] in names]
+            if not group:
+                continue
+            codec = self.profile.codecs[key]
+            raw_values = [self.values[register["name"]] / register.get("scale", 1.0) for register in group]
+            if not codec.is_float:
+                raw_values = [int(round(value)) for value in raw_values]
+            words = codec.encode(raw_values)
+            for index, register in enumerate(group):
+                self.registers.write(register["address"], words[index * codec.count : (index + 1) * codec.count])
+
+
+def load_profiles(path):
+    with open(path, "r") as file:
+        profiles = json.load(file)
+    return {name: DeviceProfile.from_dict(name, profile) for name, profile in profiles.items()}
+
+
+def load_devices(devices_config, profiles):
+    """Build devices from a {"devices": [{"name", "type", "address"}]} config such as adapters/persist.json."""
+    return [
+        ProfileDevice(device["name"], profiles[device["type"]], address=device.get("address"), values=device.get("values"))
+        for device in devices_config.get("devices", [])
+    ]
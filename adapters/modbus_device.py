@@ -1,14 +1,18 @@
-import json
 import random
+from .register_bank import RegisterBank
 
 class ModbusDevice:
-    def __init__(self, name, manufacturer, part_number, register_table):
+    def __init__(self, name, manufacturer, part_number, register_table, address=None):
         self.name = name
         self.manufacturer = manufacturer
         self.part_number = part_number
+        # Modbus slave address; a device without one answers every address
+        self.address = address
         self.register_table = register_table
+        self.registers = RegisterBank.from_register_table(register_table)
         self.error_rate = 0
         self.is_working = True
+        self.rng = random.Random()
 
     def set_error_rate(self, error_rate):
         self.error_rate = error_rate
@@ -17,17 +21,15 @@ class ModbusDevice:
         self.is_working = is_working
 
     def get_register(self, start_address, count):
-        register_values = []
-        for offset in range(count):
-            address = str(int(start_address) + offset)
-            if address in self.register_table:
-                register_values.append(self.register_table[address]['sum'])
-            else:
-                register_values.append(0)
-        return register_values
+        return self.registers.read(int(start_address), count).tolist()
+
+    def set_register(self, address, values):
+        if isinstance(values, int):
+            values = [values]
+        self.registers.write(int(address), values)
 
     def get_response(self, device_address, function_code, start_address, count):
-        if not self.is_working or random.random() < self.error_rate:
+        if not self.is_working or self.rng.random() < self.error_rate:
             return None
 
         values = self.get_register(start_address, count)
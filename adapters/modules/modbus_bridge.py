@@ -1,12 +1,14 @@
 import json
-import threading
-import random
+from functools import partial
+from .modbus_bus import RtuBus, SERIAL_CONFIGS
+
 
 class ModbusBridge:
     def __init__(self, tasmota_adapter):
         self.tasmota_adapter = tasmota_adapter
-        self.serial_config = 0
+        self.serial_config = 3  # 8N1, the Tasmota default
         self.baudrate = 9600
+        self.bus = RtuBus(self.baudrate, self.serial_config)
         self.register_commands()
 
     def register_commands(self):
@@ -23,34 +25,43 @@ class ModbusBridge:
         count = modbus_send.get("count")
         type = modbus_send.get("type", "uint16")
 
-
-        # Simulate delayed device response
-        delay = random.uniform(0.05, 0.15)
-        threading.Timer(delay, self._send_modbus_response, args=(device_address, function_code, start_address, count, type)).start()
+        # The device answers once the request has waited for the bus and both frames have crossed the line
+        response = self._device_response(device_address, function_code, start_address, count)
+        now = self.tasmota_adapter.clock()
+        _, end = self.bus.submit(now, function_code, count, answered=response is not None)
+        if response is not None:
+            response["type"] = type
+            self.tasmota_adapter.schedule((end - now) * 1000, partial(self._send_modbus_response, response))
 
         # Immediate response
         self.tasmota_adapter.resp_cmnd_done()
 
-
-    def _send_modbus_response(self, device_address, function_code, start_address, count, type):
-        for device in self.tasmota_adapter.devices:
+    def _device_response(self, device_address, function_code, start_address, count):
+        device = self.tasmota_adapter.find_device(device_address)
+        if device is not None:
+            return device.get_response(device_address, function_code, start_address, count)
+        # Devices added without an address answer on any address not claimed by another device
+        for device in self.tasmota_adapter.unaddressed_devices:
             response = device.get_response(device_address, function_code, start_address, count)
             if response:
-                response["type"] = type
-                full_response = {"ModbusReceived": response}
-                self.tasmota_adapter.cmd_logger.debug(f'RESULT = {json.dumps(full_response)}')
-                self.tasmota_adapter.publish_result(full_response, 'RESULT', 'tele')
-                break
+                return response
+        return None
+
+    def _send_modbus_response(self, response):
+        full_response = {"ModbusReceived": response}
+        self.tasmota_adapter.cmd_logger.debug(f'RESULT = {json.dumps(full_response)}')
+        self.tasmota_adapter.publish_result(full_response, 'RESULT', 'tele')
 
     def handle_set_baudrate(self, command_payload):
         baudrate = int(command_payload)
         if 1200 <= baudrate <= 115200:
             self.baudrate = baudrate
+            self.bus.baudrate = baudrate
         return self.baudrate
 
     def handle_set_config(self, command_payload):
         config = int(command_payload)
-        valid_configs = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-        if config in valid_configs:
+        if 0 <= config < len(SERIAL_CONFIGS):
             self.serial_config = config
+            self.bus.serial_config = config
         return self.serial_config
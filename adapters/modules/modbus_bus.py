@@ -0,0 +1,86 @@
+import math
+
+# Tasmota serial configurations indexed by the ModbusConfig value: (data bits, parity, stop bits)
+SERIAL_CONFIGS = [
+    (data_bits, parity, stop_bits)
+    for parity, stop_bits in (("N", 1), ("N", 2), ("E", 1), ("E", 2), ("O", 1), ("O", 2))
+    for data_bits in (5, 6, 7, 8)
+]
+
+READ_FUNCTION_CODES = (1, 2, 3, 4)
+MAX_READ_REGISTERS = 125
+
+
+def character_bits(serial_config):
+    data_bits, parity, stop_bits = SERIAL_CONFIGS[serial_config]
+    return 1 + data_bits + (0 if parity == "N" else 1) + stop_bits
+
+
+def request_frame_bytes(function_code, count):
+    # address + function code + payload + CRC16
+    if function_code in (15, 16):
+        data_bytes = math.ceil(count / 8) if function_code == 15 else 2 * count
+        return 1 + 1 + 5 + data_bytes + 2
+    return 1 + 1 + 4 + 2
+
+
+def response_frame_bytes(function_code, count):
+    if function_code in (1, 2):
+        return 1 + 1 + 1 + math.ceil(count / 8) + 2
+    if function_code in (3, 4):
+        return 1 + 1 + 1 + 2 * count + 2
+    return 1 + 1 + 4 + 2
+
+
+class RtuBus:
+    """One simulated RS-485 line: transactions are serialized FIFO and timed from frame sizes and line settings."""
+
+    def __init__(self, baudrate=9600, serial_config=3, turnaround=0.005, response_timeout=0.2):
+        self.baudrate = baudrate
+        self.serial_config = serial_config
+        # Device processing time between the end of a request and the start of its response, in seconds
+        self.turnaround = turnaround
+        # How long the master waits for a device that does not answer, in seconds
+        self.response_timeout = response_timeout
+        self.free_at = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"transactions": 0, "timeouts": 0, "registers": 0, "busy_time": 0.0, "queue_time": 0.0}
+
+    def character_time(self):
+        return character_bits(self.serial_config) / self.baudrate
+
+    def frame_silence(self):
+        # Modbus RTU inter-frame gap: 3.5 characters, fixed at 1.75 ms above 19200 baud
+        if self.baudrate > 19200:
+            return 0.00175
+        return 3.5 * self.character_time()
+
+    def transaction_time(self, function_code, count, answered=True):
+        character_time = self.character_time()
+        duration = request_frame_bytes(function_code, count) * character_time + self.frame_silence()
+        if not answered:
+            return duration + self.response_timeout
+        return duration + self.turnaround + response_frame_bytes(function_code, count) * character_time + self.frame_silence()
+
+    def submit(self, now, function_code, count, answered=True):
+        """Queue a transaction behind the ones already on the line; returns its (start, end) times."""
+        start = max(now, self.free_at)
+        duration = self.transaction_time(function_code, count, answered)
+        self.free_at = start + duration
+        self.stats["transactions"] += 1
+        self.stats["busy_time"] += duration
+        self.stats["queue_time"] += start - now
+        if answered:
+            self.stats["registers"] += count
+        else:
+            self.stats["timeouts"] += 1
+        return start, self.free_at
+
+    def registers_per_second(self, count=MAX_READ_REGISTERS, function_code=4):
+        """Upper bound on register throughput when back-to-back reads of count registers fill the line."""
+        return count / self.transaction_time(function_code, count)
+
+    def occupancy(self, elapsed):
+        return self.stats["busy_time"] / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,144 @@
+import json
+from functools import partial
+from .modbus_bus import RtuBus
+
+# Protocol limits on the number of items a single read may request, by function code
+MAX_READ_COUNT = {1: 2000, 2: 2000, 3: 125, 4: 125}
+
+
+class BlockRead:
+    def __init__(self, deviceaddress, functioncode, startaddress, count, interval, registers=None, type="uint16"):
+        self.deviceaddress = deviceaddress
+        self.functioncode = functioncode
+        self.startaddress = startaddress
+        self.count = count
+        self.interval = interval
+        self.registers = registers or []
+        self.type = type
+
+    @property
+    def endaddress(self):
+        return self.startaddress + self.count - 1
+
+    def to_request(self):
+        """The request in the devices.json "requests" format."""
+        return {
+            "deviceaddress": self.deviceaddress,
+            "functioncode": self.functioncode,
+            "startaddress": self.startaddress,
+            "type": self.type,
+            "count": self.count,
+            "interval": self.interval,
+        }
+
+    def command(self):
+        request = self.to_request()
+        del request["interval"]
+        return f"ModbusSend {json.dumps(request)}"
+
+    def __repr__(self):
+        return f"BlockRead(fc={self.functioncode}, start={self.startaddress}, count={self.count}, interval={self.interval})"
+
+
+def plan_reads(registers, deviceaddress, max_gap=20, default_interval=60):
+    """Merge register definitions into the fewest block reads.
+
+    Registers are grouped by function code and interval, sorted by address and merged greedily while
+    the hole between two registers is at most max_gap and the block stays within the protocol limit.
+    """
+    groups = {}
+    for register in registers:
+        key = (register.get("functioncode", 4), register.get("interval", default_interval))
+        groups.setdefault(key, []).append(register)
+
+    reads = []
+    for (functioncode, interval), group in sorted(groups.items()):
+        max_count = MAX_READ_COUNT.get(functioncode, 125)
+        current = None
+        for register in sorted(group, key=lambda register: register["address"]):
+            start = register["address"]
+            end = start + register.get("count", 1) - 1
+            if end - start + 1 > max_count:
+                raise ValueError(f"Register {register['name']} spans more than {max_count} items")
+            if current is not None and start - current.endaddress - 1 <= max_gap and end - current.startaddress + 1 <= max_count:
+                current.count = max(current.endaddress, end) - current.startaddress + 1
+                current.registers.append(register["name"])
+                continue
+            current = BlockRead(deviceaddress, functioncode, start, end - start + 1, interval, [register["name"]])
+            reads.append(current)
+    return reads
+
+
+def plan_from_profile(profile, deviceaddress, max_gap=20, default_interval=60):
+    return plan_reads(profile.registers, deviceaddress, max_gap=max_gap, default_interval=default_interval)
+
+
+def reads_from_requests(requests):
+    return [
+        BlockRead(
+            request["deviceaddress"],
+            request["functioncode"],
+            request["startaddress"],
+            request["count"],
+            request.get("interval", 60),
+            type=request.get("type", "uint16"),
+        )
+        for request in requests
+    ]
+
+
+def plan_cost(reads, registers, bus=None):
+    """Transactions, bus time and coverage of a plan, normalised per hour of polling."""
+    bus = bus or RtuBus()
+    transactions_per_hour = sum(3600 / read.interval for read in reads)
+    busy_per_hour = sum(bus.transaction_time(read.functioncode, read.count) * 3600 / read.interval for read in reads)
+    registers_per_hour = sum(read.count * 3600 / read.interval for read in reads)
+    covered = [
+        register["name"]
+        for register in registers
+        if any(
+            read.functioncode == register.get("functioncode", 4)
+            and read.startaddress <= register["address"]
+            and register["address"] + register.get("count", 1) - 1 <= read.endaddress
+            for read in reads
+        )
+    ]
+    return {
+        "reads": len(reads),
+        "transactions_per_hour": transactions_per_hour,
+        "registers_per_hour": registers_per_hour,
+        "bus_seconds_per_hour": busy_per_hour,
+        "bus_occupancy": busy_per_hour / 3600,
+        "covered_registers": len(covered),
+        "missing_registers": [register["name"] for register in registers if register["name"] not in covered],
+    }
+
+
+def compare_plans(profile, deviceaddress, bus=None, max_gap=20, default_interval=60):
+    """Report the planned reads against the hand-written "requests" of a device profile."""
+    planned = plan_from_profile(profile, deviceaddress, max_gap=max_gap, default_interval=default_interval)
+    hand_written = reads_from_requests(profile.requests)
+    return {
+        "profile": profile.name,
+        "planned": plan_cost(planned, profile.registers, bus),
+        "hand_written": plan_cost(hand_written, profile.registers, bus),
+        "requests": [read.to_request() for read in planned],
+    }
+
+
+class PollingSchedule:
+    """Issues the planned reads as ModbusSend commands from the adapter scheduler."""
+
+    def __init__(self, tasmota_adapter, reads, name="modbus_poll"):
+        self.tasmota_adapter = tasmota_adapter
+        self.reads = reads
+        self.name = name
+
+    def start(self):
+        scheduler = self.tasmota_adapter.scheduler
+        first = scheduler.clock()
+        for read in self.reads:
+            scheduler.call_every(read.interval, partial(self.tasmota_adapter.cmd, read.command()), name=self.name, first=first)
+
+    def stop(self):
+        self.tasmota_adapter.scheduler.cancel(self.name)
@@ -1,15 +1,100 @@
-import re
-import fnmatch
-import logging
+class TopicNode:
+    __slots__ = ("children", "callbacks")
+
+    def __init__(self):
+        self.children = {}
+        self.callbacks = []
+
+
+class TopicTrie:
+    """Wildcard subscriptions stored level by level, so matching costs O(topic depth)."""
+
+    def __init__(self):
+        self.root = TopicNode()
+        self.filter_count = 0
+
+    def add(self, topic_filter, callback):
+        levels = topic_filter.split('/')
+        for index, level in enumerate(levels):
+            if '#' in level and (level != '#' or index != len(levels) - 1):
+                raise ValueError(f"'#' must be the last level of a topic filter: {topic_filter}")
+            if '+' in level and level != '+':
+                raise ValueError(f"'+' must occupy a whole level of a topic filter: {topic_filter}")
+        node = self.root
+        for level in levels:
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = TopicNode()
+            node = child
+        if not node.callbacks:
+            self.filter_count += 1
+        node.callbacks.append(callback)
+
+    def remove(self, topic_filter, callback=None):
+        path = [self.root]
+        levels = topic_filter.split('/')
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+        node = path[-1]
+        if not node.callbacks:
+            return False
+        if callback is None:
+            node.callbacks.clear()
+        elif callback in node.callbacks:
+            node.callbacks.remove(callback)
+        else:
+            return False
+        if not node.callbacks:
+            self.filter_count -= 1
+        # Prune nodes left without callbacks or children
+        for level, parent, child in zip(reversed(levels), reversed(path[:-1]), reversed(path[1:])):
+            if child.callbacks or child.children:
+                break
+            del parent.children[level]
+        return True
+
+    def match(self, topic):
+        callbacks = []
+        nodes = [self.root]
+        for level in topic.split('/'):
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                multi = children.get('#')
+                if multi is not None:
+                    callbacks.extend(multi.callbacks)
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                single = children.get('+')
+                if single is not None:
+                    next_nodes.append(single)
+            nodes = next_nodes
+            if not nodes:
+                return callbacks
+        for node in nodes:
+            callbacks.extend(node.callbacks)
+            # 'a/#' also matches the parent level 'a'
+            multi = node.children.get('#')
+            if multi is not None:
+                callbacks.extend(multi.callbacks)
+        return callbacks
+
+    def __len__(self):
+        return self.filter_count
+
 
 class MQTTAdapter:
     def __init__(self):
         self.subscriptions = {}
-        self.wildcard_subscriptions = {}
+        self.wildcard_subscriptions = TopicTrie()
 
     def subscribe(self, topic, callback):
         if '#' in topic or '+' in topic:
-            self.wildcard_subscriptions[topic] = callback
+            self.wildcard_subscriptions.add(topic, callback)
         else:
             if topic not in self.subscriptions:
                 self.subscriptions[topic] = []
@@ -17,13 +102,13 @@ class MQTTAdapter:
 
     def publish(self, topic, message):
         # Handle exact topic subscriptions
-        if topic in self.subscriptions:
-            for callback in self.subscriptions[topic]:
+        callbacks = self.subscriptions.get(topic)
+        if callbacks:
+            for callback in list(callbacks):
                 callback(topic, message)
         # Handle wildcard subscriptions
-        for wildcard_topic, callback in self.wildcard_subscriptions.items():
-            if self.match_wildcard_topic(wildcard_topic, topic):
-                callback(topic, message)
+        for callback in self.wildcard_subscriptions.match(topic):
+            callback(topic, message)
 
     def unsubscribe(self, topic, callback=None):
         if topic in self.subscriptions:
@@ -34,16 +119,14 @@ class MQTTAdapter:
                     del self.subscriptions[topic]
             else:
                 del self.subscriptions[topic]
-        elif topic in self.wildcard_subscriptions:
-            del self.wildcard_subscriptions[topic]
+        elif '#' in topic or '+' in topic:
+            self.wildcard_subscriptions.remove(topic, callback)
 
     def reset(self):
         self.subscriptions = {}
-        self.wildcard_subscriptions = {}
+        self.wildcard_subscriptions = TopicTrie()
 
     def match_wildcard_topic(self, wildcard_topic, topic):
-        # Convert wildcard topic to regex
-        regex_topic = re.escape(wildcard_topic)
-        regex_topic = regex_topic.replace(r'\#', '.*').replace(r'\+', '[^/]+')
-        return re.match(f'^{regex_topic}$', topic) is not None
-
+        trie = TopicTrie()
+        trie.add(wildcard_topic, None)
+        return len(trie.match(topic)) > 0
@@ -1,40 +1,280 @@
 import json
 import os
+import tempfile
+import threading
 
-class PersistAdapter:
-    def __init__(self, filename=None):
+
+class PersistStore:
+    """File backing of the persist module: persisted keys in data, plus flush settings, state and statistics."""
+
+    def __init__(self, filename=None, flush_interval=1000, journal=False, compact_threshold=256 * 1024):
         if filename is None:
             base_dir = os.path.dirname(os.path.abspath(__file__))
             self.filename = os.path.join(base_dir, "filesystem", "_persist.json")
         else:
             self.filename = filename
+        # Writes are coalesced and flushed flush_interval ms after the first change; 0 writes through
+        self.flush_interval = flush_interval
+        # With journal=True a flush appends one record per changed key to <filename>.journal instead of
+        # rewriting the file; the journal is folded back into the snapshot once it grows past compact_threshold bytes
+        self.journal = journal
+        self.compact_threshold = compact_threshold
+        # Timer hooks with the TasmotaAdapter.set_timer and remove_timer signatures; a threading.Timer is used when unset
+        self.set_timer = None
+        self.remove_timer = None
+        self.timer_name = f"persist_flush_{id(self)}"
+        self.stats = {
+            "writes": 0,
+            "flushes": 0,
+            "bytes_written": 0,
+            "flushes_avoided": 0,
+            "bytes_avoided": 0,
+            "compactions": 0,
+        }
+        self.dirty = False
+        self.pending_writes = 0
+        self._lock = threading.RLock()
+        self._flush_scheduled = False
+        self._timer = None
+        self._dirty_keys = set()
+        self._zeroed = False
+        self._journal_size = 0
+        self._compaction_thread = None
         self._ensure_directory_exists()
         self.data = self._load()
 
+    @property
+    def journal_filename(self):
+        return f"{self.filename}.journal"
+
+    @property
+    def _rotated_journal_filename(self):
+        return f"{self.filename}.journal.1"
+
     def _ensure_directory_exists(self):
         directory = os.path.dirname(self.filename)
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
 
     def _load(self):
+        data = {}
         if os.path.exists(self.filename):
             with open(self.filename, 'r') as file:
-                return json.load(file)
-        return {}
+                data = json.load(file)
+        if not self.journal:
+            return data
+        # A rotated journal only survives a crash during compaction; it is older than the live journal
+        for filename in (self._rotated_journal_filename, self.journal_filename):
+            if os.path.exists(filename):
+                self._replay(filename, data)
+        if os.path.exists(self._rotated_journal_filename):
+            self._write_atomic(self.filename, json.dumps(data))
+            for filename in (self._rotated_journal_filename, self.journal_filename):
+                os.remove(filename)
+        elif os.path.exists(self.journal_filename):
+            self._journal_size = os.path.getsize(self.journal_filename)
+        return data
+
+    def _replay(self, filename, data):
+        with open(filename, 'r') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last record can be torn by a crash mid-append
+                    break
+                if record[0] == "set":
+                    data[record[1]] = record[2]
+                elif record[0] == "del":
+                    data.pop(record[1], None)
+                elif record[0] == "zero":
+                    data.clear()
 
     def save(self):
-        with open(self.filename, 'w') as file:
-            json.dump(self.data, file)
+        self.flush(force=True)
 
-    def has(self, key):
-        return key in self.data
+    def flush(self, force=False):
+        with self._lock:
+            self._cancel_timer()
+            if not self.dirty and not force:
+                return False
+            if self.journal:
+                payload = self._journal_records()
+                if payload:
+                    self._append(self.journal_filename, payload)
+                    self._journal_size += len(payload)
+                elif not os.path.exists(self.filename):
+                    payload = json.dumps(self.data)
+                    self._write_atomic(self.filename, payload)
+            else:
+                payload = json.dumps(self.data)
+                self._write_atomic(self.filename, payload)
+            self.stats["flushes"] += 1
+            self.stats["bytes_written"] += len(payload)
+            coalesced = max(self.pending_writes - 1, 0)
+            self.stats["flushes_avoided"] += coalesced
+            if not self.journal:
+                # Every write merged into this flush would have rewritten the whole file without coalescing;
+                # journal records are not comparable, so journal mode counts avoided flushes only
+                self.stats["bytes_avoided"] += coalesced * len(payload)
+            self.dirty = False
+            self.pending_writes = 0
+            self._dirty_keys = set()
+            self._zeroed = False
+            if self.journal and self._journal_size > self.compact_threshold:
+                self.compact()
+            return True
+
+    def _journal_records(self):
+        records = [json.dumps(["zero"])] if self._zeroed else []
+        for key in self._dirty_keys:
+            if key in self.data:
+                records.append(json.dumps(["set", key, self.data[key]]))
+            else:
+                records.append(json.dumps(["del", key]))
+        return "".join(record + "\n" for record in records)
+
+    def compact(self, wait=False):
+        """Fold the journal into the snapshot file on a background thread."""
+        with self._lock:
+            if self._compaction_thread is None:
+                if os.path.exists(self.journal_filename):
+                    # New records go to a fresh journal while the rotated one is folded into the snapshot
+                    os.replace(self.journal_filename, self._rotated_journal_filename)
+                self._journal_size = 0
+                payload = json.dumps(self.data)
+                self._compaction_thread = threading.Thread(target=self._write_snapshot, args=(payload,), daemon=True)
+                self._compaction_thread.start()
+            thread = self._compaction_thread
+        if wait:
+            thread.join()
+
+    def _write_snapshot(self, payload):
+        self._write_atomic(self.filename, payload)
+        if os.path.exists(self._rotated_journal_filename):
+            os.remove(self._rotated_journal_filename)
+        with self._lock:
+            self.stats["compactions"] += 1
+            self._compaction_thread = None
+
+    def _append(self, filename, payload):
+        with open(filename, 'a') as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _write_atomic(self, filename, payload):
+        # A flush and a background compaction can write at the same time, so each write gets its own temp file
+        directory, basename = os.path.split(os.path.abspath(filename))
+        fd, temp_filename = tempfile.mkstemp(prefix=f"{basename}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(payload)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_filename, filename)
+        except BaseException:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+        self._fsync_directory(filename)
+
+    def _fsync_directory(self, filename):
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _mark_dirty(self, key=None):
+        with self._lock:
+            if key is None:
+                self._dirty_keys = set()
+                self._zeroed = True
+            else:
+                self._dirty_keys.add(key)
+            self.dirty = True
+            self.pending_writes += 1
+            self.stats["writes"] += 1
+            if self.flush_interval <= 0:
+                self.flush()
+                return
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        if self.set_timer is not None:
+            self.set_timer(self.flush_interval, self.flush, self.timer_name)
+        else:
+            timer = threading.Timer(self.flush_interval / 1000, self.flush)
+            timer.daemon = True
+            self._timer = timer
+            timer.start()
+
+    def _cancel_timer(self):
+        if self._flush_scheduled and self.set_timer is not None and self.remove_timer is not None:
+            self.remove_timer(self.timer_name)
+        self._flush_scheduled = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def set(self, key, value):
+        self.data[key] = value
+        self._mark_dirty(key)
 
     def remove(self, key):
         if key in self.data:
             del self.data[key]
+            self._mark_dirty(key)
             return True
         return False
 
+    def zero(self):
+        self.data.clear()
+        self._mark_dirty()
+
+
+class PersistAdapter:
+    """The persist module: every attribute not defined on this class reads or writes a persisted key.
+
+    Settings, statistics and flush state live on the PersistStore behind store, so keys never collide with them.
+    """
+
+    def __init__(self, filename=None, flush_interval=1000, journal=False, compact_threshold=256 * 1024):
+        object.__setattr__(self, "_store", PersistStore(filename, flush_interval, journal, compact_threshold))
+
+    @property
+    def store(self):
+        return object.__getattribute__(self, "_store")
+
+    @property
+    def filename(self):
+        return self.store.filename
+
+    @property
+    def data(self):
+        return self.store.data
+
+    def save(self):
+        self.store.save()
+
+    def flush(self, force=False):
+        return self.store.flush(force)
+
+    def compact(self, wait=False):
+        self.store.compact(wait)
+
+    def has(self, key):
+        return key in self.data
+
+    def remove(self, key):
+        return self.store.remove(key)
+
     def find(self, key, default_value=None):
         return self.data.get(key, default_value)
 
@@ -42,23 +282,21 @@ class PersistAdapter:
         return self.data.get(key, None)
 
     def setmember(self, key, value):
-        self.data[key] = value
+        self.store.set(key, value)
 
     def zero(self):
-        self.data.clear()
+        self.store.zero()
 
-    def __setattr__(self, key, value):
-        if key in ("filename", "data"):
-            super().__setattr__(key, value)
-        else:
-            self.data[key] = value
-            self.save()
+    def __getattribute__(self, key):
+        if hasattr(type(self), key):
+            return object.__getattribute__(self, key)
+        return self.data.get(key, None)
 
-    def __getattr__(self, key):
-        if key in ("filename", "data"):
-            return super().__getattr__(key)
+    def __setattr__(self, key, value):
+        if hasattr(type(self), key):
+            object.__setattr__(self, key, value)
         else:
-            return self.data.get(key, None)
+            self.store.set(key, value)
 
     def __str__(self):
         return str(self.data)
@@ -0,0 +1,82 @@
+from array import array
+from bisect import bisect_right
+
+
+class RegisterBank:
+    """16-bit registers kept in contiguous array('H') segments indexed by integer address.
+
+    Addresses closer than max_gap are stored in one segment (the gap reads as 0), so a block read
+    is a single slice; larger gaps start a new segment instead of allocating the space between.
+    """
+
+    def __init__(self, max_gap=32):
+        self.max_gap = max_gap
+        self.starts = []
+        self.segments = []
+
+    @classmethod
+    def from_register_table(cls, register_table, max_gap=32):
+        bank = cls(max_gap)
+        bank.load({int(address): register.get("sum", 0) for address, register in register_table.items()})
+        return bank
+
+    def load(self, values):
+        """Replace the bank content with an {address: value} mapping."""
+        self.starts = []
+        self.segments = []
+        for address in sorted(values):
+            value = values[address] & 0xFFFF
+            if self.segments:
+                gap = address - self.starts[-1] - len(self.segments[-1])
+                if gap <= self.max_gap:
+                    self.segments[-1].extend(array("H", bytes(2 * gap)))
+                    self.segments[-1].append(value)
+                    continue
+            self.starts.append(address)
+            self.segments.append(array("H", [value]))
+
+    def read(self, address, count):
+        index = bisect_right(self.starts, address) - 1
+        if index >= 0:
+            offset = address - self.starts[index]
+            segment = self.segments[index]
+            if offset + count <= len(segment):
+                return segment[offset : offset + count]
+        # The block spans gaps or several segments: copy each overlapping slice into a zeroed block
+        block = array("H", bytes(2 * count))
+        end = address + count
+        for start, segment in zip(self.starts[max(index, 0) :], self.segments[max(index, 0) :]):
+            if start >= end:
+                break
+            low = max(start, address)
+            high = min(start + len(segment), end)
+            if low < high:
+                block[low - address : high - address] = segment[low - start : high - start]
+        return block
+
+    def write(self, address, values):
+        values = array("H", (value & 0xFFFF for value in values))
+        end = address + len(values)
+        index = bisect_right(self.starts, address) - 1
+        if index >= 0:
+            offset = address - self.starts[index]
+            segment = self.segments[index]
+            if end <= self.starts[index] + len(segment):
+                segment[offset : offset + len(values)] = values
+                return
+        # Merge the written range with every segment it touches or comes within max_gap of
+        low = bisect_right(self.starts, address - self.max_gap - 1)
+        if low > 0 and self.starts[low - 1] + len(self.segments[low - 1]) + self.max_gap >= address:
+            low -= 1
+        high = bisect_right(self.starts, end + self.max_gap)
+        first = min([address] + self.starts[low:high])
+        last = max([end] + [start + len(segment) for start, segment in zip(self.starts[low:high], self.segments[low:high])])
+        merged = array("H", bytes(2 * (last - first)))
+        for start, segment in zip(self.starts[low:high], self.segments[low:high]):
+            merged[start - first : start - first + len(segment)] = segment
+        merged[address - first : end - first] = values
+        self.starts[low:high] = [first]
+        self.segments[low:high] = [merged]
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# 2024-01-01T00:00:00Z, the wall-clock time a simulated device boots at
+DEFAULT_EPOCH = 1704067200
+
+
+class VirtualClock:
+    """Simulated monotonic clock (in seconds) that only moves when the scheduler advances it."""
+
+    def __init__(self, epoch=DEFAULT_EPOCH):
+        self.epoch = epoch
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+    def advance_to(self, now):
+        if now > self.now:
+            self.now = now
+
+
+class ScheduledCall:
+    __slots__ = ("callback", "period", "name", "cancelled", "first", "runs")
+
+    def __init__(self, callback, period=None, name=None, first=None):
+        self.callback = callback
+        self.period = period
+        self.name = name
+        self.cancelled = False
+        self.first = first
+        self.runs = 0
+
+
+class Scheduler:
+    """Single-thread timer loop backed by a heap of absolute deadlines (in seconds).
+
+    With a VirtualClock no thread is started; time only moves through run_until(). The worker thread starts
+    with the first scheduled call; once stop() has run, calls are only queued until start() is called again.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.simulated = isinstance(clock, VirtualClock)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._named = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._stopped = False
+
+    def call_later(self, delay, callback, name=None):
+        return self.call_at(self.clock() + delay, callback, name=name)
+
+    def call_at(self, deadline, callback, name=None):
+        return self._push(deadline, ScheduledCall(callback, name=name))
+
+    def call_every(self, period, callback, name=None, first=None):
+        if period <= 0:
+            raise ValueError("period must be positive")
+        deadline = self.clock() + period if first is None else first
+        return self._push(deadline, ScheduledCall(callback, period=period, name=name, first=deadline))
+
+    def cancel(self, name):
+        with self._condition:
+            calls = self._named.pop(name, [])
+            for call in calls:
+                call.cancelled = True
+            self._condition.notify()
+        return len(calls)
+
+    def clear(self):
+        with self._condition:
+            for _, _, call in self._heap:
+                call.cancelled = True
+            self._heap.clear()
+            self._named.clear()
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return sum(1 for _, _, call in self._heap if not call.cancelled)
+
+    def next_deadline(self):
+        with self._condition:
+            self._drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        with self._condition:
+            self._stopped = False
+            if self._running or self.simulated:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="TasmotaScheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._stopped = True
+            thread = self._thread
+            self._thread = None
+            self._condition.notify()
+        self.clear()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def is_running(self):
+        return self._running
+
+    def run_pending(self, now=None):
+        """Run every call whose deadline has passed; returns the number of callbacks executed."""
+        executed = 0
+        while True:
+            call = self._pop_due(self.clock() if now is None else now)
+            if call is None:
+                return executed
+            self._execute(call)
+            executed += 1
+
+    def run_until(self, deadline):
+        """Jump the virtual clock from one due call to the next up to deadline; returns callbacks executed."""
+        if not self.simulated:
+            raise RuntimeError("run_until requires a VirtualClock")
+        executed = 0
+        while True:
+            call = self._pop_due(deadline, advance_clock=True)
+            if call is None:
+                break
+            self._execute(call)
+            executed += 1
+        self.clock.advance_to(deadline)
+        return executed
+
+    def _push(self, deadline, call):
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._sequence), call))
+            if call.name is not None:
+                self._named.setdefault(call.name, []).append(call)
+            self._condition.notify()
+        if not self._running and not self._stopped and not self.simulated:
+            self.start()
+        return call
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now, advance_clock=False):
+        with self._condition:
+            self._drop_cancelled()
+            if not self._heap or self._heap[0][0] > now:
+                return None
+            deadline, _, call = heapq.heappop(self._heap)
+            if advance_clock:
+                self.clock.advance_to(deadline)
+                now = deadline
+            if call.period is None:
+                self._forget(call)
+            else:
+                # Deadlines are first + runs * period, so rounding never accumulates; ticks missed while a
+                # callback overran are skipped, not replayed
+                call.runs += 1
+                next_deadline = call.first + call.runs * call.period
+                if next_deadline <= now:
+                    call.runs = int((now - call.first) // call.period) + 1
+                    next_deadline = call.first + call.runs * call.period
+                heapq.heappush(self._heap, (next_deadline, next(self._sequence), call))
+            return call
+
+    def _forget(self, call):
+        if call.name is None:
+            return
+        calls = self._named.get(call.name)
+        if calls is not None and call in calls:
+            calls.remove(call)
+            if not calls:
+                del self._named[call.name]
+
+    def _execute(self, call):
+        try:
+            call.callback()
+        except Exception as e:
+            self.logger.error(f"Error in scheduled callback {call.name or call.callback}: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                self._drop_cancelled()
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                timeout = self._heap[0][0] - self.clock()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+            self.run_pending()
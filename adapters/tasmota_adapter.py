@@ -1,10 +1,12 @@
-import threading
 import json
 import os
 import requests
 import logging
+import random
+import time
 from .mqtt_adapter import MQTTAdapter
 from .persist_adapter import PersistAdapter
+from .scheduler import Scheduler, VirtualClock
 from .modules.modbus_bridge import ModbusBridge
 
 from .file_redirect import custom_open
@@ -31,11 +33,24 @@ from .basic_lib import (
     custom_compile,
 )
 
+TICK_MS = 50
+
+# Driver callbacks fired by the scheduler and their periods in milliseconds
+PERIODIC_CALLBACKS = (
+    ("every_50ms", 50),
+    ("every_100ms", 100),
+    ("every_250ms", 250),
+    ("every_second", 1000),
+)
+
 
 class TasmotaAdapter:
-    def __init__(self, EUI):
+    def __init__(self, EUI, simulated=False, seed=None):
         self.EUI = EUI
+        self.simulated = simulated
         self.devices = []
+        self.devices_by_address = {}
+        self.unaddressed_devices = []
         self.mqtt = MQTTAdapter()
         self.persist = PersistAdapter()
         self.heap = 1024 * 64  # Example heap size
@@ -47,6 +62,17 @@ class TasmotaAdapter:
         self.running = False
         self.commands = {}
         self.current_command = None
+        if simulated:
+            # Simulated time owns the clock and is reproducible: the random source is seeded too
+            self.clock = VirtualClock()
+            self.time_module = custom_time(self.clock.time, self.clock)
+            self.rng = random.Random(0 if seed is None else seed)
+        else:
+            self.clock = time.monotonic
+            self.time_module = custom_time()
+            self.rng = random.Random(seed)
+        self.scheduler = Scheduler(self.clock)
+        self.boot_time = self.clock()
 
         # Create the filesystem directory if it doesn't exist
         if not os.path.exists("./filesystem"):
@@ -58,6 +84,17 @@ class TasmotaAdapter:
         # Initialize command modules
         self.command_modules = {"ModbusBridge": ModbusBridge(self)}
 
+    @property
+    def persist(self):
+        return self._persist
+
+    @persist.setter
+    def persist(self, persist):
+        # Debounced persist flushes run on the adapter scheduler, so they follow simulated time too
+        persist.store.set_timer = self.schedule
+        persist.store.remove_timer = self.remove_timer
+        self._persist = persist
+
     def handle_mqtt_message(self, topic, message):
         for driver in self.drivers:
             if hasattr(driver, "mqtt_data"):
@@ -67,9 +104,20 @@ class TasmotaAdapter:
         self.commands[command_name] = handler
 
     def add_device(self, device):
+        address = getattr(device, "address", None)
+        if address is None:
+            self.unaddressed_devices.append(device)
+        elif address in self.devices_by_address:
+            raise ValueError(f"Modbus address {address} is already used by {self.devices_by_address[address].name}")
+        else:
+            self.devices_by_address[address] = device
+        device.rng = self.rng
         self.devices.append(device)
         self.logger.debug(f"Device added: {device}")
 
+    def find_device(self, address):
+        return self.devices_by_address.get(address)
+
     def get_free_heap(self):
         return self.heap
 
@@ -199,11 +247,29 @@ class TasmotaAdapter:
         return True
 
     def set_timer(self, delay, callback, timer_name=None):
-        def timer_callback():
-            if self.running:
-                threading.Timer(delay / 1000, callback).start()
+        if self.running:
+            self.schedule(delay, callback, timer_name)
 
-        timer_callback()
+    def schedule(self, delay, callback, timer_name=None):
+        """set_timer for the adapter's own timers, such as modbus responses and persist flushes, which also run before start()."""
+        self.scheduler.call_later(delay / 1000, callback, name=timer_name)
+
+    def remove_timer(self, timer_name):
+        removed = self.scheduler.cancel(timer_name)
+        self.logger.debug(f"Removed {removed} timer(s) with name: {timer_name}")
+
+    def millis(self, offset: int = 0) -> int:
+        return int((self.clock() - self.boot_time) * 1000) + offset
+
+    def time_reached(self, timer: int) -> bool:
+        return self.millis() >= timer
+
+    def advance(self, duration_ms):
+        """Let duration_ms of device time pass: instantly in simulated mode, in real time otherwise."""
+        if self.simulated:
+            self.scheduler.run_until(self.clock() + duration_ms / 1000)
+        else:
+            time.sleep(duration_ms / 1000)
 
     def stop(self):
         self.logger.debug("Stopping TasmotaAdapter")
@@ -211,40 +277,34 @@ class TasmotaAdapter:
             if hasattr(driver, "save_before_restart"):
                 driver.save_before_restart()
         self.running = False
+        self.scheduler.stop()
         self.persist.save()
 
+    def dispatch_driver_callback(self, method_name):
+        for driver in list(self.drivers):
+            callback = getattr(driver, method_name, None)
+            if callback is not None:
+                # One failing driver must not skip the others or the rest of the tick
+                try:
+                    callback()
+                except Exception as e:
+                    self.logger.error(f"Error in {type(driver).__name__}.{method_name}: {e}")
+
     def run_periodic_callbacks(self):
         if not self.running:
             return
 
-        def every_50ms():
-            for driver in self.drivers:
-                if hasattr(driver, "every_50ms"):
-                    driver.every_50ms()
-            self.set_timer(50, every_50ms)
-
-        def every_100ms():
-            for driver in self.drivers:
-                if hasattr(driver, "every_100ms"):
-                    driver.every_100ms()
-            self.set_timer(100, every_100ms)
-
-        def every_250ms():
-            for driver in self.drivers:
-                if hasattr(driver, "every_250ms"):
-                    driver.every_250ms()
-            self.set_timer(250, every_250ms)
-
-        def every_second():
-            for driver in self.drivers:
-                if hasattr(driver, "every_second"):
-                    driver.every_second()
-            self.set_timer(1000, every_second)
-
-        every_50ms()
-        every_100ms()
-        every_250ms()
-        every_second()
+        # One 50ms base tick on an absolute grid drives every periodic callback, like the Tasmota main loop
+        self.tick_count = 0
+        self.scheduler.call_every(TICK_MS / 1000, self.run_tick, first=self.scheduler.clock())
+
+    def run_tick(self):
+        # The tick is counted before dispatching, so a raising driver callback cannot replay it
+        tick = self.tick_count
+        self.tick_count += 1
+        for method_name, period in PERIODIC_CALLBACKS:
+            if tick % (period // TICK_MS) == 0:
+                self.dispatch_driver_callback(method_name)
 
     def button_pressed(self):
         for driver in self.drivers:
@@ -267,7 +327,7 @@ class TasmotaAdapter:
                         "open": custom_open,
                         "json": custom_json,
                         "math": custom_math,
-                        "time": custom_time,
+                        "time": self.time_module,
                         "List": List,
                         "Map": Map,
                         "Range": Range,
@@ -291,6 +351,8 @@ class TasmotaAdapter:
     def start(self, autoexec_path=None):
         self.running = True
         self.logger.debug("Starting TasmotaAdapter")
+        # After a stop() the scheduler no longer starts itself; calls queued meanwhile run from here
+        self.scheduler.start()
         self.run_periodic_callbacks()
         self.run_autoexec(autoexec_path=autoexec_path)
 
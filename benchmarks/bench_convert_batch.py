@@ -0,0 +1,63 @@
+"""Wall time of convert_batch over a generated tree of driver files for increasing worker counts.
+
+Usage: python benchmarks/bench_convert_batch.py [--files N] [--functions N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from convert_batch import collect_inputs, convert_all  # noqa: E402
+
+DRIVER_TEMPLATE = '''
+class Driver{index}:
+    def __init__(self):
+        self.value = 0
+        self.name = "driver {index}"
+
+{methods}
+'''
+
+METHOD_TEMPLATE = """    def step_{index}(self, value):
+        if value > {index}:
+            self.value = self.value + value * 2
+        else:
+            self.value = self.value - 1
+        return self.value
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=40, help="methods per generated file")
+    args = parser.parse_args()
+
+    methods = "\n".join(METHOD_TEMPLATE.format(index=index) for index in range(args.functions))
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(args.files):
+            with open(os.path.join(directory, f"driver_{index:03d}.py"), "w") as file:
+                file.write(DRIVER_TEMPLATE.format(index=index, methods=methods))
+        input_files = collect_inputs([directory])
+
+        print(f"{len(input_files)} files, {args.functions} methods each, no cache")
+        baseline = None
+        jobs = 1
+        while jobs <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                convert_all(input_files, jobs, None)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"jobs {jobs:3d}: {elapsed:7.2f} s  speedup {baseline / elapsed:5.2f}x")
+            jobs *= 2
+
+
+if __name__ == "__main__":
+    main()
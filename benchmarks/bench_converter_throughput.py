@@ -0,0 +1,75 @@
+"""Converter throughput in AST nodes per second on a synthetic driver corpus, checked against a stored baseline.
+
+Usage: python benchmarks/bench_converter_throughput.py [--lines N] [--repeat N] [--tolerance F] [--update-baseline]
+
+Exits with status 1 when throughput falls more than the tolerance below the baseline. Baselines are
+machine specific; record one with --update-baseline on the machine that runs the check.
+"""
+
+import argparse
+import ast
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from berry_converter import PythonToBerryConverter  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "converter_throughput.json")
+
+
+def measure(source, repeat):
+    nodes = sum(1 for _ in ast.walk(ast.parse(source)))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        PythonToBerryConverter().convert(source)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {"nodes": nodes, "seconds": best, "nodes_per_second": nodes / best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional drop below the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    source = generate_corpus(args.lines)
+    result = measure(source, args.repeat)
+    print(f"{len(source.splitlines())} lines, {result['nodes']} nodes")
+    print(f"best of {args.repeat}: {result['seconds'] * 1000:.1f} ms, {result['nodes_per_second']:.0f} nodes/s")
+
+    if args.update_baseline:
+        baseline = {"lines": args.lines, "nodes_per_second": round(result["nodes_per_second"]), "python": platform.python_version()}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=4)
+            file.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print("no baseline stored, run with --update-baseline")
+        return 0
+
+    ratio = result["nodes_per_second"] / baseline["nodes_per_second"]
+    print(f"baseline: {baseline['nodes_per_second']} nodes/s, current is {ratio:.2f}x")
+    if ratio < 1 - args.tolerance:
+        print(f"REGRESSION: throughput dropped more than {args.tolerance:.0%} below the baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Dynamic member and global lookups in loops before and after loop-invariant hoisting, on sample drivers.
+
+Usage: python benchmarks/bench_loop_hoisting.py [paths ...] [--lines N] [--loop-iterations N]
+
+Lookups are counted in the transformed tree: every self.member and module global read inside a loop,
+weighted by the iterations of each enclosing loop. Loops of unknown length are assumed to run
+--loop-iterations times, as in berry_analyzer.
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from berry_analyzer import DEFAULT_LOOP_ITERATIONS, CostEstimator  # noqa: E402
+from berry_converter import PythonToBerryConverter  # noqa: E402
+from berry_passes import module_bindings  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SAMPLE_DRIVER = '''import json
+import string
+
+SCALE = 10
+REGISTERS = ["voltage", "current", "power", "energy", "frequency", "power_factor"]
+
+
+class Meter:
+    def __init__(self):
+        self.json_response = {}
+        self.offsets = {}
+        self.history = []
+        self.topic = "tele/meter/SENSOR"
+
+    def parse(self, values):
+        for index in range(len(REGISTERS)):
+            name = REGISTERS[index]
+            self.json_response[name] = (values[index] + self.offsets[name]) / SCALE
+
+    def publish(self):
+        payload = []
+        for name in self.json_response.keys():
+            payload.append(string.format("\\"%s\\":%s", name, self.json_response[name]))
+        mqtt.publish(self.topic, "{" + ",".join(payload) + "}")
+
+    def average(self):
+        total = 0
+        index = 0
+        while index < len(self.history):
+            total += self.history[index]
+            index += 1
+        return total / SCALE
+'''
+
+
+def loop_lookups(tree, loop_iterations):
+    """Member and global reads in loops, each weighted by the iterations of its enclosing loops."""
+    globals_ = module_bindings(tree)
+    estimator = CostEstimator({}, loop_iterations)
+    total = 0
+
+    def count(node, weight, local_names):
+        nonlocal total
+        if isinstance(node, (ast.For, ast.While)):
+            iterations = estimator.range_length(node.iter) if isinstance(node, ast.For) else None
+            inner = weight * (loop_iterations if iterations is None else iterations)
+            if isinstance(node, ast.For):
+                count(node.iter, weight, local_names)
+            else:
+                count(node.test, inner, local_names)
+            for statement in node.body:
+                count(statement, inner, local_names)
+            return
+        if weight > 1:
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "self" and isinstance(node.ctx, ast.Load):
+                total += weight
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in globals_ and node.id not in local_names:
+                total += weight
+        for child in ast.iter_child_nodes(node):
+            count(child, weight, local_names)
+
+    for function in ast.walk(tree):
+        if isinstance(function, ast.FunctionDef):
+            local_names = estimator.local_names(function)
+            for statement in function.body:
+                count(statement, 1, local_names)
+    return total
+
+
+def measure(source, loop_iterations, hoist, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        converter = PythonToBerryConverter(hoist_invariants=hoist)
+        start = time.perf_counter()
+        converter.convert(source)
+        timings.append(time.perf_counter() - start)
+    tree = PythonToBerryConverter(hoist_invariants=hoist).transform(ast.parse(source))
+    return loop_lookups(tree, loop_iterations), converter.optimization_report, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="driver sources (default: the built-in sample, autoexec_template.py and a generated corpus)")
+    parser.add_argument("--lines", type=int, default=2000, help="size of the generated corpus")
+    parser.add_argument("--loop-iterations", type=int, default=DEFAULT_LOOP_ITERATIONS)
+    args = parser.parse_args()
+
+    if args.paths:
+        samples = []
+        for path in args.paths:
+            with open(path, "r") as file:
+                samples.append((path, file.read()))
+    else:
+        with open(os.path.join(ROOT, "autoexec_template.py"), "r") as file:
+            template = file.read()
+        samples = [("sample meter", SAMPLE_DRIVER), ("autoexec_template.py", template), (f"corpus ({args.lines} lines)", generate_corpus(args.lines))]
+
+    print(f"{'source':<28} {'hoists':>7} {'lookups before':>15} {'after':>10} {'removed':>9} {'convert time':>13}")
+    for name, source in samples:
+        before, _, plain_seconds = measure(source, args.loop_iterations, hoist=False)
+        after, report, hoist_seconds = measure(source, args.loop_iterations, hoist=True)
+        hoists = sum(1 for entry in report if entry["kind"] == "hoist")
+        removed = f"{(before - after) / before:.0%}" if before else "-"
+        print(f"{name:<28} {hoists:>7} {before:>15} {after:>10} {removed:>9} {hoist_seconds / plain_seconds:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
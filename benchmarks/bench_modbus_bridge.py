@@ -0,0 +1,58 @@
+"""ModbusSend throughput with many addressed devices on one simulated bus.
+
+Usage: python benchmarks/bench_modbus_bridge.py [--devices N] [--commands N] [--baudrate N]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adapters.device_profiles import load_profiles, load_devices  # noqa: E402
+from adapters.tasmota_adapter import TasmotaAdapter  # noqa: E402
+
+DEVICES_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "autoexec", "filesystem", "devices.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--commands", type=int, default=10_000)
+    parser.add_argument("--baudrate", type=int, default=9600)
+    args = parser.parse_args()
+
+    profiles = load_profiles(DEVICES_JSON)
+    config = {"devices": [{"name": f"Inverter {address}", "type": "SOLIS_4G", "address": address} for address in range(1, args.devices + 1)]}
+    tasmota = TasmotaAdapter("EUI_BENCH", simulated=True)
+    for device in load_devices(config, profiles):
+        tasmota.add_device(device)
+    tasmota.cmd(f"ModbusBaudrate {args.baudrate}")
+    bus = tasmota.command_modules["ModbusBridge"].bus
+
+    responses = [0]
+    tasmota.mqtt.subscribe(f"tele/{tasmota.EUI}/RESULT", lambda topic, message: responses.__setitem__(0, responses[0] + 1))
+    commands = [
+        f'ModbusSend {{"deviceaddress": {index % args.devices + 1}, "functioncode": 4, "startaddress": 3005, "count": 40}}'
+        for index in range(args.commands)
+    ]
+
+    threads_before = threading.active_count()
+    start = time.perf_counter()
+    for command in commands:
+        tasmota.cmd(command)
+    submitted = time.perf_counter() - start
+    tasmota.advance((bus.free_at - tasmota.clock()) * 1000 + 1)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.commands} ModbusSend commands, {args.devices} devices, {args.baudrate} baud")
+    print(f"submit:    {args.commands / submitted:10.0f} commands/s (wall)")
+    print(f"end to end:{args.commands / elapsed:10.0f} commands/s (wall), {responses[0]} responses")
+    print(f"bus time:  {bus.free_at:10.1f} s simulated, {bus.stats['registers'] / bus.free_at:.0f} registers/s on the line")
+    print(f"threads:   {threading.active_count() - threads_before:10d} extra")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Register throughput limits of the simulated RTU bus for common line settings and block sizes.
+
+Usage: python benchmarks/bench_modbus_bus.py [--serial-config N]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adapters.modules.modbus_bus import RtuBus, SERIAL_CONFIGS  # noqa: E402
+
+BAUDRATES = (2400, 4800, 9600, 19200, 38400, 115200)
+BLOCK_SIZES = (1, 10, 40, 125)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serial-config", type=int, default=3, help="ModbusConfig index (3 = 8N1)")
+    args = parser.parse_args()
+
+    data_bits, parity, stop_bits = SERIAL_CONFIGS[args.serial_config]
+    print(f"registers/s for back-to-back function code 4 reads, {data_bits}{parity}{stop_bits}")
+    print(f"{'baudrate':>9}" + "".join(f"{f'{count} regs':>12}" for count in BLOCK_SIZES) + f"{'ms/40 regs':>12}")
+    for baudrate in BAUDRATES:
+        bus = RtuBus(baudrate, args.serial_config)
+        row = "".join(f"{bus.registers_per_second(count):>12.0f}" for count in BLOCK_SIZES)
+        print(f"{baudrate:>9}{row}{bus.transaction_time(4, 40) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Wildcard matching cost: topic trie against the previous regex-per-subscription scan.
+
+Usage: python benchmarks/bench_mqtt.py [--subscriptions N] [--publishes N] [--legacy-publishes N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adapters.mqtt_adapter import MQTTAdapter  # noqa: E402
+
+
+class LegacyMQTTAdapter:
+    """The previous implementation: a regex is rebuilt for every wildcard subscription on every publish."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.wildcard_subscriptions = {}
+
+    def subscribe(self, topic, callback):
+        if '#' in topic or '+' in topic:
+            self.wildcard_subscriptions[topic] = callback
+        else:
+            self.subscriptions.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, message):
+        for callback in self.subscriptions.get(topic, ()):
+            callback(topic, message)
+        for wildcard_topic, callback in self.wildcard_subscriptions.items():
+            regex_topic = re.escape(wildcard_topic).replace(r'\#', '.*').replace(r'\+', '[^/]+')
+            if re.match(f'^{regex_topic}$', topic) is not None:
+                callback(topic, message)
+
+
+def build_workload(subscription_count, topic_count, seed=1):
+    rng = random.Random(seed)
+    devices = [f"EUI{index:05d}" for index in range(subscription_count // 4 or 1)]
+    subtopics = ["RESULT", "SENSOR", "STATE", "LWT", "modbussend", "monitoring", "config", "interval"]
+    filters = ["#"]
+    while len(filters) < subscription_count:
+        device = rng.choice(devices)
+        shape = rng.random()
+        if shape < 0.5:
+            filters.append(f"tele/{device}/{rng.choice(subtopics)}")
+        elif shape < 0.8:
+            filters.append(f"+/{device}/{rng.choice(subtopics)}")
+        else:
+            filters.append(f"{rng.choice(['tele', 'stat', 'cmnd'])}/{device}/#")
+    topics = [f"{rng.choice(['tele', 'stat', 'cmnd'])}/{rng.choice(devices)}/{rng.choice(subtopics)}" for _ in range(topic_count)]
+    return filters, topics
+
+
+def measure(adapter_class, filters, topics, publishes):
+    adapter = adapter_class()
+    delivered = [0]
+
+    def callback(topic, message):
+        delivered[0] += 1
+
+    for topic_filter in filters:
+        adapter.subscribe(topic_filter, callback)
+    start = time.perf_counter()
+    for index in range(publishes):
+        adapter.publish(topics[index % len(topics)], "payload")
+    elapsed = time.perf_counter() - start
+    return elapsed, delivered[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscriptions", type=int, default=10_000)
+    parser.add_argument("--publishes", type=int, default=1_000_000)
+    parser.add_argument("--legacy-publishes", type=int, default=200, help="the legacy scan is extrapolated from this sample")
+    args = parser.parse_args()
+
+    filters, topics = build_workload(args.subscriptions, 4096)
+    wildcards = sum(1 for topic_filter in filters if '#' in topic_filter or '+' in topic_filter)
+    print(f"{args.subscriptions} subscriptions ({wildcards} wildcard), {args.publishes} publishes")
+
+    trie_time, trie_delivered = measure(MQTTAdapter, filters, topics, args.publishes)
+    legacy_time, legacy_delivered = measure(LegacyMQTTAdapter, filters, topics, args.legacy_publishes)
+    legacy_per_publish = legacy_time / args.legacy_publishes
+    trie_per_publish = trie_time / args.publishes
+
+    print(f"trie:   {trie_time:8.2f} s total, {trie_per_publish * 1e6:10.2f} us/publish, {trie_delivered} deliveries")
+    print(
+        f"legacy: {legacy_per_publish * args.publishes:8.2f} s total (extrapolated), "
+        f"{legacy_per_publish * 1e6:10.2f} us/publish"
+    )
+    print(f"speedup: {legacy_per_publish / trie_per_publish:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
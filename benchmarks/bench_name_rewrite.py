@@ -0,0 +1,98 @@
+"""Cost of the name_changes step: textual replacement versus the AST NameRewriter pass.
+
+Usage: python benchmarks/bench_name_rewrite.py [--methods N] [--repeat N]
+
+The rename step is timed on its own: five str.replace calls before parsing against NameRewriter on an
+already parsed tree, with and without the source text that lets it skip a module spelling no mapped name.
+Whole conversions are timed too, with TextualConverter running every other pass exactly as the converter does.
+"""
+
+import argparse
+import ast
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from berry_converter import PythonToBerryConverter  # noqa: E402
+from berry_passes import DEFAULT_NAME_CHANGES, NameRewriter  # noqa: E402
+
+METHOD_TEMPLATE = """    def update_{index}(self, payload):
+        floating_value = None
+        if payload is not None:
+            data = json.loads(payload)
+            floating_value = float(data)
+            self.valid = True
+        else:
+            self.valid = False
+        self.message = "None of True or False {index}"
+        return floating_value
+"""
+
+
+def textual_replace(source_code):
+    for old_name, new_name in DEFAULT_NAME_CHANGES.items():
+        source_code = source_code.replace(old_name, new_name)
+    return source_code
+
+
+class TextualConverter(PythonToBerryConverter):
+    """The converter as it was: whole-buffer replacements before parsing, and no NameRewriter."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.name_changes = {}
+
+    def convert(self, source_code, source_map=None):
+        return super().convert(textual_replace(source_code), source_map=source_map)
+
+
+def best_of(repeat, function, setup=lambda: None):
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = "class Driver:\n" + "\n".join(METHOD_TEMPLATE.format(index=index) for index in range(args.methods))
+    # A driver spelling none of the mapped names
+    plain = textual_replace(source).replace("realing_value", "value").replace("json.load", "decode").replace("real(", "scale(")
+    print(f"{len(source.splitlines())} lines, {len(source) / 1024:.0f} KiB")
+
+    def parsed(code):
+        return lambda: ast.parse(code)
+
+    print("rename step only:")
+    for label, code in (("mapped names on every method", source), ("no mapped names", plain)):
+        textual = best_of(args.repeat, lambda _: textual_replace(code))
+        gc.disable()
+        full_walk = best_of(args.repeat, lambda tree: NameRewriter().visit(tree), parsed(code))
+        with_source = best_of(args.repeat, lambda tree: NameRewriter(source_code=code).visit(tree), parsed(code))
+        gc.enable()
+        print(f"  {label}:")
+        print(f"    textual replace:          {textual * 1000:8.1f} ms")
+        print(f"    NameRewriter, every node: {full_walk * 1000:8.1f} ms")
+        print(f"    NameRewriter, source:     {with_source * 1000:8.1f} ms")
+
+    textual = best_of(args.repeat, lambda _: TextualConverter().convert(source))
+    rewriter = best_of(args.repeat, lambda _: PythonToBerryConverter().convert(source))
+    print(f"whole conversion: textual {textual * 1000:.1f} ms, NameRewriter {rewriter * 1000:.1f} ms ({textual / rewriter:.2f}x)")
+
+    output = PythonToBerryConverter().convert(source)
+    corrupted = TextualConverter().convert(source).count("realing_value")
+    print(f"identifiers corrupted by textual replace: {corrupted}, by NameRewriter: {output.count('realing_value')}")
+
+
+if __name__ == "__main__":
+    main()
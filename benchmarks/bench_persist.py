@@ -0,0 +1,59 @@
+"""Single-key updates on a large persist store: full JSON rewrite against the append-only journal.
+
+Usage: python benchmarks/bench_persist.py [--keys N] [--updates N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adapters.persist_adapter import PersistAdapter  # noqa: E402
+
+
+def run(directory, keys, updates, journal):
+    filename = os.path.join(directory, "journal.json" if journal else "snapshot.json")
+    persist = PersistAdapter(filename, flush_interval=0, journal=journal)
+    for index in range(keys):
+        persist.data[f"key{index}"] = {"value": index, "unit": "Wh"}
+    persist.save()
+    if journal:
+        persist.compact(wait=True)
+
+    rng = random.Random(1)
+    bytes_before = persist.store.stats["bytes_written"]
+    start = time.perf_counter()
+    for _ in range(updates):
+        # flush_interval=0: every update reaches the disk before the next one
+        persist.setmember(f"key{rng.randrange(keys)}", {"value": rng.random(), "unit": "Wh"})
+    elapsed = time.perf_counter() - start
+    if journal:
+        persist.compact(wait=True)
+
+    reloaded = PersistAdapter(filename, journal=journal)
+    assert reloaded.data == persist.data
+    return elapsed, persist.store.stats["bytes_written"] - bytes_before, persist.store.stats["compactions"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--updates", type=int, default=1_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.keys} keys, {args.updates} single-key updates, one flush per update")
+        for label, journal in (("json.dump rewrite", False), ("journal", True)):
+            elapsed, written, compactions = run(directory, args.keys, args.updates, journal)
+            print(
+                f"{label:<18} {elapsed:8.3f} s  {elapsed / args.updates * 1e6:10.1f} us/update  "
+                f"{written / 1024:10.1f} KiB written  {compactions} compaction(s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Planned block reads against the hand-written "requests" of every profile in devices.json.
+
+Usage: python benchmarks/bench_polling_plan.py [--devices PATH] [--baudrate N] [--max-gap N]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adapters.device_profiles import load_profiles  # noqa: E402
+from adapters.modules.modbus_bus import RtuBus  # noqa: E402
+from adapters.modules.modbus_planner import compare_plans  # noqa: E402
+
+DEFAULT_DEVICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "autoexec", "filesystem", "devices.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", default=DEFAULT_DEVICES)
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--serial-config", type=int, default=3)
+    parser.add_argument("--max-gap", type=int, default=20)
+    parser.add_argument("--address", type=int, default=1)
+    args = parser.parse_args()
+
+    bus = RtuBus(args.baudrate, args.serial_config)
+    for profile in load_profiles(args.devices).values():
+        report = compare_plans(profile, args.address, bus=bus, max_gap=args.max_gap)
+        print(f"{profile.name} @ {args.baudrate} baud")
+        print(f"  {'':<14}{'reads':>8}{'tx/hour':>10}{'regs/hour':>12}{'bus s/hour':>12}{'occupancy':>11}  missing")
+        for label in ("hand_written", "planned"):
+            cost = report[label]
+            print(
+                f"  {label:<14}{cost['reads']:>8}{cost['transactions_per_hour']:>10.0f}{cost['registers_per_hour']:>12.0f}"
+                f"{cost['bus_seconds_per_hour']:>12.2f}{cost['bus_occupancy']:>10.3%}  {', '.join(cost['missing_registers']) or '-'}"
+            )
+        print("  planned requests:")
+        for request in report["requests"]:
+            print(f"    {json.dumps(request)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Compare the heap scheduler against the legacy Timer-per-tick loop.
+
+Usage: python benchmarks/bench_scheduler.py [--duration SECONDS]
+
+Tick timing is reported against the absolute 50 ms grid started by the first tick. Interval stdev alone
+favours the legacy loop: it re-arms after each callback, so every interval carries the same delay and the
+error piles up as drift, while the heap scheduler pulls each tick back onto the grid, which makes the
+interval after a late wake-up shorter. Its intervals then vary by about sqrt(2) times the wake-up jitter,
+but lateness stays bounded by that jitter instead of growing with every tick.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from adapters.tasmota_adapter import TasmotaAdapter  # noqa: E402
+
+
+class LegacyTasmotaAdapter(TasmotaAdapter):
+    """Reproduces the previous implementation: one threading.Timer per tick, re-armed after the callbacks ran."""
+
+    def set_timer(self, delay, callback, timer_name=None):
+        if self.running:
+            threading.Timer(delay / 1000, callback).start()
+
+    def run_periodic_callbacks(self):
+        if not self.running:
+            return
+
+        def make_tick(method_name, period):
+            def tick():
+                self.dispatch_driver_callback(method_name)
+                self.set_timer(period, tick)
+
+            return tick
+
+        for method_name, period in (("every_50ms", 50), ("every_100ms", 100), ("every_250ms", 250), ("every_second", 1000)):
+            make_tick(method_name, period)()
+
+    def stop(self):
+        self.running = False
+
+
+class TickRecorder:
+    def __init__(self, work_seconds):
+        self.work_seconds = work_seconds
+        self.ticks_50ms = []
+
+    def every_50ms(self):
+        self.ticks_50ms.append(time.monotonic())
+        # Simulate driver work so that drift from re-arming after the callback becomes visible
+        deadline = time.perf_counter() + self.work_seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    def every_100ms(self):
+        pass
+
+    def every_250ms(self):
+        pass
+
+    def every_second(self):
+        pass
+
+
+def count_thread_starts():
+    counter = {"started": 0}
+    original_start = threading.Thread.start
+
+    def counting_start(thread):
+        counter["started"] += 1
+        return original_start(thread)
+
+    threading.Thread.start = counting_start
+    return counter, lambda: setattr(threading.Thread, "start", original_start)
+
+
+def run(adapter_class, duration, work_seconds):
+    tasmota = adapter_class("EUI_BENCH")
+    recorder = TickRecorder(work_seconds)
+    tasmota.add_driver(recorder)
+
+    counter, restore = count_thread_starts()
+    peak_threads = threading.active_count()
+    cpu_start = time.process_time()
+    tasmota.running = True
+    tasmota.run_periodic_callbacks()
+    start = time.monotonic()
+    while time.monotonic() - start < duration:
+        peak_threads = max(peak_threads, threading.active_count())
+        time.sleep(0.005)
+    tasmota.stop()
+    cpu = time.process_time() - cpu_start
+    restore()
+
+    ticks = recorder.ticks_50ms
+    intervals = [(b - a) * 1000 for a, b in zip(ticks, ticks[1:])]
+    drift = (ticks[-1] - ticks[0]) * 1000 - 50 * (len(ticks) - 1)
+    lateness = [(tick - ticks[0]) * 1000 - 50 * index for index, tick in enumerate(ticks)]
+    return {
+        "threads_started_per_s": counter["started"] / duration,
+        "peak_threads": peak_threads,
+        "cpu_percent": 100 * cpu / duration,
+        "ticks_50ms": len(ticks),
+        "interval_mean_ms": statistics.mean(intervals),
+        "interval_stdev_ms": statistics.pstdev(intervals),
+        "drift_ms": drift,
+        "grid_lateness_stdev_ms": statistics.pstdev(lateness),
+        "grid_lateness_max_ms": max(lateness),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--work-ms", type=float, default=2.0, help="busy time spent in each every_50ms callback")
+    args = parser.parse_args()
+
+    results = {
+        "legacy Timer-per-tick": run(LegacyTasmotaAdapter, args.duration, args.work_ms / 1000),
+        "heap scheduler": run(TasmotaAdapter, args.duration, args.work_ms / 1000),
+    }
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'metric':<24}" + "".join(f"{name:>24}" for name in results))
+    for metric in metrics:
+        print(f"{metric:<24}" + "".join(f"{result[metric]:>24.2f}" for result in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Synthetic driver sources in the style of autoexec/autoexec.py, for converter benchmarks."""
+
+MODULE_HEADER = """import json
+import string
+
+MAX_RETRIES = 3
+POLL_INTERVAL = 60
+"""
+
+CLASS_HEADER = '''
+class Driver{index}:
+    name = None
+    retries = 0
+    values = None
+
+    def __init__(self, name):
+        self.name = name
+        self.retries = 0
+        self.values = {{}}
+        self.history = []
+        tasmota.add_driver(self)
+        tasmota.set_timer(POLL_INTERVAL * 1000, self.poll_{index}_0, "poll_{index}")
+'''
+
+METHOD_TEMPLATES = (
+    '''
+    def poll_{index}_{method}(self):
+        request = {{"deviceaddress": {index}, "functioncode": 4, "startaddress": {method} * 10, "count": 40}}
+        tasmota.cmd("ModbusSend " + json.dumps(request))
+        self.retries += 1
+        if self.retries > MAX_RETRIES:
+            print(f"Driver {{self.name}} gave up after {{self.retries}} retries")
+            self.retries = 0
+''',
+    '''
+    def parse_{index}_{method}(self, payload: str):
+        try:
+            data = json.loads(payload)
+        except Exception as error:
+            print("Invalid payload: ", error)
+            return None
+        if "ModbusReceived" in data:
+            values = data["ModbusReceived"]["Values"]
+            total = 0
+            index = 0
+            while index < len(values):
+                total = total + values[index] * {method} - (index % 7) * 2
+                index += 1
+            self.values["block_{method}"] = total / (len(values) + 1)
+        elif data is not None:
+            self.history.append(data)
+        else:
+            return False
+        return True
+''',
+    '''
+    def report_{index}_{method}(self):
+        keys = self.values.keys()
+        for key in self.values.keys():
+            value = self.values[key]
+            if value is not None and value > {method}.5:
+                mqtt.publish(string.format("tele/driver_{index}/%s", key), str(value))
+        status = "ok" if self.retries == 0 else "retrying"
+        return f"Driver {{self.name}} {{status}} with {{len(keys)}} values"
+''',
+)
+
+
+def generate_corpus(lines=10_000, methods_per_class=12):
+    """A deterministic source of at least the given number of lines."""
+    parts = [MODULE_HEADER]
+    total = MODULE_HEADER.count("\n")
+    index = 0
+    while total < lines:
+        part = CLASS_HEADER.format(index=index)
+        for method in range(methods_per_class):
+            part += METHOD_TEMPLATES[method % len(METHOD_TEMPLATES)].format(index=index, method=method)
+        part += f'\n\ndriver_{index} = Driver{index}("driver {index}")\n'
+        parts.append(part)
+        total += part.count("\n")
+        index += 1
+    return "".join(parts)
@@ -0,0 +1,315 @@
+import argparse
+import ast
+import json
+import sys
+from berry_converter import PythonToBerryConverter
+
+REPORT_VERSION = 1
+
+# Callbacks the Tasmota runtime calls periodically or per message, with the budget each gets by default
+DEFAULT_BUDGETS = {
+    "every_50ms": {"instructions": 500, "allocations": 2},
+    "every_100ms": {"instructions": 1000, "allocations": 4},
+    "every_250ms": {"instructions": 2500, "allocations": 10},
+    "every_second": {"instructions": 10000, "allocations": 40},
+    "mqtt_data": {"instructions": 5000, "allocations": 40},
+}
+
+# Iterations assumed for a loop whose trip count is not known at conversion time
+DEFAULT_LOOP_ITERATIONS = 10
+LOOP_OVERHEAD = 2  # Compare and jump back per iteration
+
+ALLOCATION_KINDS = ("list", "map", "string", "closure", "object")
+CONSTRUCTORS = {"list": "list", "dict": "map", "map": "map", "bytes": "object", "str": "string", "tostring": "string"}
+
+
+class Cost:
+    __slots__ = ("instructions", "allocations", "loop_depth")
+
+    def __init__(self, instructions=0):
+        self.instructions = instructions
+        self.allocations = dict.fromkeys(ALLOCATION_KINDS, 0)
+        self.loop_depth = 0
+
+    def add(self, other, times=1):
+        self.instructions += other.instructions * times
+        for kind, count in other.allocations.items():
+            self.allocations[kind] += count * times
+        self.loop_depth = max(self.loop_depth, other.loop_depth)
+        return self
+
+    def allocate(self, kind, count=1):
+        self.allocations[kind] += count
+
+    def to_dict(self):
+        allocations = dict(self.allocations, total=sum(self.allocations.values()))
+        return {"instructions": self.instructions, "allocations": allocations, "max_loop_depth": self.loop_depth}
+
+
+class CostEstimator:
+    """Rough Berry VM cost of a method: about one instruction per operation, with loops multiplied out.
+
+    Loads of locals are free (they live in registers), globals, members and constants cost one load.
+    Calls to other methods of the same class are charged with the callee's cost.
+    """
+
+    def __init__(self, methods, loop_iterations=DEFAULT_LOOP_ITERATIONS):
+        self.methods = methods
+        self.loop_iterations = loop_iterations
+        self.memo = {}
+        self.active = set()
+        self.calls = {}
+
+    def method_cost(self, name):
+        if name in self.memo:
+            return self.memo[name]
+        if name in self.active:
+            # Recursion: charge the call only
+            return Cost(1)
+        self.active.add(name)
+        node = self.methods[name]
+        self.locals = self.local_names(node)
+        self.calls[name] = []
+        self.current = name
+        cost = self.statements(node.body)
+        self.active.discard(name)
+        self.memo[name] = cost
+        return cost
+
+    def local_names(self, node):
+        names = {arg.arg for arg in node.args.args + node.args.kwonlyargs}
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+                names.add(child.id)
+        return names
+
+    def statements(self, statements):
+        cost = Cost()
+        for statement in statements:
+            cost.add(self.statement(statement))
+        return cost
+
+    def statement(self, node):
+        if isinstance(node, ast.If):
+            cost = self.expression(node.test)
+            cost.instructions += 1
+            body, orelse = self.statements(node.body), self.statements(node.orelse)
+            # Worst case: the more expensive branch
+            return cost.add(body if body.instructions >= orelse.instructions else orelse)
+        if isinstance(node, (ast.For, ast.While)):
+            return self.loop(node)
+        if isinstance(node, ast.Try):
+            cost = self.statements(node.body)
+            cost.instructions += 2
+            return cost.add(self.statements(node.finalbody))
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            cost = Cost(1)
+            cost.allocate("closure" if isinstance(node, ast.FunctionDef) else "object")
+            return cost
+        cost = Cost(1 if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Return)) else 0)
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                cost.add(self.expression(child))
+        return cost
+
+    def loop(self, node):
+        if isinstance(node, ast.For):
+            cost = self.expression(node.iter)
+            iterations = self.range_length(node.iter)
+        else:
+            cost = Cost()
+            iterations = None
+        iterations = self.loop_iterations if iterations is None else iterations
+        body = self.statements(node.body)
+        if isinstance(node, ast.While):
+            body.add(self.expression(node.test))
+        body.instructions += LOOP_OVERHEAD
+        body.loop_depth += 1
+        return cost.add(body, iterations)
+
+    def range_length(self, node):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range"):
+            return None
+        try:
+            bounds = [ast.literal_eval(arg) for arg in node.args]
+            return len(range(*bounds))
+        except (ValueError, TypeError):
+            return None
+
+    def expression(self, node):
+        cost = Cost()
+        if isinstance(node, ast.Name):
+            cost.instructions += 0 if node.id in self.locals else 1
+            return cost
+        if isinstance(node, ast.Constant):
+            cost.instructions += 1
+            return cost
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            cost.allocate("list")
+        elif isinstance(node, ast.Dict):
+            cost.allocate("map")
+        elif isinstance(node, ast.JoinedStr):
+            cost.allocate("string")
+            cost.instructions += 2  # string.format lookup and call
+        elif isinstance(node, ast.Lambda):
+            cost.allocate("closure")
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add) and self.is_string(node):
+            cost.allocate("string")
+        elif isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            return self.comprehension(node)
+        elif isinstance(node, ast.Call):
+            self.call(node, cost)
+
+        if not isinstance(node, (ast.Lambda, ast.FormattedValue)):
+            cost.instructions += 1
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                cost.add(self.expression(child))
+        return cost
+
+    def call(self, node, cost):
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "self" and func.attr in self.methods:
+            caller, caller_locals = self.current, self.locals
+            self.calls[caller].append(func.attr)
+            cost.add(self.method_cost(func.attr))
+            self.current, self.locals = caller, caller_locals
+        elif isinstance(func, ast.Name):
+            if func.id in CONSTRUCTORS:
+                cost.allocate(CONSTRUCTORS[func.id])
+            elif func.id[:1].isupper():
+                cost.allocate("object")
+
+    def comprehension(self, node):
+        cost = Cost(1)
+        cost.allocate("map" if isinstance(node, ast.DictComp) else "list")
+        element = Cost()
+        for part in (node.key, node.value) if isinstance(node, ast.DictComp) else (node.elt,):
+            element.add(self.expression(part))
+        iterations = 1
+        for generator in node.generators:
+            cost.add(self.expression(generator.iter))
+            length = self.range_length(generator.iter)
+            iterations *= self.loop_iterations if length is None else length
+            for condition in generator.ifs:
+                element.add(self.expression(condition))
+        element.instructions += LOOP_OVERHEAD + 1  # push
+        element.loop_depth = len(node.generators)
+        return cost.add(element, iterations)
+
+    def is_string(self, node):
+        return any(isinstance(child, (ast.JoinedStr,)) or (isinstance(child, ast.Constant) and isinstance(child.value, str)) for child in (node.left, node.right))
+
+
+def analyze_tree(tree, budgets=None, loop_iterations=DEFAULT_LOOP_ITERATIONS):
+    """Cost entries for every budgeted callback of every class in a module."""
+    budgets = DEFAULT_BUDGETS if budgets is None else budgets
+    classes = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ClassDef):
+            continue
+        methods = {member.name: member for member in node.body if isinstance(member, ast.FunctionDef)}
+        estimator = CostEstimator(methods, loop_iterations)
+        callbacks = []
+        for name, method in methods.items():
+            if name not in budgets:
+                continue
+            entry = {"name": name, "line": method.lineno, **estimator.method_cost(name).to_dict()}
+            entry["calls"] = sorted(set(estimator.calls.get(name, [])))
+            entry["budget"] = budgets[name]
+            entry["over_budget"] = [
+                metric
+                for metric, limit in budgets[name].items()
+                if (entry["allocations"]["total"] if metric == "allocations" else entry.get(metric, 0)) > limit
+            ]
+            callbacks.append(entry)
+        if callbacks:
+            classes.append({"class": node.name, "line": node.lineno, "callbacks": callbacks})
+    return classes
+
+
+def analyze_source(source_code, budgets=None, loop_iterations=DEFAULT_LOOP_ITERATIONS, **options):
+    """Analyze source the way it would be converted, so optimization passes are reflected in the estimate."""
+    tree = PythonToBerryConverter(**options).transform(ast.parse(source_code), source_code)
+    return analyze_tree(tree, budgets, loop_iterations)
+
+
+def build_report(files, budgets=None, loop_iterations=DEFAULT_LOOP_ITERATIONS, **options):
+    report = {"version": REPORT_VERSION, "loop_iterations": loop_iterations, "files": []}
+    for path in files:
+        with open(path, "r") as file:
+            classes = analyze_source(file.read(), budgets, loop_iterations, **options)
+        report["files"].append({"file": path, "classes": classes})
+    callbacks = [callback for entry in report["files"] for cls in entry["classes"] for callback in cls["callbacks"]]
+    report["summary"] = {"callbacks": len(callbacks), "over_budget": sum(1 for callback in callbacks if callback["over_budget"])}
+    return report
+
+
+def parse_budget(text):
+    """"every_50ms=400" or "every_50ms=400:2" (instructions[:allocations])."""
+    name, _, limits = text.partition("=")
+    if not name or not limits:
+        raise argparse.ArgumentTypeError(f"Invalid budget: {text}")
+    instructions, _, allocations = limits.partition(":")
+    budget = {"instructions": int(instructions)}
+    if allocations:
+        budget["allocations"] = int(allocations)
+    return name, budget
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate per-callback Berry instruction and allocation cost of driver classes.")
+    parser.add_argument("input_files", nargs="+")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--budgets", help="JSON file of {callback: {instructions, allocations}} replacing the defaults")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[], help="override one callback, e.g. every_50ms=400:2")
+    parser.add_argument("--loop-iterations", type=int, default=DEFAULT_LOOP_ITERATIONS, help="iterations assumed for loops of unknown length")
+    parser.add_argument("--minify", action="store_true", help="analyze the code with shortened locals")
+    parser.add_argument("--fold-constants", action="store_true", help="analyze the constant-folded code")
+    parser.add_argument("--hoist-invariants", action="store_true", help="analyze the code with loop invariants hoisted")
+    parser.add_argument("--concat-strings", action="store_true", help="analyze the code with loop-grown strings joined once")
+    parser.add_argument(
+        "--pool-strings", type=int, nargs="?", const=2, default=0, metavar="N", help="analyze the code with string literals pooled (default N: 2)"
+    )
+    parser.add_argument("--fail-over-budget", action="store_true", help="exit with status 1 when any callback is over budget")
+    args = parser.parse_args(argv)
+
+    budgets = {name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()}
+    if args.budgets:
+        with open(args.budgets, "r") as file:
+            budgets = json.load(file)
+    for name, budget in args.budget:
+        budgets.setdefault(name, {}).update(budget)
+
+    report = build_report(
+        args.input_files,
+        budgets,
+        args.loop_iterations,
+        minify=args.minify,
+        fold_constants=args.fold_constants,
+        pool_strings=args.pool_strings,
+        hoist_invariants=args.hoist_invariants,
+        concat_strings=args.concat_strings,
+    )
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    for entry in report["files"]:
+        for cls in entry["classes"]:
+            for callback in cls["callbacks"]:
+                if callback["over_budget"]:
+                    print(
+                        f"{entry['file']}:{callback['line']}: {cls['class']}.{callback['name']} over budget "
+                        f"({', '.join(callback['over_budget'])}): {callback['instructions']} instructions, "
+                        f"{callback['allocations']['total']} allocations",
+                        file=sys.stderr,
+                    )
+    return 1 if args.fail_over_budget and report["summary"]["over_budget"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
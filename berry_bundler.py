@@ -0,0 +1,384 @@
+import argparse
+import ast
+import os
+import sys
+from berry_converter import PythonToBerryConverter, format_sizes
+from berry_passes import dotted_name
+from berry_sourcemap import SourceMap, map_path
+
+# Driver methods the Tasmota runtime calls by name; they are kept even though no Python code calls them
+DRIVER_CALLBACKS = frozenset(
+    {
+        "every_50ms",
+        "every_100ms",
+        "every_250ms",
+        "every_second",
+        "mqtt_data",
+        "save_before_restart",
+        "button_pressed",
+        "any_key",
+        "display",
+        "json_append",
+        "web_sensor",
+        "web_add_handler",
+        "web_add_button",
+        "web_add_main_button",
+        "web_add_management_button",
+        "web_add_config_button",
+        "web_add_console_button",
+        "set_power_handler",
+    }
+)
+
+
+def is_main_guard(node):
+    """if __name__ == "__main__":"""
+    return (
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+        and len(node.test.comparators) == 1
+        and isinstance(node.test.comparators[0], ast.Constant)
+        and node.test.comparators[0].value == "__main__"
+    )
+
+
+def is_pure(node):
+    """An expression without calls, whose definition can be dropped when nothing reads it."""
+    return not any(isinstance(child, (ast.Call, ast.Lambda, ast.Await, ast.Yield, ast.NamedExpr)) for child in ast.walk(node))
+
+
+def definition_name(statement):
+    if isinstance(statement, (ast.ClassDef, ast.FunctionDef)):
+        return statement.name
+    if (
+        isinstance(statement, ast.Assign)
+        and len(statement.targets) == 1
+        and isinstance(statement.targets[0], ast.Name)
+        and is_pure(statement.value)
+    ):
+        return statement.targets[0].id
+    return None
+
+
+def is_kept_method(name):
+    return name in DRIVER_CALLBACKS or (name.startswith("__") and name.endswith("__"))
+
+
+class Module:
+    def __init__(self, name, path, tree):
+        self.name = name
+        self.path = path
+        self.tree = tree
+        self.module_aliases = {}  # Dotted name bound by "import x.y [as z]" -> bundled module name
+        self.name_aliases = {}  # Local name bound by "from x import a as b" -> original name
+
+
+def function_bindings(node):
+    """Names a function or lambda binds locally: its parameters and the names it assigns, imports or defines."""
+    arguments = node.args
+    names = {arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+    names.update(arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None)
+    declared = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, (ast.Store, ast.Del)):
+            names.add(child.id)
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.add(child.name)
+        elif isinstance(child, ast.alias):
+            names.add((child.asname or child.name).split(".")[0])
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and child is not node:
+            names.add(child.name)
+        elif isinstance(child, (ast.Global, ast.Nonlocal)):
+            declared.update(child.names)
+    return names - declared
+
+
+class ModuleReferenceRewriter(ast.NodeTransformer):
+    """Turns module.attribute references to bundled modules and aliased imports into plain names.
+
+    Names a function rebinds, such as a parameter or local with the alias's name, are left alone in that function.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.shadowed = set()
+
+    def visit_FunctionDef(self, node):
+        # Decorators and defaults are evaluated in the enclosing scope
+        node.decorator_list = [self.visit(decorator) for decorator in node.decorator_list]
+        node.args.defaults = [self.visit(default) for default in node.args.defaults]
+        node.args.kw_defaults = [default if default is None else self.visit(default) for default in node.args.kw_defaults]
+        enclosing = self.shadowed
+        self.shadowed = enclosing | function_bindings(node)
+        node.body = [self.visit(statement) for statement in node.body]
+        self.shadowed = enclosing
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        node.args.defaults = [self.visit(default) for default in node.args.defaults]
+        enclosing = self.shadowed
+        self.shadowed = enclosing | function_bindings(node)
+        node.body = self.visit(node.body)
+        self.shadowed = enclosing
+        return node
+
+    def visit_Attribute(self, node):
+        name = dotted_name(node)
+        if name is not None and name.split(".")[0] not in self.shadowed:
+            # Longest alias first, so "import a.b" wins over "import a"
+            for alias in sorted(self.module.module_aliases, key=len, reverse=True):
+                if name.startswith(f"{alias}."):
+                    parts = name[len(alias) + 1 :].split(".")
+                    replacement = ast.Name(id=parts[0], ctx=ast.Load() if len(parts) > 1 else node.ctx)
+                    for index, part in enumerate(parts[1:], start=2):
+                        replacement = ast.Attribute(value=replacement, attr=part, ctx=node.ctx if index == len(parts) else ast.Load())
+                    return ast.copy_location(replacement, node)
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        original = self.module.name_aliases.get(node.id)
+        if original is not None and original != node.id and node.id not in self.shadowed:
+            return ast.copy_location(ast.Name(id=original, ctx=node.ctx), node)
+        return node
+
+
+class Bundler:
+    """Resolves the local imports of an entry module and merges the reachable code into one module.
+
+    Imported modules come before the modules importing them. Classes, functions and pure assignments no
+    reachable code refers to are dropped, as are methods never accessed as an attribute, except driver
+    callbacks and dunder methods. Names only looked up by string at runtime are not seen and must be
+    referenced from code to survive.
+    """
+
+    def __init__(self, entry_path, search_paths=None):
+        self.entry_path = os.path.abspath(entry_path)
+        self.root = os.path.dirname(self.entry_path)
+        self.search_paths = [os.path.abspath(path) for path in search_paths or [self.root]]
+        self.modules = {}
+        self.bundled_imports = set()  # ids of import statements resolved to bundled modules
+        self.kept = []
+        self.dropped = []
+
+    def resolve(self, module_name):
+        parts = module_name.split(".")
+        for base in self.search_paths:
+            candidate = os.path.join(base, *parts)
+            if os.path.isfile(f"{candidate}.py"):
+                return f"{candidate}.py"
+            if os.path.isfile(os.path.join(candidate, "__init__.py")):
+                return os.path.join(candidate, "__init__.py")
+        return None
+
+    def load(self, name, path, importing=()):
+        if name in self.modules:
+            return
+        if name in importing:
+            raise ValueError(f"Circular import: {' -> '.join(importing + (name,))}")
+        with open(path, "r") as file:
+            tree = ast.parse(file.read(), filename=path)
+        module = Module(name, path, tree)
+        package = name if path.endswith("__init__.py") else name.rpartition(".")[0]
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    dependency = self.resolve(alias.name)
+                    if dependency is None:
+                        continue
+                    self.load(alias.name, dependency, importing + (name,))
+                    module.module_aliases[alias.asname or alias.name] = alias.name
+                    self.bundled_imports.add(id(node))
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    prefix = package.rsplit(".", node.level - 1)[0] if node.level > 1 else package
+                    base = f"{prefix}.{base}".strip(".")
+                for alias in node.names:
+                    submodule = self.resolve(f"{base}.{alias.name}") if alias.name != "*" else None
+                    if submodule is not None:
+                        self.load(f"{base}.{alias.name}", submodule, importing + (name,))
+                        module.module_aliases[alias.asname or alias.name] = f"{base}.{alias.name}"
+                        self.bundled_imports.add(id(node))
+                        continue
+                    dependency = self.resolve(base)
+                    if dependency is None:
+                        continue
+                    self.load(base, dependency, importing + (name,))
+                    self.bundled_imports.add(id(node))
+                    if alias.name == "*":
+                        for statement in self.modules[base].tree.body:
+                            defined = definition_name(statement)
+                            if defined and not defined.startswith("_"):
+                                module.name_aliases.setdefault(defined, defined)
+                    else:
+                        module.name_aliases[alias.asname or alias.name] = alias.name
+        self.modules[name] = module
+
+    def merged_statements(self):
+        entry = os.path.splitext(os.path.basename(self.entry_path))[0]
+        self.load(entry, self.entry_path)
+        statements = []
+        owners = {}
+        for module in self.modules.values():
+            source_file = os.path.relpath(module.path, self.root)
+            tree = ModuleReferenceRewriter(module).visit(module.tree)
+            for statement in tree.body:
+                if id(statement) in self.bundled_imports:
+                    continue
+                if is_main_guard(statement):
+                    # Only the entry module runs as __main__; imported modules run their else branch
+                    body = statement.body if module.name == entry else statement.orelse
+                else:
+                    body = [statement]
+                for child in body:
+                    defined = definition_name(child)
+                    if defined is not None:
+                        if defined in owners and owners[defined] != module.name:
+                            raise ValueError(f"{defined} is defined in both {owners[defined]} and {module.name}")
+                        owners[defined] = module.name
+                    child.source_file = source_file
+                    child.module_name = module.name
+                    statements.append(child)
+        return statements
+
+    def shake(self, statements):
+        """Keep what the top-level statements can reach; returns the statements in their original order."""
+        definitions = {}
+        roots = []
+        for statement in statements:
+            name = definition_name(statement)
+            if name is None:
+                roots.append(statement)
+            else:
+                # A later definition of the same name wins, as it does at import time
+                definitions.setdefault(name, []).append(statement)
+
+        names, attributes = set(), set()
+
+        def scan(node):
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name):
+                    names.add(child.id)
+                elif isinstance(child, ast.Attribute):
+                    attributes.add(child.attr)
+
+        reachable = set()
+        kept_methods = {}
+        for statement in roots:
+            scan(statement)
+        changed = True
+        while changed:
+            changed = False
+            for name in list(names):
+                if name in definitions and name not in reachable:
+                    reachable.add(name)
+                    changed = True
+                    for statement in definitions[name]:
+                        if isinstance(statement, ast.ClassDef):
+                            kept_methods[id(statement)] = set()
+                            for part in statement.bases + statement.keywords + statement.decorator_list:
+                                scan(part)
+                            for member in statement.body:
+                                if not isinstance(member, ast.FunctionDef):
+                                    scan(member)
+                        else:
+                            scan(statement)
+            for name in reachable:
+                for statement in definitions[name]:
+                    if not isinstance(statement, ast.ClassDef):
+                        continue
+                    kept = kept_methods[id(statement)]
+                    for member in statement.body:
+                        if isinstance(member, ast.FunctionDef) and member.name not in kept:
+                            if member.name in attributes or is_kept_method(member.name):
+                                kept.add(member.name)
+                                scan(member)
+                                changed = True
+
+        result = []
+        for statement in statements:
+            name = definition_name(statement)
+            label = f"{statement.module_name}.{name}"
+            if name is not None and name not in reachable:
+                self.dropped.append(label)
+                continue
+            if isinstance(statement, ast.ClassDef):
+                kept = kept_methods[id(statement)]
+                body = []
+                for member in statement.body:
+                    if isinstance(member, ast.FunctionDef) and member.name not in kept:
+                        self.dropped.append(f"{label}.{member.name}")
+                    else:
+                        body.append(member)
+                statement.body = body or [ast.Pass()]
+            if name is not None:
+                self.kept.append(label)
+            result.append(statement)
+        return result
+
+    def bundle(self):
+        """The merged, tree-shaken module."""
+        module = ast.Module(body=self.shake(self.merged_statements()), type_ignores=[])
+        return ast.fix_missing_locations(module)
+
+
+def bundle_to_file(entry_path, output_path=None, source_map=True, search_paths=None, **options):
+    """Bundle entry_path and its local imports into one Berry file; returns (output path, bundler)."""
+    bundler = Bundler(entry_path, search_paths)
+    tree = bundler.bundle()
+    output_path = output_path or os.path.splitext(entry_path)[0] + ".bundle.be"
+    berry_map = SourceMap(os.path.basename(output_path), [os.path.basename(entry_path)]) if source_map else None
+    with open(output_path, "w") as file:
+        PythonToBerryConverter(**options).convert_tree_to_stream(tree, file, source_map=berry_map)
+    if berry_map is not None:
+        with open(map_path(output_path), "w") as file:
+            file.write(berry_map.dumps())
+    return output_path, bundler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bundle an entry module and its local imports into one Berry file.")
+    parser.add_argument("entry", help="entry Python module, e.g. autoexec/autoexec.py")
+    parser.add_argument("-o", "--output", help="output file (default: <entry>.bundle.be)")
+    parser.add_argument("-I", "--search-path", action="append", help="directory to resolve imports from (default: the entry's directory)")
+    parser.add_argument("--minify", action="store_true", help="strip indentation, shorten locals and drop redundant parentheses")
+    parser.add_argument("--fold-constants", action="store_true", help="fold constant expressions and drop dead branches")
+    parser.add_argument("--hoist-invariants", action="store_true", help="read loop-invariant members and globals once before each loop")
+    parser.add_argument("--concat-strings", action="store_true", help="build strings grown with += in loops from a list joined once")
+    parser.add_argument(
+        "--pool-strings", type=int, nargs="?", const=2, default=0, metavar="N", help="share string literals used by N or more functions (default N: 2)"
+    )
+    parser.add_argument("--no-source-map", action="store_true", help="do not write <output>.map next to the bundle")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.entry):
+        print(f"Error: {args.entry} does not exist.", file=sys.stderr)
+        return 2
+    options = {
+        "minify": args.minify,
+        "fold_constants": args.fold_constants,
+        "pool_strings": args.pool_strings,
+        "hoist_invariants": args.hoist_invariants,
+        "concat_strings": args.concat_strings,
+    }
+    output_path, bundler = bundle_to_file(args.entry, args.output, not args.no_source_map, args.search_path, **options)
+
+    separate = 0
+    for module in bundler.modules.values():
+        with open(module.path, "r") as file:
+            separate += len(PythonToBerryConverter(**options).convert(file.read()).encode())
+    print(f"Bundled {len(bundler.modules)} module(s) into {output_path}")
+    for label in bundler.dropped:
+        print(f"  dropped {label}")
+    print(f"Kept {len(bundler.kept)} definition(s), dropped {len(bundler.dropped)}")
+    print(f"Size: separate files {format_sizes(separate, os.path.getsize(output_path))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,153 @@
 import ast
+import gc
+import hashlib
+import io
+import json
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+from berry_passes import (
+    DEFAULT_NAME_CHANGES,
+    NameRewriter,
+    LocalRenamer,
+    ConstantFolder,
+    StringPooler,
+    ComprehensionLowerer,
+    LoopInvariantHoister,
+    StringAccumulationRewriter,
+    may_have_comprehensions,
+)
+from berry_sourcemap import SourceMap, map_path
+
+DEFAULT_CACHE_DIR = ".berry_cache"
+
+# Source files whose content determines the generated code; editing any of them invalidates the cache
+CONVERTER_MODULES = (
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "berry_passes.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "berry_sourcemap.py"),
+)
+
+
+@contextmanager
+def paused_gc():
+    # Parsing allocates one object per node; pausing the cyclic collector keeps it from rescanning the growing tree
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class BerryEmitter:
+    """Writes generated lines to a file-like sink as they are produced.
+
+    Lines are held in a buffer of at most buffer_lines before being written, so memory does not grow with
+    the output size.
+    """
+
+    def __init__(self, sink, buffer_lines=64, source_map=None):
+        self.sink = sink
+        self.buffer_lines = buffer_lines
+        self.source_map = source_map
+        self.buffer = []
+        self.lines = 0
+        self.written = 0
+
+    def emit(self, line, origin=None):
+        """Add a line; origin is the (source, line) it was generated from, recorded in the source map."""
+        self.buffer.append(line)
+        if len(self.buffer) >= self.buffer_lines:
+            self.flush()
+        self.lines += 1
+        if self.source_map is not None:
+            self.source_map.add(self.lines, *(origin or (None, None)))
+
+    def flush(self):
+        if not self.buffer:
+            return
+        # Lines are newline separated, without a trailing newline
+        text = "\n".join(self.buffer)
+        self.sink.write(f"\n{text}" if self.written else text)
+        self.written += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+
+
+# Berry spelling of Python operator nodes, looked up by node type
+OPERATORS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.LShift: "<<",
+    ast.RShift: ">>",
+    ast.NotEq: "!=",
+    ast.Eq: "==",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.And: "and",
+    ast.Or: "or",
+    ast.Not: "not",
+    ast.BitOr: "|",
+    ast.BitXor: "^",
+    ast.BitAnd: "&",
+    ast.FloorDiv: "//",
+    ast.IsNot: "!=",
+    ast.USub: "-",
+    ast.UAdd: "+",
+    ast.Invert: "~",
+}
+
+# Binding strength of Berry operators, used to drop redundant parentheses when minifying
+PRECEDENCE = {
+    ast.Or: 1,
+    ast.And: 2,
+    ast.Eq: 3,
+    ast.NotEq: 3,
+    ast.IsNot: 3,
+    ast.Is: 3,
+    ast.In: 3,
+    ast.NotIn: 3,
+    ast.Lt: 4,
+    ast.LtE: 4,
+    ast.Gt: 4,
+    ast.GtE: 4,
+    ast.BitOr: 5,
+    ast.BitXor: 6,
+    ast.BitAnd: 7,
+    ast.LShift: 8,
+    ast.RShift: 8,
+    ast.Add: 9,
+    ast.Sub: 9,
+    ast.Mult: 10,
+    ast.Div: 10,
+    ast.Mod: 10,
+    ast.FloorDiv: 10,
+    ast.Pow: 11,
+}
+UNARY_PRECEDENCE = 12
+ATOM_PRECEDENCE = 13
+
+
+def expression_precedence(node):
+    if isinstance(node, (ast.BinOp, ast.BoolOp)):
+        return PRECEDENCE.get(type(node.op), 0)
+    elif isinstance(node, ast.Compare):
+        return PRECEDENCE.get(type(node.ops[0]), 3)
+    elif isinstance(node, ast.UnaryOp):
+        return UNARY_PRECEDENCE
+    elif isinstance(node, (ast.IfExp, ast.Lambda)):
+        return 0
+    return ATOM_PRECEDENCE
 
 
 class MethodMappings:
@@ -74,27 +223,70 @@ class MethodMappings:
 
 
 class PythonToBerryConverter(ast.NodeVisitor):
-    def __init__(self):
-        self.berry_code = []
+    def __init__(self, minify=False, fold_constants=False, pool_strings=0, hoist_invariants=False, concat_strings=False):
+        self.minify = minify  # Drop indentation, shorten locals and omit redundant parentheses
+        self.fold_constants = fold_constants  # Fold constant expressions and drop dead branches before emitting
+        self.pool_strings = pool_strings  # Share string literals used by at least this many functions (0 disables)
+        self.hoist_invariants = hoist_invariants  # Read loop-invariant members and globals once before each loop
+        self.concat_strings = concat_strings  # Build strings grown with += in loops from a list joined once
+        self.optimization_report = []  # One entry per change made by the optimization passes
+        self.emitter = None
+        self.source_name = None
+        self.current_line = None  # Python line of the statement being converted
         self.indentation = 0
         self.source_lines = []
         self.local_variables = {}  # Track local variables within methods
         self.inside_method = False  # Track if we are inside a method
         self.method_mappings = MethodMappings()  # Use the method mappings
-        self.name_changes = {
-            "json.loads": "json.load",
-            "float": "real",
-            "None": "nil",
-            "True": "true",
-            "False": "false",
-        }
+        self.name_changes = dict(DEFAULT_NAME_CHANGES)  # Extend to rename more names, attribute paths or constants
         self.defined_functions = set()  # Track defined functions
         self.variables_in_scope = {}  # Track variables and their types in the current scope
+        # Expression renderers by node type, see get_node_value
+        self.value_handlers = {
+            node_type: getattr(self, f"_value_{node_type.__name__}")
+            for node_type in (
+                ast.Lambda,
+                ast.FunctionDef,
+                ast.Constant,
+                ast.Name,
+                ast.Attribute,
+                ast.Subscript,
+                ast.BinOp,
+                ast.UnaryOp,
+                ast.BoolOp,
+                ast.Compare,
+                ast.IfExp,
+                ast.Dict,
+                ast.List,
+                ast.Tuple,
+                ast.Call,
+                ast.JoinedStr,
+            )
+        }
 
     def set_source_code(self, source_code):
         self.source_lines = source_code.splitlines()
 
+    def emit(self, line):
+        if self.minify and not line.strip():
+            return
+        self.emitter.emit(line, (self.source_name, self.current_line))
+
+    def visit(self, node):
+        # Lines emitted while visiting a statement map back to that statement
+        if not isinstance(node, ast.stmt):
+            return super().visit(node)
+        previous_line, previous_source = self.current_line, self.source_name
+        self.current_line = node.lineno
+        self.source_name = getattr(node, "source_file", self.source_name)
+        try:
+            return super().visit(node)
+        finally:
+            self.current_line, self.source_name = previous_line, previous_source
+
     def indent(self):
+        if self.minify:
+            return ""
         return "    " * self.indentation
 
     def sanitize_name(self, name):
@@ -104,18 +296,17 @@ class PythonToBerryConverter(ast.NodeVisitor):
 
     def visit_ClassDef(self, node):
         class_name = self.sanitize_name(node.name)
-        self.berry_code.append(f"{self.indent()}class {class_name}")
+        self.emit(f"{self.indent()}class {class_name}")
         self.indentation += 1
         self.generic_visit(node)
         self.indentation -= 1
-        self.berry_code.append(f"{self.indent()}end")
+        self.emit(f"{self.indent()}end")
 
     def visit_FunctionDef(self, node):
         method_name = self.sanitize_name(node.name)
         self.defined_functions.add(method_name)  # Track the function name
-        self.berry_code.append(f"{self.indent()}def {method_name}(")
         args = [arg.arg for arg in node.args.args if arg.arg != "self"]
-        self.berry_code[-1] += ", ".join(args) + ")"
+        self.emit(f"{self.indent()}def {method_name}({', '.join(args)})")
 
         self.local_variables = {
             arg.arg: self.get_type_annotation(arg.annotation)
@@ -128,29 +319,32 @@ class PythonToBerryConverter(ast.NodeVisitor):
         self.generic_visit(node)
         self.indentation -= 1
         self.inside_method = False
-        self.berry_code.append(f"{self.indent()}end")
+        self.emit(f"{self.indent()}end")
 
     def handle_assignment(self, target, value, annotation=None):
+        if isinstance(target, ast.Subscript):
+            self.emit(f"{self.indent()}{self.get_node_value(target)} = {value}")
+            return
         target = self.get_node_value(target)
         if self.inside_method:
             if target.startswith("self."):
-                self.berry_code.append(f"{self.indent()}{target} = {value}")
+                self.emit(f"{self.indent()}{target} = {value}")
                 # self.local_variables[target] = annotation or 'unknown'
                 self.variables_in_scope[target] = annotation or "unknown"
             else:
                 if target not in self.local_variables:
-                    self.berry_code.append(f"{self.indent()}var {target} = {value}")
+                    self.emit(f"{self.indent()}var {target} = {value}")
                     self.local_variables[target] = annotation or "unknown"
                     self.variables_in_scope[target] = annotation or "unknown"
                 else:
-                    self.berry_code.append(f"{self.indent()}{target} = {value}")
+                    self.emit(f"{self.indent()}{target} = {value}")
         else:
             if target not in self.local_variables:
-                self.berry_code.append(f"{self.indent()}var {target} = {value}")
+                self.emit(f"{self.indent()}var {target} = {value}")
                 self.local_variables[target] = annotation or "unknown"
                 self.variables_in_scope[target] = annotation or "unknown"
             else:
-                self.berry_code.append(f"{self.indent()}{target} = {value}")
+                self.emit(f"{self.indent()}{target} = {value}")
 
     def visit_AnnAssign(self, node):
         value = self.get_node_value(node.value)
@@ -159,6 +353,11 @@ class PythonToBerryConverter(ast.NodeVisitor):
 
     def visit_Assign(self, node):
         value = self.get_node_value(node.value)
+        if getattr(node, "berry_static", False):
+            # Class constants added by StringPooler
+            for target in node.targets:
+                self.emit(f"{self.indent()}static {self.get_node_value(target)} = {value}")
+            return
         inferred_type = self.infer_type(node.value)
         for target in node.targets:
             self.handle_assignment(target, value, inferred_type)
@@ -174,25 +373,28 @@ class PythonToBerryConverter(ast.NodeVisitor):
             func_name = self.get_func_name(node.func)
             if func_name in ["list", "dict", "bytes"]:
                 return func_name
+        elif isinstance(node, (ast.Name, ast.Attribute)):
+            # Copies, such as cached members, keep the type of what they copy
+            return self.variables_in_scope.get(self.get_node_value(node), "unknown")
         return "unknown"
 
     def visit_Name(self, node):
-        self.berry_code.append(node.id)
+        self.emit(node.id)
 
     def visit_Attribute(self, node):
         value = self.get_node_value(node.value)
         if isinstance(node.value, ast.Name) and node.value.id == "self":
-            self.berry_code.append(f"{value}.{node.attr}")
+            self.emit(f"{value}.{node.attr}")
         else:
-            self.berry_code.append(f"{value}.{node.attr}")
+            self.emit(f"{value}.{node.attr}")
 
     def visit_Constant(self, node):
         if isinstance(node.value, str):
-            self.berry_code.append(f"'{node.value}'")
+            self.emit(f"'{node.value}'")
         elif node.value is None:
-            self.berry_code.append("nil")
+            self.emit("nil")
         else:
-            self.berry_code.append(f"{node.value}")
+            self.emit(f"{node.value}")
 
     def visit_Lambda(self, node):
         # args = [arg.arg for arg in node.args.args]
@@ -200,7 +402,7 @@ class PythonToBerryConverter(ast.NodeVisitor):
         return f"/->{body}"
 
     def visit_Try(self, node):
-        self.berry_code.append(f"{self.indent()}try")
+        self.emit(f"{self.indent()}try")
         self.indentation += 1
         for stmt in node.body:
             self.visit(stmt)
@@ -208,29 +410,29 @@ class PythonToBerryConverter(ast.NodeVisitor):
 
         for handler in node.handlers:
             if handler.type is None:
-                self.berry_code.append(f"{self.indent()}except .. as {handler.name}")
+                self.emit(f"{self.indent()}except .. as {handler.name}")
             else:
                 # We don't need to handle specific exception types, so we just use `..`
-                self.berry_code.append(f"{self.indent()}except .. as {handler.name}")
+                self.emit(f"{self.indent()}except .. as {handler.name}")
             self.indentation += 1
             for stmt in handler.body:
                 self.visit(stmt)
             self.indentation -= 1
 
         if node.finalbody:
-            self.berry_code.append(f"{self.indent()}finally")
+            self.emit(f"{self.indent()}finally")
             self.indentation += 1
             for stmt in node.finalbody:
                 self.visit(stmt)
             self.indentation -= 1
 
-        self.berry_code.append(f"{self.indent()}end")
+        self.emit(f"{self.indent()}end")
 
     def visit_Expr(self, node):
         if isinstance(node.value, ast.Call):
             self.visit(node.value)
         else:
-            self.berry_code.append(f"{self.indent()}{self.get_node_value(node.value)}")
+            self.emit(f"{self.indent()}{self.get_node_value(node.value)}")
 
     def get_type_annotation(self, annotation):
         if annotation is None:
@@ -243,7 +445,7 @@ class PythonToBerryConverter(ast.NodeVisitor):
 
     def visit_Call(self, node):
         call_str = self.handle_call(node)
-        self.berry_code.append(f"{self.indent()}{call_str}")
+        self.emit(f"{self.indent()}{call_str}")
 
     def handle_call(self, node):
         func_name = self.get_func_name(node.func)
@@ -284,12 +486,13 @@ class PythonToBerryConverter(ast.NodeVisitor):
             if isinstance(comparators, ast.List):
                 comparators = [self.get_node_value(comp) for comp in comparators.elts]
                 test = " || ".join([f"{left} == {comp}" for comp in comparators])
-            elif isinstance(comparators, (ast.Str, ast.Name)):
+            else:
+                # Strings, names and other containers, such as a pooled self.S0
                 test = f"({self.get_node_value(comparators)}.contains({left}))"
         else:
             test = self.get_node_value(node.test)  # Remove parenthesize argument
 
-        self.berry_code.append(f"{self.indent()}if {test}")
+        self.emit(f"{self.indent()}if {test}")
         self.indentation += 1
         for stmt in node.body:
             self.visit(stmt)
@@ -297,7 +500,7 @@ class PythonToBerryConverter(ast.NodeVisitor):
 
         if node.orelse:
             if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
-                self.berry_code.append(
+                self.emit(
                     f"{self.indent()}elif {self.get_node_value(node.orelse[0].test)}"
                 )
                 self.indentation += 1
@@ -307,18 +510,18 @@ class PythonToBerryConverter(ast.NodeVisitor):
                 # Handle nested elif
                 self.handle_elif(node.orelse[0])
             else:
-                self.berry_code.append(f"{self.indent()}else")
+                self.emit(f"{self.indent()}else")
                 self.indentation += 1
                 for stmt in node.orelse:
                     self.visit(stmt)
                 self.indentation -= 1
 
-        self.berry_code.append(f"{self.indent()}end")
+        self.emit(f"{self.indent()}end")
 
     def handle_elif(self, node):
         if node.orelse:
             if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
-                self.berry_code.append(
+                self.emit(
                     f"{self.indent()}elif {self.get_node_value(node.orelse[0].test)}"
                 )
                 self.indentation += 1
@@ -327,55 +530,145 @@ class PythonToBerryConverter(ast.NodeVisitor):
                 self.indentation -= 1
                 self.handle_elif(node.orelse[0])
             else:
-                self.berry_code.append(f"{self.indent()}else")
+                self.emit(f"{self.indent()}else")
                 self.indentation += 1
                 for stmt in node.orelse:
                     self.visit(stmt)
                 self.indentation -= 1
 
     def visit_For(self, node):
-        target = self.get_node_value(node.target)
-        # iter = self.get_node_value(node.iter)
-
-        # Check if iter is a call to .keys() on a dictionary
-        if (
-            isinstance(node.iter, ast.Call)
-            and isinstance(node.iter.func, ast.Attribute)
-            and node.iter.func.attr == "keys"
-        ):
-            dict_name = self.get_node_value(node.iter.func.value)
-            self.berry_code.append(f"{self.indent()}for {target} : {dict_name}.keys()")
+        if node.orelse:
+            raise ValueError("for/else has no Berry equivalent")
+        if self.is_call_to(node.iter, "range"):
+            self.handle_range_loop(node)
+            return
+
+        # Berry iterates maps over their values, so Python's key iteration goes through keys()
+        prelude = []
+        if isinstance(node.target, ast.Tuple):
+            names = [self.get_node_value(elt) for elt in node.target.elts]
+            if len(names) != 2 or not all(isinstance(elt, ast.Name) for elt in node.target.elts):
+                raise ValueError(f"Unsupported for loop target: {ast.unparse(node.target)}")
+            if self.is_method_call(node.iter, "items"):
+                container = self.get_node_value(node.iter.func.value)
+                header = f"{names[0]} : {container}.keys()"
+                prelude.append(f"var {names[1]} = {container}[{names[0]}]")
+            elif self.is_call_to(node.iter, "enumerate") and len(node.iter.args) == 1:
+                container = self.get_node_value(node.iter.args[0])
+                header = f"{names[0]} : 0 .. size({container}) - 1"
+                prelude.append(f"var {names[1]} = {container}[{names[0]}]")
+            else:
+                raise ValueError(f"Unsupported for loop iterable: {ast.unparse(node.iter)}")
         else:
-            raise ValueError(f"Unsupported for loop iterable: {ast.dump(node.iter)}")
+            target = self.get_node_value(node.target)
+            if self.is_method_call(node.iter, "keys"):
+                header = f"{target} : {self.get_node_value(node.iter.func.value)}.keys()"
+            elif self.is_method_call(node.iter, "values"):
+                header = f"{target} : {self.get_node_value(node.iter.func.value)}"
+            elif self.is_map(node.iter):
+                header = f"{target} : {self.get_node_value(node.iter)}.keys()"
+            else:
+                header = f"{target} : {self.get_node_value(node.iter)}"
 
+        self.emit(f"{self.indent()}for {header}")
         self.indentation += 1
+        for line in prelude:
+            self.emit(f"{self.indent()}{line}")
         for stmt in node.body:
             self.visit(stmt)
         self.indentation -= 1
-        self.berry_code.append(f"{self.indent()}end")
+        self.emit(f"{self.indent()}end")
+
+    def handle_range_loop(self, node):
+        args = node.iter.args
+        if not isinstance(node.target, ast.Name) or not 1 <= len(args) <= 3 or node.iter.keywords:
+            raise ValueError(f"Unsupported range loop: {ast.unparse(node)}")
+        target = self.get_node_value(node.target)
+        start = self.get_node_value(args[0]) if len(args) > 1 else "0"
+        stop = args[1] if len(args) > 1 else args[0]
+        step = self.constant_int(args[2]) if len(args) == 3 else 1
+        if step is None or step == 0:
+            raise ValueError(f"range() step must be a non-zero integer constant: {ast.unparse(node.iter)}")
+
+        if step == 1:
+            # Berry ranges are inclusive and iterate without building a list
+            stop_value = self.constant_int(stop)
+            upper = str(stop_value - 1) if stop_value is not None else f"{self.get_node_value(stop, parenthesize=True)} - 1"
+            self.emit(f"{self.indent()}for {target} : {start} .. {upper}")
+            self.indentation += 1
+            for stmt in node.body:
+                self.visit(stmt)
+            self.indentation -= 1
+            self.emit(f"{self.indent()}end")
+            return
+
+        # Stepped ranges become a counting while loop; continue would skip the increment
+        if any(isinstance(child, ast.Continue) for stmt in node.body for child in self.walk_loop_body(stmt)):
+            raise ValueError("continue inside a stepped range() loop is not supported")
+        self.handle_assignment(node.target, start)
+        comparison = "<" if step > 0 else ">"
+        self.emit(f"{self.indent()}while {target} {comparison} {self.get_node_value(stop)}")
+        self.indentation += 1
+        for stmt in node.body:
+            self.visit(stmt)
+        self.emit(f"{self.indent()}{target} {'+' if step > 0 else '-'}= {abs(step)}")
+        self.indentation -= 1
+        self.emit(f"{self.indent()}end")
+
+    def walk_loop_body(self, node):
+        """Nodes of a loop body, without descending into nested loops and functions."""
+        yield node
+        if isinstance(node, (ast.For, ast.While, ast.FunctionDef, ast.Lambda)):
+            return
+        for child in ast.iter_child_nodes(node):
+            yield from self.walk_loop_body(child)
+
+    def constant_int(self, node):
+        try:
+            value = ast.literal_eval(node)
+        except ValueError:
+            return None
+        return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+    def is_call_to(self, node, function_name):
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == function_name
+
+    def is_method_call(self, node, method_name):
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == method_name and not node.args
+
+    def is_map(self, node):
+        if isinstance(node, ast.Dict) or self.is_call_to(node, "dict"):
+            return True
+        return self.variables_in_scope.get(self.get_node_value(node)) in ("map", "dict")
 
     def visit_While(self, node):
         test = self.get_node_value(node.test)
-        self.berry_code.append(f"{self.indent()}while {test}")
+        self.emit(f"{self.indent()}while {test}")
         self.indentation += 1
         for stmt in node.body:
             self.visit(stmt)
         self.indentation -= 1
-        self.berry_code.append(f"{self.indent()}end")
+        self.emit(f"{self.indent()}end")
         if node.orelse:
-            self.berry_code.append(f"{self.indent()}else")
+            self.emit(f"{self.indent()}else")
             self.indentation += 1
             for stmt in node.orelse:
                 self.visit(stmt)
             self.indentation -= 1
-            self.berry_code.append(f"{self.indent()}end")
+            self.emit(f"{self.indent()}end")
+
+    def visit_Break(self, node):
+        self.emit(f"{self.indent()}break")
+
+    def visit_Continue(self, node):
+        self.emit(f"{self.indent()}continue")
 
     def visit_Return(self, node):
         if node.value:
             return_value = self.get_node_value(node.value)
-            self.berry_code.append(f"{self.indent()}return {return_value}")
+            self.emit(f"{self.indent()}return {return_value}")
         else:
-            self.berry_code.append(f"{self.indent()}return")
+            self.emit(f"{self.indent()}return")
 
     def visit_Dict(self, node):
         items = [
@@ -396,7 +689,7 @@ class PythonToBerryConverter(ast.NodeVisitor):
         target = self.get_node_value(node.target)
         op = self.get_operator(node.op)
         value = self.get_node_value(node.value)
-        self.berry_code.append(f"{self.indent()}{target} {op}= {value}")
+        self.emit(f"{self.indent()}{target} {op}= {value}")
 
     def get_func_name(self, node):
         if isinstance(node, ast.Attribute):
@@ -420,77 +713,118 @@ class PythonToBerryConverter(ast.NodeVisitor):
             return node.id
         return ""
 
-    def get_node_value(self, node, parenthesize=False):  # noqa
-        if isinstance(node, ast.Lambda):
-            return self.visit_Lambda(node)
-        elif isinstance(node, ast.FunctionDef):
-            return f"/->{node.name}()"
-        elif isinstance(node, ast.Constant):
-            if isinstance(node.value, str):
-                value = node.value.replace("\n", "\\n")  # Escape newlines
-                return f"'{value}'"
-            elif node.value is None:
-                return "nil"
-            return str(node.value)
-        elif isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Attribute):
-            if isinstance(node.value, ast.Name) and node.value.id == "self":
-                return f"self.{node.attr}"
-            return f"{self.get_node_value(node.value)}.{node.attr}"
-        elif isinstance(node, ast.Subscript):
-            return f"{self.get_node_value(node.value)}[{self.get_subscript(node.slice)}]"
-        elif isinstance(node, ast.BinOp):
-            left = self.get_node_value(node.left, parenthesize=True)
-            right = self.get_node_value(node.right, parenthesize=True)
-            op = self.get_operator(node.op)
-            result = f"{left} {op} {right}"
-            return f"({result})" if parenthesize else result
-        elif isinstance(node, ast.UnaryOp):
+    def get_node_value(self, node, parenthesize=False):
+        handler = self.value_handlers.get(type(node))
+        if handler is None:
+            return ""
+        return handler(node, parenthesize)
+
+    def _value_Lambda(self, node, parenthesize):
+        return self.visit_Lambda(node)
+
+    def _value_FunctionDef(self, node, parenthesize):
+        return f"/->{node.name}()"
+
+    def _value_Constant(self, node, parenthesize):
+        if isinstance(node.value, str):
+            value = node.value.replace("\n", "\\n")  # Escape newlines
+            return f"'{value}'"
+        elif node.value is None:
+            return "nil"
+        return str(node.value)
+
+    def _value_Name(self, node, parenthesize):
+        return node.id
+
+    def _value_Attribute(self, node, parenthesize):
+        if isinstance(node.value, ast.Name) and node.value.id == "self":
+            return f"self.{node.attr}"
+        if self.minify:
+            return f"{self.operand(node.value, ATOM_PRECEDENCE)}.{node.attr}"
+        return f"{self.get_node_value(node.value)}.{node.attr}"
+
+    def _value_Subscript(self, node, parenthesize):
+        if self.minify:
+            return f"{self.operand(node.value, ATOM_PRECEDENCE)}[{self.get_subscript(node.slice)}]"
+        return f"{self.get_node_value(node.value)}[{self.get_subscript(node.slice)}]"
+
+    def operand(self, node, precedence):
+        """Render node, in parentheses only when it binds looser than precedence (minify mode)."""
+        value = self.get_node_value(node)
+        return f"({value})" if expression_precedence(node) < precedence else value
+
+    def _value_BinOp(self, node, parenthesize):
+        if self.minify:
+            # Operators are left associative, so an equal-precedence right operand keeps its parentheses
+            precedence = PRECEDENCE.get(type(node.op), 0)
+            return f"{self.operand(node.left, precedence)} {self.get_operator(node.op)} {self.operand(node.right, precedence + 1)}"
+        left = self.get_node_value(node.left, parenthesize=True)
+        right = self.get_node_value(node.right, parenthesize=True)
+        op = self.get_operator(node.op)
+        result = f"{left} {op} {right}"
+        return f"({result})" if parenthesize else result
+
+    def _value_UnaryOp(self, node, parenthesize):
+        if self.minify:
             op = self.get_operator(node.op)
-            operand = self.get_node_value(node.operand)
-            result = f"{op}{operand}"
-            return f"({result})" if parenthesize else result
-        elif isinstance(node, ast.BoolOp):
-            op = " and " if isinstance(node.op, ast.And) else " or "
-            values = [self.get_node_value(v, parenthesize=True) for v in node.values]
-            result = f"({op.join(values)})"
-            return f"({result})" if parenthesize else result
-        elif isinstance(node, ast.Compare):
-            left = self.get_node_value(node.left)
-            right = self.get_node_value(node.comparators[0])
-            if isinstance(node.ops[0], ast.IsNot):
-                result = f"{left} != {right}"
-            else:
-                result = f"{left} {self.get_operator(node.ops[0])} {right}"
-            return f"({result})" if parenthesize else result
-        elif isinstance(node, ast.IfExp):
-            body = self.get_node_value(node.body)
-            test = self.get_node_value(node.test)
-            orelse = self.get_node_value(node.orelse)
-            result = f"{body} if {test} else {orelse}"
-            return f"({result})" if parenthesize else result
-        elif isinstance(node, ast.Dict):
-            return self.visit_Dict(node)
-        elif isinstance(node, ast.List):
-            return self.visit_List(node)
-        elif isinstance(node, ast.Tuple):
-            return self.visit_Tuple(node)
-        elif isinstance(node, ast.Call):
-            return self.handle_call(node)
-
-        elif isinstance(node, ast.JoinedStr):
-            format_string_parts = []
-            format_values = []
-            for value in node.values:
-                if isinstance(value, ast.Str):
-                    format_string_parts.append(value.s)
-                elif isinstance(value, ast.FormattedValue):
-                    format_string_parts.append("%s")
-                    format_values.append(self.get_node_value(value.value))
-            format_string = "".join(format_string_parts)
-            return f"string.format('{format_string}', {', '.join(format_values)})"
-        return ""
+            operand = self.operand(node.operand, UNARY_PRECEDENCE)
+            return f"{op} {operand}" if op.isalpha() and not operand.startswith("(") else f"{op}{operand}"
+        op = self.get_operator(node.op)
+        operand = self.get_node_value(node.operand)
+        result = f"{op} {operand}" if op.isalpha() and not operand.startswith("(") else f"{op}{operand}"
+        return f"({result})" if parenthesize else result
+
+    def _value_BoolOp(self, node, parenthesize):
+        op = " and " if isinstance(node.op, ast.And) else " or "
+        if self.minify:
+            return op.join(self.operand(v, PRECEDENCE[type(node.op)] + 1) for v in node.values)
+        values = [self.get_node_value(v, parenthesize=True) for v in node.values]
+        result = f"({op.join(values)})"
+        return f"({result})" if parenthesize else result
+
+    def _value_Compare(self, node, parenthesize):
+        if self.minify:
+            precedence = expression_precedence(node)
+            left = self.operand(node.left, precedence)
+            right = self.operand(node.comparators[0], precedence + 1)
+            return f"{left} {self.get_operator(node.ops[0])} {right}"
+        left = self.get_node_value(node.left)
+        right = self.get_node_value(node.comparators[0])
+        result = f"{left} {self.get_operator(node.ops[0])} {right}"
+        return f"({result})" if parenthesize else result
+
+    def _value_IfExp(self, node, parenthesize):
+        if self.minify:
+            return f"{self.operand(node.body, 1)} if {self.operand(node.test, 1)} else {self.operand(node.orelse, 1)}"
+        body = self.get_node_value(node.body)
+        test = self.get_node_value(node.test)
+        orelse = self.get_node_value(node.orelse)
+        result = f"{body} if {test} else {orelse}"
+        return f"({result})" if parenthesize else result
+
+    def _value_Dict(self, node, parenthesize):
+        return self.visit_Dict(node)
+
+    def _value_List(self, node, parenthesize):
+        return self.visit_List(node)
+
+    def _value_Tuple(self, node, parenthesize):
+        return self.visit_Tuple(node)
+
+    def _value_Call(self, node, parenthesize):
+        return self.handle_call(node)
+
+    def _value_JoinedStr(self, node, parenthesize):
+        format_string_parts = []
+        format_values = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                format_string_parts.append(value.value)
+            elif isinstance(value, ast.FormattedValue):
+                format_string_parts.append("%s")
+                format_values.append(self.get_node_value(value.value))
+        format_string = "".join(format_string_parts)
+        return f"string.format('{format_string}', {', '.join(format_values)})"
 
     def get_subscript(self, node):
         if isinstance(node, ast.Index):
@@ -500,89 +834,235 @@ class PythonToBerryConverter(ast.NodeVisitor):
             upper = self.get_node_value(node.upper) if node.upper else ""
             step = self.get_node_value(node.step) if node.step else ""
             return f"{lower}:{upper}:{step}"
-        return ""
+        # Python 3.9+ puts the index expression directly in the slice
+        return self.get_node_value(node)
 
-    def get_operator(self, op):  # noqa
-        if isinstance(op, ast.Add):
-            return "+"
-        elif isinstance(op, ast.Sub):
-            return "-"
-        elif isinstance(op, ast.Mult):
-            return "*"
-        elif isinstance(op, ast.Div):
-            return "/"
-        elif isinstance(op, ast.Mod):
-            return "%"
-        elif isinstance(op, ast.Pow):
-            return "**"
-        elif isinstance(op, ast.LShift):
-            return "<<"
-        elif isinstance(op, ast.RShift):
-            return ">>"
-        elif isinstance(op, ast.NotEq):
-            return "!="
-        elif isinstance(op, ast.Eq):
-            return "=="
-        elif isinstance(op, ast.Lt):
-            return "<"
-        elif isinstance(op, ast.LtE):
-            return "<="
-        elif isinstance(op, ast.Gt):
-            return ">"
-        elif isinstance(op, ast.GtE):
-            return ">="
-        elif isinstance(op, ast.AugAssign):  # Add support for augmented assignment
-            if isinstance(op.op, ast.Add):
-                return "+="
-            elif isinstance(op.op, ast.Sub):
-                return "-="
-            elif isinstance(op.op, ast.Mult):
-                return "*="
-            elif isinstance(op.op, ast.Div):
-                return "/="
-        elif isinstance(op, ast.And):
-            return "and"
-        elif isinstance(op, ast.Or):
-            return "or"
-        elif isinstance(op, ast.Not):
-            return "not"
-        elif isinstance(op, ast.BitOr):
-            return "|"
-        elif isinstance(op, ast.BitXor):
-            return "^"
-        elif isinstance(op, ast.BitAnd):
-            return "&"
-        elif isinstance(op, ast.FloorDiv):
-            return "//"
-        elif isinstance(op, ast.Not):
-            return "not "
-        elif isinstance(op, ast.IsNot):
-            return "!="
-        else:
-            return ""
+    def get_operator(self, op):
+        return OPERATORS.get(type(op), "")
+
+    def transform(self, tree, source_code=None):
+        """Run the AST passes; source_code, the text tree was parsed from, lets passes that cannot apply be skipped."""
+        lowered = source_code is None or may_have_comprehensions(tree, source_code)
+        if lowered:
+            tree = ComprehensionLowerer().visit(tree)
+        # Folding needs the Python constants, so it runs before they are renamed to Berry names
+        if self.fold_constants:
+            tree = ConstantFolder(self.optimization_report).visit(tree)
+        # Lowering and folding create constants the source never spells, so only an untouched tree may skip renaming
+        untouched = not lowered and not self.fold_constants
+        tree = NameRewriter(self.name_changes, source_code if untouched else None).visit(tree)
+        # After renaming, so dotted name changes still see the original receivers
+        if self.hoist_invariants:
+            tree = LoopInvariantHoister(self.optimization_report).visit(tree)
+        if self.concat_strings:
+            tree = StringAccumulationRewriter(self.optimization_report).visit(tree)
+        if self.pool_strings:
+            tree = StringPooler(self.pool_strings, report=self.optimization_report).visit(tree)
+        if self.minify:
+            tree = LocalRenamer().visit(tree)
+        return tree
 
-    def convert(self, source_code):
+    def convert_to_stream(self, source_code, sink, buffer_lines=64, source_map=None):
+        """Convert source_code, writing Berry lines to the file-like sink as they are generated.
+
+        A SourceMap passed in is filled with the Python line of every Berry line, attributed to its first source.
+        """
         # Store the source code lines for error context
         self.set_source_code(source_code)
+        # One pause for parsing and conversion: re-enabling the collector in between makes it scan the whole tree
+        with paused_gc():
+            tree = ast.parse(source_code)
+            return self.convert_tree_to_stream(tree, sink, buffer_lines, source_map, source_code)
+
+    def convert_tree_to_stream(self, tree, sink, buffer_lines=64, source_map=None, source_code=None):
+        """Convert an already parsed module; statements carrying a source_file attribute are mapped to that file.
+
+        source_code is the text the whole tree was parsed from, if there is one, see transform.
+        """
+        self.source_name = source_map.sources[0] if source_map is not None and source_map.sources else "<source>"
+        self.emitter = BerryEmitter(sink, buffer_lines, source_map)
+        with paused_gc():
+            tree = self.transform(tree, source_code)
+            self.visit(tree)
+        self.emitter.close()
+        return self.emitter.lines
+
+    def convert(self, source_code, source_map=None):
+        output = io.StringIO()
+        self.convert_to_stream(source_code, output, source_map=source_map)
+        return output.getvalue()
+
+
+@lru_cache(maxsize=None)
+def converter_version():
+    digest = hashlib.sha256()
+    for path in CONVERTER_MODULES:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
 
-        # Apply name changes
-        for old_name, new_name in self.name_changes.items():
-            source_code = source_code.replace(old_name, new_name)
+class ConversionCache:
+    """On-disk store of generated Berry code keyed by source hash, converter version and options."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source_code, options=None):
+        digest = hashlib.sha256()
+        digest.update(converter_version().encode())
+        digest.update(json.dumps(options or {}, sort_keys=True).encode())
+        digest.update(source_code.encode())
+        return digest.hexdigest()
+
+    def path(self, key, suffix=".be"):
+        return os.path.join(self.directory, key[:2], f"{key}{suffix}")
+
+    def get(self, key, source_map=None):
+        """Cached code for key, or None. A SourceMap passed in is filled from the entry, whose map is then required."""
+        try:
+            with open(self.path(key), "r") as file:
+                berry_code = file.read()
+            cached_map = self.get_map(key) if source_map is not None else None
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        if source_map is not None:
+            if cached_map is None:
+                self.misses += 1
+                return None
+            # The key covers the content only, so the entry may come from a file with another name
+            source_map.runs, source_map.starts = cached_map.runs, cached_map.starts
+        self.hits += 1
+        return berry_code
+
+    def get_map(self, key):
+        try:
+            return SourceMap.load(self.path(key, ".be.map"))
+        except FileNotFoundError:
+            return None
 
-        tree = ast.parse(source_code)
-        self.visit(tree)
-        return "\n".join(self.berry_code)
+    def put(self, key, berry_code, source_map=None):
+        # The map goes first, so an entry whose code is present always has its map
+        if source_map is not None:
+            self.write(self.path(key, ".be.map"), source_map.dumps())
+        self.write(self.path(key), berry_code)
 
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent converters never read a partial entry
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(text)
+        os.replace(temp_path, path)
 
-def convert_python_to_berry(input_file_path):
+
+def convert_source(source_code, cache=None, report=None, source_map=None, **options):
+    """Berry code for source_code, served from the cache when one is given.
+
+    Passing a report list always converts, and extends it with the converter's optimization report.
+    A SourceMap passed in is filled for the returned code.
+    """
+    if cache is None or report is not None:
+        converter = PythonToBerryConverter(**options)
+        berry_code = converter.convert(source_code, source_map=source_map)
+        if report is not None:
+            report.extend(converter.optimization_report)
+        return berry_code
+    # Only non-default options are part of the key, so existing entries stay valid
+    key = cache.key(source_code, {name: value for name, value in options.items() if value})
+    berry_code = cache.get(key, source_map)
+    if berry_code is None:
+        source_map = source_map if source_map is not None else SourceMap()
+        berry_code = PythonToBerryConverter(**options).convert(source_code, source_map=source_map)
+        cache.put(key, berry_code, source_map)
+    return berry_code
+
+
+def convert_file(input_file_path, cache=None, report=None, source_map=True, **options):
+    """Convert one file next to its source with a fresh converter; returns the output path.
+
+    With source_map, a <file>.be.map mapping Berry lines to Python lines is written next to the output.
+    """
     with open(input_file_path, "r") as file:
         source_code = file.read()
 
-    converter = PythonToBerryConverter()
-    berry_code = converter.convert(source_code)
+    output_file_path = os.path.splitext(input_file_path)[0] + ".be"
+    berry_map = SourceMap(os.path.basename(output_file_path), [os.path.basename(input_file_path)]) if source_map else None
+    if cache is None and report is None:
+        # Stream straight to disk; the rename keeps a failed conversion from leaving a truncated file
+        temp_path = f"{output_file_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                PythonToBerryConverter(**options).convert_to_stream(source_code, file, source_map=berry_map)
+            os.replace(temp_path, output_file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    else:
+        berry_code = convert_source(source_code, cache, report, berry_map, **options)
+        with open(output_file_path, "w") as file:
+            file.write(berry_code)
+
+    if berry_map is not None:
+        with open(map_path(output_file_path), "w") as file:
+            file.write(berry_map.dumps())
+    return output_file_path
+
+
+def minify_sizes(input_file_path, output_file_path, cache=None):
+    """Size in bytes of the regular and the minified Berry output of one file."""
+    with open(input_file_path, "r") as file:
+        regular = convert_source(file.read(), cache)
+    return len(regular.encode()), os.path.getsize(output_file_path)
+
+
+def format_sizes(before, after):
+    return f"{before} -> {after} bytes, {(after - before) / before:+.0%}" if before else f"{before} -> {after} bytes"
+
+
+def format_report(report):
+    lines = []
+    for entry in report:
+        line = f"  line {entry['line']}: {entry['kind']:<9} {entry['before']} -> {entry['after']}"
+        if "bytes_saved" in entry:
+            line += f" ({entry['functions']} functions, {entry['bytes_saved']:+d} bytes saved)"
+        lines.append(line)
+    pooled = [entry["bytes_saved"] for entry in report if entry["kind"] == "pool"]
+    if pooled:
+        lines.append(f"  pooled {len(pooled)} string(s), {sum(pooled):+d} bytes saved")
+    return lines
 
-    output_file_path = input_file_path.replace(".py", ".be")
-    with open(output_file_path, "w") as file:
-        file.write(berry_code)
 
+def convert_python_to_berry(
+    input_file_path,
+    cache=None,
+    minify=False,
+    fold_constants=False,
+    report=None,
+    source_map=True,
+    pool_strings=0,
+    hoist_invariants=False,
+    concat_strings=False,
+):
+    output_file_path = convert_file(
+        input_file_path,
+        cache=cache,
+        report=report,
+        source_map=source_map,
+        minify=minify,
+        fold_constants=fold_constants,
+        pool_strings=pool_strings,
+        hoist_invariants=hoist_invariants,
+        concat_strings=concat_strings,
+    )
     print(f"Converted code written to {output_file_path}")
+    if report:
+        print(f"Optimizations in {input_file_path}:")
+        print("\n".join(format_report(report)))
+    if minify:
+        print(f"Minified {input_file_path}: {format_sizes(*minify_sizes(input_file_path, output_file_path, cache))}")
+    with open(output_file_path, "r") as file:
+        return file.read()
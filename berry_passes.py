@@ -0,0 +1,1214 @@
+import ast
+import copy
+import re
+
+# Python spellings rewritten to their Berry equivalent; keys may be dotted attribute paths.
+# None, True and False match the constants rather than identifiers.
+DEFAULT_NAME_CHANGES = {
+    "json.loads": "json.load",
+    "float": "real",
+    "None": "nil",
+    "True": "true",
+    "False": "false",
+}
+
+
+def dotted_name(node):
+    """"a.b.c" for a chain of attributes on a plain name, otherwise None."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def name_node(dotted, ctx=None):
+    ctx = ctx or ast.Load()
+    parts = dotted.split(".")
+    node = ast.Name(id=parts[0], ctx=ast.Load() if len(parts) > 1 else ctx)
+    for index, part in enumerate(parts[1:], start=2):
+        node = ast.Attribute(value=node, attr=part, ctx=ctx if index == len(parts) else ast.Load())
+    return node
+
+
+class NameRewriter(ast.NodeTransformer):
+    """Renames identifiers, dotted attribute paths and the None/True/False constants using a name_changes table.
+
+    String literals and identifiers that merely contain a mapped name are left alone.
+    """
+
+    def __init__(self, name_changes=None, source_code=None):
+        self.name_changes = DEFAULT_NAME_CHANGES if name_changes is None else name_changes
+        self.dotted_changes = {old: new for old, new in self.name_changes.items() if "." in old}
+        self.renames = 0
+        self.visitors = {
+            ast.Module: self.visit_Module,
+            ast.Name: self.visit_Name,
+            ast.Attribute: self.visit_Attribute,
+            ast.Constant: self.visit_Constant,
+        }
+        # With the source text the tree was parsed from, a module that never spells a mapped name
+        # (or the receiver of a dotted one) is returned without walking it
+        self.skip = source_code is not None and not any(old.split(".")[0] in source_code for old in self.name_changes)
+
+    def visit_Module(self, node):
+        return node if self.skip else self.generic_visit(node)
+
+    def visit(self, node):
+        # Dispatch by exact type instead of NodeVisitor's per-node method name lookup
+        visitor = self.visitors.get(type(node))
+        if visitor is not None:
+            return visitor(node)
+        # Leaf nodes such as contexts and operators have nothing to rewrite
+        return self.generic_visit(node) if node._fields else node
+
+    def generic_visit(self, node):
+        # The visitors never delete nodes, so children are replaced in place without rebuilding lists
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if type(value) is list:
+                for index, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        value[index] = self.visit(item)
+            elif isinstance(value, ast.AST):
+                setattr(node, field, self.visit(value))
+        return node
+
+    def visit_Name(self, node):
+        new_name = self.name_changes.get(node.id)
+        if new_name is None:
+            return node
+        self.renames += 1
+        return ast.copy_location(name_node(new_name, node.ctx), node)
+
+    def visit_Attribute(self, node):
+        if self.dotted_changes:
+            new_name = self.dotted_changes.get(dotted_name(node))
+            if new_name is not None:
+                self.renames += 1
+                return ast.copy_location(name_node(new_name, node.ctx), node)
+        node.value = self.visit(node.value)
+        return node
+
+    def visit_Constant(self, node):
+        value = node.value
+        if value is None or value is True or value is False:
+            new_name = self.name_changes.get(repr(value))
+            if new_name is not None:
+                self.renames += 1
+                return ast.copy_location(ast.Name(id=new_name, ctx=ast.Load()), node)
+        return node
+
+
+# Words that cannot be used as generated local names
+BERRY_KEYWORDS = frozenset(
+    "if elif else while for def end class break continue return true false nil var do import as try except raise static self super".split()
+)
+
+NESTED_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def short_names(taken):
+    """a, b, ..., z, aa, ab, ... skipping taken names and Berry keywords."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    length = 1
+    while True:
+        indices = [0] * length
+        while True:
+            name = "".join(letters[index] for index in indices)
+            if name not in taken and name not in BERRY_KEYWORDS:
+                yield name
+            position = length - 1
+            while position >= 0 and indices[position] == len(letters) - 1:
+                indices[position] = 0
+                position -= 1
+            if position < 0:
+                break
+            indices[position] += 1
+        length += 1
+
+
+class LocalRenamer(ast.NodeTransformer):
+    """Shortens parameter and local variable names of functions that have no nested scopes.
+
+    Only names bound inside a function are renamed, so class members, globals and method names that the
+    Tasmota runtime calls by string (every_second, mqtt_data, ...) keep their spelling. Generated names are
+    unique within the module, so the converter's per-name type tracking never mixes two functions.
+    """
+
+    def __init__(self):
+        self.renames = {}  # (function name, old name) -> new name
+        self.names = None
+
+    def visit_Module(self, node):
+        taken = set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                taken.add(child.id)
+            elif isinstance(child, ast.arg):
+                taken.add(child.arg)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                taken.add(child.name)
+        self.names = short_names(taken)
+        return self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        if any(isinstance(child, NESTED_SCOPES) for statement in node.body for child in ast.walk(statement)):
+            return node
+        mapping = {name: next(self.names) for name in self.local_names(node)}
+        for old_name, new_name in mapping.items():
+            self.renames[(node.name, old_name)] = new_name
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and child.id in mapping:
+                child.id = mapping[child.id]
+            elif isinstance(child, ast.arg) and child.arg in mapping:
+                child.arg = mapping[child.arg]
+            elif isinstance(child, ast.ExceptHandler) and child.name in mapping:
+                child.name = mapping[child.name]
+        return node
+
+    def local_names(self, node):
+        arguments = node.args
+        names = [arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs]
+        names += [arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None]
+        declared = set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                names.append(child.id)
+            elif isinstance(child, ast.ExceptHandler) and child.name:
+                names.append(child.name)
+            elif isinstance(child, (ast.Global, ast.Nonlocal)):
+                declared.update(child.names)
+        # self is dropped from the Berry signature and is a keyword there
+        return [name for name in dict.fromkeys(names) if name not in declared and name != "self"]
+
+
+# Berry integers are 32-bit on Tasmota targets; folds that overflow are left to the device
+BERRY_INT_MIN = -(2**31)
+BERRY_INT_MAX = 2**31 - 1
+
+FOLDABLE_TYPES = (bool, int, float, str, type(None))
+
+
+def berry_int_division(left, right):
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def berry_int_modulo(left, right):
+    # C semantics: the result takes the sign of the dividend
+    return left - right * berry_int_division(left, right)
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def fold_binop(op, left, right):
+    """Value of a binary operation as Berry computes it, or raise ValueError when it should not be folded."""
+    if isinstance(left, str) or isinstance(right, str):
+        if isinstance(op, ast.Add) and isinstance(left, str) and isinstance(right, str):
+            return left + right
+        raise ValueError("unsupported string operation")
+    if not is_number(left) or not is_number(right):
+        raise ValueError("operands are not numbers")
+    both_int = isinstance(left, int) and isinstance(right, int)
+    if isinstance(op, ast.Add):
+        return left + right
+    elif isinstance(op, ast.Sub):
+        return left - right
+    elif isinstance(op, ast.Mult):
+        return left * right
+    elif isinstance(op, ast.Div):
+        if right == 0:
+            raise ValueError("division by zero")
+        # Berry divides two integers with truncation, unlike Python's true division
+        return berry_int_division(left, right) if both_int else left / right
+    elif isinstance(op, ast.Mod) and both_int:
+        if right == 0:
+            raise ValueError("modulo by zero")
+        return berry_int_modulo(left, right)
+    elif both_int and isinstance(op, (ast.BitOr, ast.BitAnd, ast.BitXor)):
+        return {ast.BitOr: left | right, ast.BitAnd: left & right, ast.BitXor: left ^ right}[type(op)]
+    elif both_int and isinstance(op, (ast.LShift, ast.RShift)) and 0 <= right < 32:
+        return left << right if isinstance(op, ast.LShift) else left >> right
+    # // and ** have no Berry equivalent and are left for the converter to report
+    raise ValueError("operator is not folded")
+
+
+COMPARISONS = {
+    ast.Eq: lambda left, right: left == right,
+    ast.NotEq: lambda left, right: left != right,
+    ast.Lt: lambda left, right: left < right,
+    ast.LtE: lambda left, right: left <= right,
+    ast.Gt: lambda left, right: left > right,
+    ast.GtE: lambda left, right: left >= right,
+    ast.Is: lambda left, right: left is right,
+    ast.IsNot: lambda left, right: left is not right,
+}
+
+
+def berry_string(value):
+    """How Berry's string formatting renders a constant, or None when it may differ from Python."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "nil"
+    if isinstance(value, (int, str)):
+        return str(value)
+    return None
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """Folds constant expressions, propagates module constants and removes branches that can never run.
+
+    Every change is appended to report as {"line", "kind", "before", "after"}.
+    """
+
+    def __init__(self, report=None):
+        self.report = report if report is not None else []
+        self.constants = {}
+
+    def record(self, kind, before, after):
+        before_text, after_text = ast.unparse(before), ast.unparse(after)
+        # A negative literal parses as a unary minus; folding it back is not worth reporting
+        if before_text != after_text:
+            self.report.append({"line": getattr(before, "lineno", None), "kind": kind, "before": before_text, "after": after_text})
+
+    def constant(self, value, node, kind):
+        if isinstance(value, int) and not isinstance(value, bool) and not BERRY_INT_MIN <= value <= BERRY_INT_MAX:
+            return node
+        if isinstance(value, float) and (value != value or value in (float("inf"), float("-inf"))):
+            return node
+        folded = ast.copy_location(ast.Constant(value=value), node)
+        self.record(kind, node, folded)
+        return folded
+
+    def visit_Module(self, node):
+        self.constants = self.module_constants(node)
+        return self.generic_visit(node)
+
+    def module_constants(self, module):
+        """Module-level names assigned once to a constant and never rebound anywhere else."""
+        stores = {}
+        for child in ast.walk(module):
+            if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+                stores[child.id] = stores.get(child.id, 0) + 1
+            elif isinstance(child, ast.arg):
+                stores[child.arg] = stores.get(child.arg, 0) + 2
+            elif isinstance(child, (ast.Global, ast.Nonlocal)):
+                for name in child.names:
+                    stores[name] = stores.get(name, 0) + 2
+            elif isinstance(child, ast.ExceptHandler) and child.name:
+                stores[child.name] = stores.get(child.name, 0) + 2
+        constants = {}
+        for statement in module.body:
+            if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name)):
+                continue
+            name = statement.targets[0].id
+            if stores.get(name) != 1:
+                continue
+            # Fold with the constants defined so far, without recording: the statement is folded again later
+            folder = ConstantFolder(report=[])
+            folder.constants = constants
+            value = folder.visit(copy.deepcopy(statement.value))
+            if isinstance(value, ast.Constant) and isinstance(value.value, FOLDABLE_TYPES):
+                constants[name] = value.value
+        return constants
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            return self.constant(self.constants[node.id], node, "propagate")
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant):
+            try:
+                value = fold_binop(node.op, node.left.value, node.right.value)
+            except (ValueError, OverflowError):
+                return node
+            return self.constant(value, node, "fold")
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.operand, ast.Constant):
+            return node
+        value = node.operand.value
+        if isinstance(node.op, ast.Not) and isinstance(value, (bool, type(None))):
+            return self.constant(not value, node, "fold")
+        elif isinstance(node.op, ast.USub) and is_number(value):
+            return self.constant(-value, node, "fold")
+        elif isinstance(node.op, ast.Invert) and is_number(value) and isinstance(value, int):
+            return self.constant(~value, node, "fold")
+        return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        # Berry's and/or always yield a bool, so only all-bool operands are folded
+        if all(isinstance(value, ast.Constant) and isinstance(value.value, bool) for value in node.values):
+            values = [value.value for value in node.values]
+            return self.constant(all(values) if isinstance(node.op, ast.And) else any(values), node, "fold")
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left] + node.comparators
+        if not all(isinstance(operand, ast.Constant) and isinstance(operand.value, FOLDABLE_TYPES) for operand in operands):
+            return node
+        result = True
+        try:
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                compare = COMPARISONS.get(type(op))
+                if compare is None:
+                    return node
+                result = result and compare(left.value, right.value)
+        except TypeError:
+            return node
+        return self.constant(result, node, "fold")
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        truth = self.truth(node.test)
+        if truth is None:
+            return node
+        branch = node.body if truth else node.orelse
+        self.record("branch", node, branch)
+        return branch
+
+    def visit_JoinedStr(self, node):
+        self.generic_visit(node)
+        values = []
+        changed = False
+        for value in node.values:
+            text = self.formatted_constant(value)
+            if text is None:
+                values.append(value)
+                continue
+            changed = changed or not isinstance(value, ast.Constant)
+            if values and isinstance(values[-1], ast.Constant):
+                values[-1] = ast.Constant(value=values[-1].value + text)
+            else:
+                values.append(ast.Constant(value=text))
+        if len(values) == 1 and isinstance(values[0], ast.Constant):
+            return self.constant(values[0].value, node, "fstring")
+        if not changed:
+            return node
+        folded = ast.copy_location(ast.JoinedStr(values=values), node)
+        self.record("fstring", node, folded)
+        return folded
+
+    def formatted_constant(self, value):
+        """Text of an f-string part that is known at conversion time, or None."""
+        if isinstance(value, ast.Constant):
+            return value.value
+        if value.format_spec is not None or value.conversion not in (-1, ord("s")) or not isinstance(value.value, ast.Constant):
+            return None
+        text = berry_string(value.value.value)
+        # Literal parts of a partly constant f-string end up in a format string, where % is special
+        if text is None or "%" in text:
+            return None
+        return text
+
+    def visit_If(self, node):
+        self.generic_visit(node)
+        truth = self.truth(node.test)
+        if truth is None:
+            return node
+        statements = node.body if truth else node.orelse
+        self.report.append({"line": node.lineno, "kind": "branch", "before": f"if {ast.unparse(node.test)}", "after": f"{len(statements)} statement(s) kept"})
+        return statements
+
+    def visit_While(self, node):
+        self.generic_visit(node)
+        if self.truth(node.test) is False:
+            self.report.append({"line": node.lineno, "kind": "branch", "before": f"while {ast.unparse(node.test)}", "after": f"{len(node.orelse)} statement(s) kept"})
+            return node.orelse
+        return node
+
+    def truth(self, test):
+        """True or False when the test is a constant with the same truthiness in Python and Berry."""
+        if isinstance(test, ast.Constant) and (test.value is None or isinstance(test.value, (bool, int, float))):
+            return bool(test.value)
+        return None
+
+
+def pool_name(taken):
+    """The first of S0, S1, ... not used in the module; short, so each reference costs few bytes."""
+    index = 0
+    while f"S{index}" in taken:
+        index += 1
+    return f"S{index}"
+
+
+def berry_literal(value):
+    """The string as the converter writes it."""
+    return "'" + value.replace("\n", "\\n") + "'"
+
+
+def is_docstring(statement):
+    return isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant) and isinstance(statement.value.value, str)
+
+
+class StringPooler(ast.NodeTransformer):
+    """Hoists string literals used by at least threshold functions into one shared constant.
+
+    Literals shared only by methods of one class become a class static read as self.S<n>; the others
+    become module-level vars. A literal is only pooled when its references and declaration are shorter
+    than the copies they replace. Parts of f-strings and docstrings are left alone.
+    """
+
+    def __init__(self, threshold=2, min_length=4, report=None):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.report = report if report is not None else []
+        self.replacements = {}  # id of a pooled Constant -> the Name or self.Attribute replacing it
+
+    def literals(self, function):
+        """String constants in a function body, outside f-strings and docstrings."""
+        found = []
+        stack = [statement for index, statement in enumerate(function.body) if not (index == 0 and is_docstring(statement))]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.JoinedStr):
+                continue
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and len(node.value) >= self.min_length:
+                found.append(node)
+            stack.extend(ast.iter_child_nodes(node))
+        return found
+
+    def visit_Module(self, node):
+        taken = {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+        taken.update(child.attr for child in ast.walk(node) if isinstance(child, ast.Attribute))
+        taken.update(child.name for child in ast.walk(node) if isinstance(child, (ast.FunctionDef, ast.ClassDef)))
+        # literal -> {id of the owning class, or None for module functions: [(function, constant)]}
+        uses = {}
+        for owner, function in self.functions(node):
+            for constant in self.literals(function):
+                uses.setdefault(constant.value, {}).setdefault(id(owner) if owner else None, []).append((function, constant))
+
+        module_vars = []
+        statics = {}
+        owners = {id(owner): owner for owner, _ in self.functions(node) if owner is not None}
+        for value in sorted(uses):
+            by_owner = uses[value]
+            functions = {id(function) for occurrences in by_owner.values() for function, _ in occurrences}
+            if len(functions) < self.threshold:
+                continue
+            name = pool_name(taken)
+            occurrences = [constant for entries in by_owner.values() for _, constant in entries]
+            line = min(constant.lineno for constant in occurrences)
+            class_scope = len(by_owner) == 1 and None not in by_owner
+            reference = f"self.{name}" if class_scope else name
+            literal = berry_literal(value)
+            declaration_size = len(f"{'static' if class_scope else 'var'} {name} = {literal}\n".encode())
+            bytes_saved = len(occurrences) * (len(literal.encode()) - len(reference)) - declaration_size
+            if bytes_saved <= 0:
+                # Too short or too rare to pay for its declaration
+                continue
+            taken.add(name)
+            if class_scope:
+                owner = owners[next(iter(by_owner))]
+                statics.setdefault(id(owner), []).append((name, value, line))
+                for constant in occurrences:
+                    self.replacements[id(constant)] = ast.Attribute(value=ast.Name(id="self", ctx=ast.Load()), attr=name, ctx=ast.Load())
+            else:
+                module_vars.append((name, value, line))
+                for constant in occurrences:
+                    self.replacements[id(constant)] = ast.Name(id=name, ctx=ast.Load())
+            self.report.append(
+                {
+                    "kind": "pool",
+                    "line": line,
+                    "before": literal,
+                    "after": reference,
+                    "functions": len(functions),
+                    "occurrences": len(occurrences),
+                    "constants_saved": len(functions) - 1,
+                    "bytes_saved": bytes_saved,
+                }
+            )
+
+        self.generic_visit(node)
+        for owner_id, pooled in statics.items():
+            owner = owners[owner_id]
+            self.insert(owner, [self.declaration(name, value, line, static=True) for name, value, line in pooled])
+        self.insert(node, [self.declaration(name, value, line) for name, value, line in module_vars])
+        return node
+
+    def insert(self, scope, declarations):
+        # After the docstring, before any code that reads the constants
+        position = 1 if scope.body and is_docstring(scope.body[0]) else 0
+        scope.body[position:position] = declarations
+
+    def functions(self, module):
+        for statement in module.body:
+            if isinstance(statement, ast.FunctionDef):
+                yield None, statement
+            elif isinstance(statement, ast.ClassDef):
+                for member in statement.body:
+                    if isinstance(member, ast.FunctionDef):
+                        # Without self, e.g. a static method, only a module var can be reached
+                        has_self = member.args.args and member.args.args[0].arg == "self"
+                        yield (statement if has_self else None), member
+
+    def visit_Constant(self, node):
+        replacement = self.replacements.get(id(node))
+        return node if replacement is None else ast.fix_missing_locations(ast.copy_location(replacement, node))
+
+    def declaration(self, name, value, lineno, static=False):
+        assign = ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=ast.Constant(value=value), lineno=lineno)
+        assign.berry_static = static
+        return ast.fix_missing_locations(assign)
+
+
+# Builtins whose generator argument is folded into an accumulator: initial value and temporary prefix
+AGGREGATES = {"sum": (0, "_sum"), "any": (False, "_any"), "all": (True, "_all")}
+COMPREHENSIONS = (ast.ListComp, ast.DictComp, ast.SetComp, ast.GeneratorExp)
+
+
+def load(name):
+    return ast.Name(id=name, ctx=ast.Load())
+
+
+def store(name):
+    return ast.Name(id=name, ctx=ast.Store())
+
+
+def is_aggregate(node):
+    """sum/any/all over a single generator or list comprehension."""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in AGGREGATES
+        and len(node.args) == 1
+        and not node.keywords
+        and isinstance(node.args[0], (ast.GeneratorExp, ast.ListComp))
+    )
+
+
+def range_bounds(node):
+    """(start, stop, step) of a range() call with constant int arguments, else None."""
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range") or node.keywords:
+        return None
+    try:
+        bounds = [ast.literal_eval(arg) for arg in node.args]
+    except ValueError:
+        return None
+    if not 1 <= len(bounds) <= 3 or not all(type(bound) is int for bound in bounds):
+        return None
+    return range(*bounds)
+
+
+# "for" followed by a word boundary; the character before is checked separately, as a leading \b
+# keeps the regex engine from scanning for the literal
+FOR_KEYWORD = re.compile(r"for\b")
+BLOCK_STATEMENTS = frozenset(
+    (
+        ast.FunctionDef,
+        ast.AsyncFunctionDef,
+        ast.ClassDef,
+        ast.For,
+        ast.AsyncFor,
+        ast.While,
+        ast.If,
+        ast.With,
+        ast.AsyncWith,
+        ast.Try,
+        ast.TryStar,
+    )
+)
+
+
+def may_have_comprehensions(tree, source_code):
+    """False only when the module parsed from source_code has no comprehension.
+
+    Every for statement and every comprehension generator spells one for keyword, while strings, comments
+    and statements this count skips (such as match) can only add more, so a source with no more for words
+    than counted for statements has no generators. Runs on every conversion, so it only visits block statements.
+    """
+    words = 0
+    for match in FOR_KEYWORD.finditer(source_code):
+        start = match.start()
+        if start == 0 or not (source_code[start - 1].isalnum() or source_code[start - 1] == "_"):
+            words += 1
+    loops = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for field in ("body", "orelse", "finalbody"):
+            for child in getattr(node, field, ()):
+                if type(child) in BLOCK_STATEMENTS:
+                    stack.append(child)
+                    if type(child) is ast.For or type(child) is ast.AsyncFor:
+                        loops += 1
+        stack.extend(getattr(node, "handlers", ()))
+    return words > loops
+
+
+class ComprehensionLowerer(ast.NodeTransformer):
+    """Turns comprehensions into loops emitted just before the statement that uses them.
+
+    The result goes into a temporary, preallocated with resize() when a single unfiltered loop runs over a
+    constant range or a sized container. A generator or list comprehension passed to sum, any or all
+    becomes an accumulating loop, without an intermediate list.
+    """
+
+    def __init__(self):
+        self.counter = 0
+        self.prelude = None
+        self.result_name = None  # Variable the next result is built in directly, see lower_expressions
+        self.visitors = {
+            ast.Module: self.visit_Module,
+            ast.Lambda: self.visit_Lambda,
+            ast.BoolOp: self.visit_BoolOp,
+            ast.IfExp: self.visit_IfExp,
+            ast.Call: self.visit_Call,
+            ast.ListComp: self.visit_ListComp,
+            ast.GeneratorExp: self.visit_GeneratorExp,
+            ast.DictComp: self.visit_DictComp,
+            ast.SetComp: self.visit_SetComp,
+            ast.Name: self.leaf,
+            ast.Constant: self.leaf,
+        }
+
+    def leaf(self, node):
+        return node
+
+    def visit(self, node):
+        # This pass runs on every conversion, so it dispatches by exact type as NameRewriter does
+        visitor = self.visitors.get(type(node))
+        if visitor is not None:
+            return visitor(node)
+        return self.generic_visit(node) if node._fields else node
+
+    def generic_visit(self, node):
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if type(value) is list:
+                for index, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        value[index] = self.visit(item)
+            elif isinstance(value, ast.AST):
+                setattr(node, field, self.visit(value))
+        return node
+
+    def temporary(self, prefix):
+        if self.result_name is not None:
+            name, self.result_name = self.result_name, None
+            return name
+        name = f"{prefix}{self.counter}"
+        self.counter += 1
+        return name
+
+    def lower_body(self, statements):
+        lowered = []
+        for statement in statements:
+            for field in ("body", "orelse", "finalbody"):
+                if isinstance(getattr(statement, field, None), list):
+                    setattr(statement, field, self.lower_body(getattr(statement, field)))
+            for handler in getattr(statement, "handlers", []):
+                handler.body = self.lower_body(handler.body)
+            self.prelude = []
+            self.lower_expressions(statement)
+            lowered.extend(self.prelude)
+            if not self.is_self_assignment(statement):
+                lowered.append(statement)
+        return lowered
+
+    def is_self_assignment(self, statement):
+        # "x = x", left when the result was built in x directly
+        return (
+            isinstance(statement, ast.Assign)
+            and len(statement.targets) == 1
+            and isinstance(statement.targets[0], ast.Name)
+            and isinstance(statement.value, ast.Name)
+            and statement.targets[0].id == statement.value.id
+        )
+
+    def lower_expressions(self, statement):
+        """Lower the comprehensions evaluated once, before the statement runs."""
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return
+        if isinstance(statement, ast.While):
+            if any(isinstance(child, COMPREHENSIONS) for child in ast.walk(statement.test)):
+                raise ValueError(f"Comprehension in a while condition cannot be lowered: {ast.unparse(statement.test)}")
+            return
+        if isinstance(statement, (ast.For, ast.AsyncFor)):
+            statement.iter = self.visit(statement.iter)
+        elif isinstance(statement, ast.If):
+            statement.test = self.visit(statement.test)
+        elif isinstance(statement, (ast.With, ast.AsyncWith)):
+            for item in statement.items:
+                item.context_expr = self.visit(item.context_expr)
+        elif isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+            # "x = [...]" builds the result in x, unless the comprehension reads x
+            target = statement.targets[0].id
+            value = statement.value
+            if (isinstance(value, (ast.ListComp, ast.DictComp, ast.GeneratorExp)) or is_aggregate(value)) and not any(
+                isinstance(child, ast.Name) and child.id == target for child in ast.walk(value)
+            ):
+                self.result_name = target
+            statement.value = self.visit(value)
+            self.result_name = None
+        elif not isinstance(statement, ast.Try):
+            self.generic_visit(statement)
+
+    def visit_Module(self, node):
+        node.body = self.lower_body(node.body)
+        return node
+
+    def visit_Lambda(self, node):
+        if any(isinstance(child, COMPREHENSIONS) for child in ast.walk(node.body)):
+            raise ValueError(f"Comprehension inside a lambda cannot be lowered: {ast.unparse(node)}")
+        return node
+
+    def visit_BoolOp(self, node):
+        node.values[0] = self.visit(node.values[0])
+        self.conditional(node.values[1:], node)
+        return node
+
+    def visit_IfExp(self, node):
+        node.test = self.visit(node.test)
+        self.conditional([node.body, node.orelse], node)
+        return node
+
+    def conditional(self, parts, node):
+        # Hoisting would evaluate these even when Python skips them
+        for part in parts:
+            if any(isinstance(child, COMPREHENSIONS) for child in ast.walk(part)):
+                raise ValueError(f"Comprehension in a conditionally evaluated operand cannot be lowered: {ast.unparse(node)}")
+
+    def visit_Call(self, node):
+        if is_aggregate(node):
+            return ast.copy_location(self.accumulate(node.func.id, node.args[0]), node)
+        return self.generic_visit(node)
+
+    def visit_ListComp(self, node):
+        return ast.copy_location(self.collect(node), node)
+
+    def visit_GeneratorExp(self, node):
+        # Anywhere but in sum/any/all the values are materialized
+        return ast.copy_location(self.collect(node), node)
+
+    def visit_DictComp(self, node):
+        result = self.temporary("_map")
+        self.emit(ast.Assign(targets=[store(result)], value=ast.Dict(keys=[], values=[])), node)
+        item = ast.Assign(targets=[ast.Subscript(value=load(result), slice=node.key, ctx=ast.Store())], value=node.value)
+        self.emit(self.loops(node.generators, [item]), node)
+        return ast.copy_location(load(result), node)
+
+    def visit_SetComp(self, node):
+        raise ValueError(f"Set comprehensions have no Berry equivalent: {ast.unparse(node)}")
+
+    def collect(self, node):
+        result = self.temporary("_list")
+        self.emit(ast.Assign(targets=[store(result)], value=ast.List(elts=[], ctx=ast.Load())), node)
+        generator = node.generators[0]
+        length, index = self.known_length(node)
+        if length is None:
+            item = ast.Expr(ast.Call(func=ast.Attribute(value=load(result), attr="push", ctx=ast.Load()), args=[node.elt], keywords=[]))
+            self.emit(self.loops(node.generators, [item]), node)
+            return load(result)
+
+        self.emit(ast.Expr(ast.Call(func=ast.Attribute(value=load(result), attr="resize", ctx=ast.Load()), args=[length], keywords=[])), node)
+        body = []
+        if index is None:
+            counter = self.temporary("_index")
+            self.emit(ast.Assign(targets=[store(counter)], value=ast.Constant(0)), node)
+            index = load(counter)
+            body.append(ast.AugAssign(target=store(counter), op=ast.Add(), value=ast.Constant(1)))
+        body.insert(0, ast.Assign(targets=[ast.Subscript(value=load(result), slice=index, ctx=ast.Store())], value=node.elt))
+        self.emit(self.loops([generator], body), node)
+        return load(result)
+
+    def known_length(self, node):
+        """(length, index) expressions for a single unfiltered loop of known size; index is None when a counter is needed."""
+        if len(node.generators) != 1 or node.generators[0].ifs or node.generators[0].is_async:
+            return None, None
+        generator = node.generators[0]
+        bounds = range_bounds(generator.iter)
+        if bounds is not None:
+            index = None
+            if bounds.step == 1 and isinstance(generator.target, ast.Name):
+                index = load(generator.target.id)
+                if bounds.start:
+                    index = ast.BinOp(left=index, op=ast.Sub(), right=ast.Constant(bounds.start))
+            return ast.Constant(len(bounds)), index
+        if isinstance(generator.iter, (ast.Name, ast.Attribute)):
+            return ast.Call(func=load("size"), args=[generator.iter], keywords=[]), None
+        return None, None
+
+    def accumulate(self, function, node):
+        initial, prefix = AGGREGATES[function]
+        result = self.temporary(prefix)
+        self.emit(ast.Assign(targets=[store(result)], value=ast.Constant(initial)), node)
+        if function == "sum":
+            body = [ast.AugAssign(target=store(result), op=ast.Add(), value=node.elt)]
+        else:
+            # any stops at the first true value, all at the first false one
+            test = node.elt if function == "any" else ast.UnaryOp(op=ast.Not(), operand=node.elt)
+            body = [ast.If(test=test, body=[ast.Assign(targets=[store(result)], value=ast.Constant(not initial))], orelse=[])]
+            if len(node.generators) == 1:
+                body[0].body.append(ast.Break())
+        self.emit(self.loops(node.generators, body), node)
+        return load(result)
+
+    def loops(self, generators, body):
+        """Nested for/if statements running body for every item the generators produce."""
+        for generator in reversed(generators):
+            if generator.is_async:
+                raise ValueError("Async comprehensions have no Berry equivalent")
+            for condition in reversed(generator.ifs):
+                body = [ast.If(test=condition, body=body, orelse=[])]
+            body = [ast.For(target=generator.target, iter=generator.iter, body=body, orelse=[])]
+        return body[0]
+
+    def emit(self, statement, origin):
+        # Generated statements map to the line of the comprehension they come from
+        for child in ast.walk(statement):
+            if "lineno" in child._attributes and not hasattr(child, "lineno"):
+                ast.copy_location(child, origin)
+        # Comprehensions nested in the generated statements are lowered into their own preludes
+        previous = self.prelude
+        self.prelude = []
+        lowered = self.lower_body([statement])
+        self.prelude = previous
+        self.prelude.extend(lowered)
+
+
+LOOPS = (ast.For, ast.While)
+
+
+def statements(node):
+    """Every statement nested in node, without walking into expressions."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for field in ("body", "orelse", "finalbody"):
+            children = getattr(node, field, None)
+            if isinstance(children, list):
+                stack.extend(children)
+                yield from children
+        for handler in getattr(node, "handlers", []):
+            stack.extend(handler.body)
+            yield from handler.body
+
+
+def module_bindings(module):
+    """Names bound at module level, outside function and class bodies."""
+    names = set()
+    stack = list(module.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            continue
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+class LoopInvariantHoister(ast.NodeTransformer):
+    """Reads self.member and module globals once before a loop instead of on every iteration.
+
+    A member is cached when the loop never assigns or deletes it and makes no call at all: any call, such
+    as tasmota.delay() or a method of self, can run other drivers, timers or MQTT callbacks that change
+    it. A global is cached when no function declares it global. The test of a while loop is never
+    cached, as it is how a loop polls for a change. Only single member reads are cached: a longer chain
+    could fail on a nil member the loop body would have checked first. Methods and members holding
+    callables are never cached, as a cached method would lose self.
+    """
+
+    def __init__(self, report=None):
+        self.report = report if report is not None else []
+        self.globals = set()
+        self.taken = set()  # Cache names in use; module globals plus the names of each function walked
+        self.function = None
+        self.locals = None
+        self.callables = set()  # Members of the current function's class that must keep self, see callable_members
+        self.replacements = {}  # id of a cached read -> name of the local holding it
+
+    def visit_Module(self, node):
+        declared = set()
+        functions = []
+        for statement in statements(node):
+            if isinstance(statement, ast.Global):
+                declared.update(statement.names)
+            elif isinstance(statement, ast.FunctionDef):
+                functions.append(statement)
+        self.globals = module_bindings(node) - declared
+        self.taken.update(self.globals)
+        module_functions = {statement.name for statement in node.body if isinstance(statement, ast.FunctionDef)}
+        callables = {}  # id of a function -> callable members of its class
+        for statement in statements(node):
+            if isinstance(statement, ast.ClassDef):
+                members = self.callable_members(statement, module_functions)
+                for child in statements(statement):
+                    if isinstance(child, ast.FunctionDef):
+                        callables[id(child)] = members
+        for function in functions:
+            self.function = function
+            self.locals = None
+            self.callables = callables.get(id(function), set())
+            function.body = self.hoist_body(function.body)
+        return node
+
+    def callable_members(self, cls, module_functions):
+        """Methods, and members holding functions or method references, of a class.
+
+        Read as a value, a method is unbound in Berry; the converter only keeps self for references it
+        sees written as self.method, so these reads stay where they are.
+        """
+        members = {member.name for member in cls.body if isinstance(member, ast.FunctionDef)}
+        for child in ast.walk(cls):
+            if not isinstance(child, ast.Assign):
+                continue
+            value = child.value
+            if isinstance(value, (ast.Lambda, ast.Attribute)) or (isinstance(value, ast.Name) and value.id in module_functions):
+                for target in child.targets:
+                    if self.is_member(target):
+                        members.add(target.attr)
+                    elif isinstance(target, ast.Name) and child in cls.body:
+                        members.add(target.id)
+        return members
+
+    def function_names(self):
+        """Names bound in the current function, found on its first loop; functions without loops are not walked."""
+        if self.locals is None:
+            arguments = self.function.args
+            self.locals = {arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+            self.locals.update(arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None)
+            for child in ast.walk(self.function):
+                if isinstance(child, ast.Name):
+                    self.taken.add(child.id)
+                    if not isinstance(child.ctx, ast.Load):
+                        self.locals.add(child.id)
+                elif isinstance(child, ast.ExceptHandler) and child.name:
+                    self.locals.add(child.name)
+        return self.locals
+
+    def hoist_body(self, statements):
+        result = []
+        for statement in statements:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                result.append(statement)
+                continue
+            if isinstance(statement, LOOPS):
+                result.extend(self.hoist_loop(statement))
+            for field in ("body", "orelse", "finalbody"):
+                if isinstance(getattr(statement, field, None), list):
+                    setattr(statement, field, self.hoist_body(getattr(statement, field)))
+            for handler in getattr(statement, "handlers", []):
+                handler.body = self.hoist_body(handler.body)
+            result.append(statement)
+        return result
+
+    def hoist_loop(self, loop):
+        """Assignments caching the loop's invariant lookups, whose reads in the loop now use the cache."""
+        # A for loop evaluates its iterable once; a while test is left alone but can call, so it counts as a barrier
+        nodes = [child for statement in loop.body for child in ast.walk(statement)]
+        if any(isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef, ast.Global, ast.Nonlocal)) for child in nodes):
+            return []
+        local_names = self.function_names()
+        tested = list(ast.walk(loop.test)) if isinstance(loop, ast.While) else []
+        members_stable = not any(isinstance(child, ast.Call) for child in nodes + tested)
+        written = {child.attr for child in nodes if self.is_member(child) and not isinstance(child.ctx, ast.Load)}
+
+        reads = {}
+        for child in nodes:
+            if (
+                self.is_member(child)
+                and isinstance(child.ctx, ast.Load)
+                and members_stable
+                and child.attr not in written
+                and child.attr not in self.callables
+            ):
+                reads.setdefault(f"self.{child.attr}", []).append(child)
+            elif isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load) and child.id in self.globals and child.id not in local_names:
+                reads.setdefault(child.id, []).append(child)
+        assignments = []
+        for lookup, occurrences in reads.items():
+            cache = self.cache_name(lookup.rpartition(".")[2])
+            value = name_node(lookup)
+            assignments.append(ast.fix_missing_locations(ast.copy_location(ast.Assign(targets=[ast.Name(id=cache, ctx=ast.Store())], value=value), loop)))
+            for occurrence in occurrences:
+                self.replacements[id(occurrence)] = cache
+            self.report.append({"line": loop.lineno, "kind": "hoist", "before": lookup, "after": cache, "lookups": len(occurrences)})
+        if self.replacements:
+            loop.body = [self.visit(statement) for statement in loop.body]
+            self.replacements = {}
+        return assignments
+
+    def is_member(self, node):
+        return isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "self"
+
+    def cache_name(self, base):
+        name = f"_{base}"
+        suffix = 1
+        while name in self.taken:
+            suffix += 1
+            name = f"_{base}{suffix}"
+        self.taken.add(name)
+        self.locals.add(name)
+        return name
+
+    def visit_Name(self, node):
+        return self.cached(node)
+
+    def visit_Attribute(self, node):
+        if id(node) in self.replacements:
+            return self.cached(node)
+        return self.generic_visit(node)
+
+    def cached(self, node):
+        cache = self.replacements.get(id(node))
+        return node if cache is None else ast.copy_location(ast.Name(id=cache, ctx=ast.Load()), node)
+
+
+def is_string(node):
+    """An expression whose value is a str whatever its operands hold."""
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, str)
+    if isinstance(node, ast.JoinedStr):
+        return True
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Add):
+            return is_string(node.left) or is_string(node.right)
+        return isinstance(node.op, ast.Mod) and is_string(node.left)
+    if isinstance(node, ast.IfExp):
+        return is_string(node.body) and is_string(node.orelse)
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "str"
+
+
+def is_str_annotation(annotation):
+    return isinstance(annotation, ast.Name) and annotation.id == "str"
+
+
+class StringAccumulationRewriter(ast.NodeTransformer):
+    """Collects pieces of strings grown with += in a loop into a list, joined once with concat() after it.
+
+    Berry strings are immutable, so s += piece copies the whole string on every iteration. A local is
+    rewritten when every binding in its function gives it a str, and the loop touches it only through
+    += (no other reads, so nobody sees the string while it is incomplete). Loops with an else branch or
+    inside a try body are left alone, as an exception would leave the string without its last pieces.
+    """
+
+    def __init__(self, report=None):
+        self.report = report if report is not None else []
+        self.taken = set()
+        self.strings = set()
+        self.replacements = {}  # id of a rewritten += -> the push replacing it
+
+    def visit_Module(self, node):
+        self.taken = {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+        for statement in statements(node):
+            if isinstance(statement, ast.FunctionDef):
+                self.strings = self.string_locals(statement)
+                if self.strings:
+                    statement.body = self.rewrite_body(statement.body)
+        return node
+
+    def string_locals(self, function):
+        """Names every binding of which in the function is a str."""
+        arguments = function.args
+        candidates, others = set(), set()
+        for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs:
+            (candidates if is_str_annotation(arg.annotation) else others).add(arg.arg)
+        others.update(arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None)
+        typed = set()  # ids of the Name targets classified below
+        for child in ast.walk(function):
+            if isinstance(child, (ast.Global, ast.Nonlocal)):
+                others.update(child.names)
+            elif isinstance(child, ast.Assign):
+                for target in child.targets:
+                    if isinstance(target, ast.Name):
+                        typed.add(id(target))
+                        (candidates if is_string(child.value) else others).add(target.id)
+            elif isinstance(child, ast.AnnAssign) and isinstance(child.target, ast.Name):
+                typed.add(id(child.target))
+                string = is_str_annotation(child.annotation) or (child.value is not None and is_string(child.value))
+                (candidates if string else others).add(child.target.id)
+            elif isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name):
+                typed.add(id(child.target))
+                if not isinstance(child.op, ast.Add):
+                    others.add(child.target.id)
+            elif isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load) and id(child) not in typed:
+                # Loop targets, with ... as, deletes and other bindings of unknown type
+                others.add(child.id)
+            elif isinstance(child, ast.ExceptHandler) and child.name:
+                others.add(child.name)
+        return candidates - others
+
+    def rewrite_body(self, statements, in_try=False):
+        result = []
+        for statement in statements:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                result.append(statement)
+                continue
+            after = []
+            if isinstance(statement, LOOPS) and not in_try and not statement.orelse:
+                before, after = self.rewrite_loop(statement)
+                result.extend(before)
+            for field in ("body", "orelse", "finalbody"):
+                if isinstance(getattr(statement, field, None), list):
+                    # Only a try body can be cut short by an exception its handlers see
+                    nested_try = in_try or (field == "body" and isinstance(statement, ast.Try))
+                    setattr(statement, field, self.rewrite_body(getattr(statement, field), nested_try))
+            for handler in getattr(statement, "handlers", []):
+                handler.body = self.rewrite_body(handler.body, in_try)
+            result.append(statement)
+            result.extend(after)
+        return result
+
+    def rewrite_loop(self, loop):
+        """Statements to put before and after the loop, for every accumulator rewritten in it."""
+        parts = loop.body + ([loop.test] if isinstance(loop, ast.While) else [])
+        nodes = [child for part in parts for child in ast.walk(part)]
+        if any(isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)) for child in nodes):
+            return [], []
+        appends = {}
+        for child in nodes:
+            if isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name) and child.target.id in self.strings:
+                appends.setdefault(child.target.id, []).append(child)
+        # The target of each += is a Store; any other appearance of the name reads or rebinds it
+        for child in nodes:
+            if isinstance(child, ast.Name) and child.id in appends and not any(child is append.target for append in appends[child.id]):
+                del appends[child.id]
+
+        before, after = [], []
+        for name, augmented in appends.items():
+            pieces = self.pieces_name(name)
+            for node in augmented:
+                self.replacements[id(node)] = ast.Expr(
+                    ast.Call(func=ast.Attribute(value=ast.Name(id=pieces, ctx=ast.Load()), attr="push", ctx=ast.Load()), args=[node.value], keywords=[])
+                )
+            before.append(ast.Assign(targets=[ast.Name(id=pieces, ctx=ast.Store())], value=ast.List(elts=[ast.Name(id=name, ctx=ast.Load())], ctx=ast.Load())))
+            concat = ast.Call(func=ast.Attribute(value=ast.Name(id=pieces, ctx=ast.Load()), attr="concat", ctx=ast.Load()), args=[], keywords=[])
+            after.append(ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=concat))
+            self.report.append({"line": loop.lineno, "kind": "concat", "before": f"{name} +=", "after": f"{pieces}.concat()", "appends": len(augmented)})
+        if appends:
+            loop.body = [self.visit(statement) for statement in loop.body]
+            self.replacements = {}
+        located = [ast.fix_missing_locations(ast.copy_location(statement, loop)) for statement in before + after]
+        return located[: len(before)], located[len(before) :]
+
+    def pieces_name(self, name):
+        pieces = f"_{name}_parts"
+        suffix = 1
+        while pieces in self.taken:
+            suffix += 1
+            pieces = f"_{name}_parts{suffix}"
+        self.taken.add(pieces)
+        return pieces
+
+    def visit_AugAssign(self, node):
+        replacement = self.replacements.get(id(node))
+        return node if replacement is None else ast.fix_missing_locations(ast.copy_location(replacement, node))
@@ -0,0 +1,151 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+
+SOURCE_MAP_VERSION = 1
+
+# "autoexec.be:12" in Berry tracebacks, compile errors and timing dumps
+BERRY_LOCATION = re.compile(r"(?P<file>[\w./\\-]*?(?P<name>[\w.-]+\.be)):(?P<line>\d+)")
+NUMBER = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+
+class SourceMap:
+    """Maps generated Berry lines back to Python file:line.
+
+    Stored as runs: each [berry_line, source_index, python_line] entry applies until the next one, so a
+    block of Berry lines generated from one statement costs a single entry.
+    """
+
+    def __init__(self, file=None, sources=None):
+        self.file = file
+        self.sources = list(sources or [])
+        self.runs = []
+        self.starts = []
+
+    def source_index(self, source):
+        if source not in self.sources:
+            self.sources.append(source)
+        return self.sources.index(source)
+
+    def add(self, berry_line, source, python_line):
+        index = self.source_index(source) if python_line is not None else -1
+        if self.runs and self.runs[-1][1:] == [index, python_line]:
+            return
+        self.runs.append([berry_line, index, python_line])
+        self.starts.append(berry_line)
+
+    def lookup(self, berry_line):
+        """(source, python_line) for a Berry line, or None when it has no Python origin."""
+        position = bisect.bisect_right(self.starts, berry_line) - 1
+        if position < 0:
+            return None
+        _, index, python_line = self.runs[position]
+        if index < 0:
+            return None
+        return self.sources[index], python_line
+
+    def to_dict(self):
+        return {"version": SOURCE_MAP_VERSION, "file": self.file, "sources": self.sources, "runs": self.runs}
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != SOURCE_MAP_VERSION:
+            raise ValueError(f"Unsupported source map version: {data.get('version')}")
+        source_map = cls(data.get("file"), data["sources"])
+        source_map.runs = [list(run) for run in data["runs"]]
+        source_map.starts = [run[0] for run in source_map.runs]
+        return source_map
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as file:
+            return cls.from_dict(json.load(file))
+
+
+def map_path(berry_path):
+    return f"{berry_path}.map"
+
+
+class SourceMapResolver:
+    """Finds and caches the .be.map file for Berry file names as they appear on the device."""
+
+    def __init__(self, search_dirs=(".",)):
+        self.search_dirs = list(search_dirs)
+        self.maps = {}
+
+    def find(self, name):
+        if name not in self.maps:
+            self.maps[name] = None
+            for directory in self.search_dirs:
+                path = map_path(os.path.join(directory, name))
+                if os.path.exists(path):
+                    self.maps[name] = SourceMap.load(path)
+                    break
+        return self.maps[name]
+
+    def resolve(self, name, berry_line):
+        source_map = self.find(name)
+        return source_map.lookup(berry_line) if source_map else None
+
+
+def rewrite_locations(text, resolver):
+    """Replace every file.be:N with the Python location it was generated from, keeping the Berry one in brackets."""
+
+    def replace(match):
+        location = resolver.resolve(match.group("name"), int(match.group("line")))
+        if location is None:
+            return match.group(0)
+        return f"{location[0]}:{location[1]} [{match.group('name')}:{match.group('line')}]"
+
+    return BERRY_LOCATION.sub(replace, text)
+
+
+def aggregate_timings(lines, resolver):
+    """Sum the first number after each Berry location per Python location, slowest first."""
+    totals = {}
+    for line in lines:
+        match = BERRY_LOCATION.search(line)
+        if not match:
+            continue
+        number = NUMBER.search(line, match.end())
+        if not number:
+            continue
+        location = resolver.resolve(match.group("name"), int(match.group("line")))
+        key = f"{location[0]}:{location[1]}" if location else match.group(0)
+        totals[key] = totals.get(key, 0.0) + float(number.group(0))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rewrite Berry tracebacks and per-line timing dumps to Python locations.")
+    parser.add_argument("inputs", nargs="*", help="files to rewrite (default: stdin)")
+    parser.add_argument("--map-dir", action="append", help="directory holding the .be.map files (repeatable, default: .)")
+    parser.add_argument("--aggregate", action="store_true", help="sum per-line timings by Python location instead of rewriting")
+    args = parser.parse_args(argv)
+
+    resolver = SourceMapResolver(args.map_dir or ["."])
+    lines = []
+    if args.inputs:
+        for input_path in args.inputs:
+            with open(input_path, "r") as file:
+                lines.extend(file.read().splitlines())
+    else:
+        lines = sys.stdin.read().splitlines()
+
+    if args.aggregate:
+        for location, total in aggregate_timings(lines, resolver):
+            print(f"{total:12.3f}  {location}")
+    else:
+        for line in lines:
+            print(rewrite_locations(line, resolver))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,60 @@
+import argparse
+import json
 import os
-from berry_converter import convert_python_to_berry
+from berry_analyzer import build_report
+from berry_converter import convert_python_to_berry, ConversionCache, DEFAULT_CACHE_DIR
 
 
 def main():
-    input_file = "autoexec/autoexec.py"
+    parser = argparse.ArgumentParser(description="Convert autoexec Python sources to Berry.")
+    parser.add_argument("input_files", nargs="*", default=["autoexec/autoexec.py"])
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached output and convert every file again")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--minify", action="store_true", help="strip indentation, shorten locals and drop redundant parentheses")
+    parser.add_argument("--fold-constants", action="store_true", help="fold constant expressions and drop dead branches")
+    parser.add_argument("--hoist-invariants", action="store_true", help="read loop-invariant members and globals once before each loop")
+    parser.add_argument("--concat-strings", action="store_true", help="build strings grown with += in loops from a list joined once")
+    parser.add_argument(
+        "--pool-strings", type=int, nargs="?", const=2, default=0, metavar="N", help="share string literals used by N or more functions (default N: 2)"
+    )
+    parser.add_argument("--report", action="store_true", help="list every optimization applied (converts without the cache)")
+    parser.add_argument("--no-source-map", action="store_true", help="do not write <file>.be.map next to the output")
+    parser.add_argument("--analyze", metavar="REPORT", help="write a per-callback cost report (JSON) for the converted files")
+    args = parser.parse_args()
 
-    if not os.path.exists(input_file):
-        print(f"Error: {input_file} does not exist.")
-        return
+    cache = None if args.no_cache else ConversionCache(args.cache_dir)
+    for input_file in args.input_files:
+        if not os.path.exists(input_file):
+            print(f"Error: {input_file} does not exist.")
+            continue
 
-    convert_python_to_berry(input_file)
+        convert_python_to_berry(
+            input_file,
+            cache=cache,
+            minify=args.minify,
+            fold_constants=args.fold_constants,
+            pool_strings=args.pool_strings,
+            hoist_invariants=args.hoist_invariants,
+            concat_strings=args.concat_strings,
+            report=[] if args.report else None,
+            source_map=not args.no_source_map,
+        )
+
+    if cache is not None:
+        print(f"Cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+
+    if args.analyze:
+        report = build_report(
+            [path for path in args.input_files if os.path.exists(path)],
+            minify=args.minify,
+            fold_constants=args.fold_constants,
+            pool_strings=args.pool_strings,
+            hoist_invariants=args.hoist_invariants,
+            concat_strings=args.concat_strings,
+        )
+        with open(args.analyze, "w") as file:
+            json.dump(report, file, indent=4)
+        print(f"Cost report written to {args.analyze}: {report['summary']['over_budget']} callback(s) over budget")
 
 
 if __name__ == "__main__":
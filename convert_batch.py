@@ -0,0 +1,102 @@
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from berry_converter import convert_file, minify_sizes, format_sizes, ConversionCache, DEFAULT_CACHE_DIR
+
+EXIT_OK = 0
+EXIT_CONVERSION_FAILED = 1
+EXIT_NO_INPUT = 2
+
+
+def collect_inputs(patterns):
+    """Expand files, directories (recursively) and glob patterns into a sorted list of Python files."""
+    inputs = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "**", "*.py"), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        inputs.update(os.path.normpath(path) for path in matches if path.endswith(".py") and os.path.isfile(path))
+    return sorted(inputs)
+
+
+def convert_one(input_file, cache_dir, options=None):
+    # Runs in a worker process: every file gets its own converter and cache counters
+    cache = ConversionCache(cache_dir) if cache_dir else None
+    sizes = None
+    try:
+        options = options or {}
+        output_file = convert_file(input_file, cache=cache, **options)
+        cache_hit = cache is not None and cache.hits > 0
+        if options.get("minify"):
+            sizes = minify_sizes(input_file, output_file, cache)
+    except Exception as e:
+        return input_file, None, f"{type(e).__name__}: {e}", False, None
+    return input_file, output_file, None, cache_hit, sizes
+
+
+def convert_all(input_files, jobs, cache_dir, options=None):
+    if jobs == 1 or len(input_files) < 2:
+        return [convert_one(input_file, cache_dir, options) for input_file in input_files]
+    chunksize = max(1, len(input_files) // (jobs * 4))
+    count = len(input_files)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map() yields results in input order, so output is deterministic whatever finishes first
+        return list(executor.map(convert_one, input_files, [cache_dir] * count, [options] * count, chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Python files, directories and globs to Berry in parallel.")
+    parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached output and convert every file again")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--minify", action="store_true", help="strip indentation, shorten locals and drop redundant parentheses")
+    parser.add_argument("--fold-constants", action="store_true", help="fold constant expressions and drop dead branches")
+    parser.add_argument("--hoist-invariants", action="store_true", help="read loop-invariant members and globals once before each loop")
+    parser.add_argument("--concat-strings", action="store_true", help="build strings grown with += in loops from a list joined once")
+    parser.add_argument(
+        "--pool-strings", type=int, nargs="?", const=2, default=0, metavar="N", help="share string literals used by N or more functions (default N: 2)"
+    )
+    parser.add_argument("--no-source-map", action="store_true", help="do not write <file>.be.map next to each output")
+    args = parser.parse_args(argv)
+
+    input_files = collect_inputs(args.paths)
+    if not input_files:
+        print("Error: no Python files matched.", file=sys.stderr)
+        return EXIT_NO_INPUT
+
+    options = {
+        "minify": args.minify,
+        "fold_constants": args.fold_constants,
+        "pool_strings": args.pool_strings,
+        "hoist_invariants": args.hoist_invariants,
+        "concat_strings": args.concat_strings,
+        "source_map": not args.no_source_map,
+    }
+    results = convert_all(input_files, max(1, args.jobs), None if args.no_cache else args.cache_dir, options)
+    failures = 0
+    hits = 0
+    for input_file, output_file, error, cache_hit, sizes in results:
+        if error:
+            failures += 1
+            print(f"FAILED {input_file}: {error}")
+        else:
+            hits += cache_hit
+            details = [format_sizes(*sizes)] if sizes else []
+            if cache_hit:
+                details.append("cached")
+            suffix = f" ({', '.join(details)})" if details else ""
+            print(f"ok     {input_file} -> {output_file}{suffix}")
+
+    summary = f"{len(results) - failures} converted, {failures} failed"
+    if not args.no_cache:
+        summary += f", cache: {hits} hit(s), {len(results) - failures - hits} miss(es)"
+    print(summary)
+    return EXIT_CONVERSION_FAILED if failures else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
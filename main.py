@@ -1,18 +1,23 @@
+import argparse
 from adapters.tasmota_adapter import TasmotaAdapter
 from adapters.persist_adapter import PersistAdapter
-from time import sleep
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--simulate", action="store_true", help="run on a virtual clock instead of waiting in real time")
+    parser.add_argument("--duration", type=float, default=10, help="device time to run for, in seconds")
+    args = parser.parse_args()
+
     # Create multiple instances of TasmotaAdapter with unique EUI identifiers
-    tasmota = TasmotaAdapter("EUI53EF3GD1")
+    tasmota = TasmotaAdapter("EUI53EF3GD1", simulated=args.simulate)
     tasmota.persist = PersistAdapter("./filesystem/_persist.json")
 
     # Start each TasmotaAdapter instance
     tasmota.persist.zero()
     tasmota.persist.save()
     tasmota.start()
-    sleep(10)
+    tasmota.advance(args.duration * 1000)
     tasmota.stop()
 
 
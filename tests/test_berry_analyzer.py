@@ -0,0 +1,76 @@
+import json
+from berry_analyzer import analyze_source, main
+
+SOURCE = """
+class Driver:
+    def __init__(self):
+        self.values = {}
+
+    def every_50ms(self):
+        for i in range(100):
+            for j in range(10):
+                self.values[j] = i * j
+        self.publish()
+
+    def publish(self):
+        tasmota.publish("tele/x", f"v {self.values}")
+
+    def every_second(self):
+        total = 0
+        for key in self.values:
+            total += self.values[key]
+        return total
+
+    def mqtt_data(self, topic, idx, data, databytes):
+        return [x * 2 for x in data]
+"""
+
+
+def callbacks(source, **kwargs):
+    [driver] = analyze_source(source, **kwargs)
+    return {callback["name"]: callback for callback in driver["callbacks"]}
+
+
+def test_loops_multiply_cost_and_nest():
+    result = callbacks(SOURCE)
+    assert set(result) == {"every_50ms", "every_second", "mqtt_data"}
+    fast = result["every_50ms"]
+    assert fast["max_loop_depth"] == 2
+    assert fast["instructions"] > 100 * 10 * 5
+    assert fast["calls"] == ["publish"]
+    assert fast["allocations"]["string"] == 1
+    assert fast["over_budget"] == ["instructions"]
+    assert result["every_second"]["over_budget"] == []
+
+
+def test_allocations_are_counted_per_iteration():
+    result = callbacks(SOURCE, loop_iterations=5)
+    assert result["mqtt_data"]["allocations"]["list"] == 1
+    assert result["mqtt_data"]["max_loop_depth"] == 1
+    assert callbacks("class A:\n    def every_second(self):\n        for i in range(3):\n            self.x = {}\n")["every_second"]["allocations"]["map"] == 3
+
+
+def test_cli_report_and_budgets(tmp_path, capsys):
+    driver = tmp_path / "driver.py"
+    driver.write_text(SOURCE)
+    report_path = tmp_path / "report.json"
+    assert main([str(driver), "-o", str(report_path)]) == 0
+    assert main([str(driver), "-o", str(report_path), "--fail-over-budget"]) == 1
+    assert main([str(driver), "-o", str(report_path), "--fail-over-budget", "--budget", "every_50ms=100000:10"]) == 0
+    report = json.loads(report_path.read_text())
+    assert report["summary"] == {"callbacks": 3, "over_budget": 0}
+    assert "over budget" in capsys.readouterr().err
+
+
+def test_cli_forwards_converter_options(tmp_path):
+    driver = tmp_path / "driver.py"
+    driver.write_text('class A:\n    def every_second(self):\n        text = ""\n        for i in range(10):\n            text += str(i)\n')
+    report_path = tmp_path / "report.json"
+
+    def allocations(*options):
+        assert main([str(driver), "-o", str(report_path), *options]) == 0
+        [callback] = json.loads(report_path.read_text())["files"][0]["classes"][0]["callbacks"]
+        return callback["allocations"]
+
+    assert allocations()["list"] == 0
+    assert allocations("--concat-strings")["list"] == 1
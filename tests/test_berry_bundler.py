@@ -0,0 +1,127 @@
+import pytest
+from berry_bundler import Bundler, bundle_to_file, main
+from berry_sourcemap import SourceMap, map_path
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "__init__.py").write_text("")
+    (tmp_path / "lib" / "units.py").write_text("KW = 1000\nMW = 1000000\n")
+    (tmp_path / "lib" / "fmt.py").write_text('def label(value):\n    return f"value {value}"\n\n\nclass Unused:\n    pass\n')
+    (tmp_path / "helpers.py").write_text(
+        """
+def scale(value):
+    return value * 2
+
+
+def unused_helper():
+    return 0
+
+
+if __name__ == "__main__":
+    print("helper self test")
+"""
+    )
+    (tmp_path / "main.py").write_text(
+        """
+import json
+import helpers
+from lib.fmt import label as make_label
+from lib import units
+
+
+class Meter:
+    def __init__(self):
+        self.value = 0
+
+    def every_second(self):
+        self.value = helpers.scale(self.value) + units.KW
+        print(make_label(self.value))
+
+    def never_called(self):
+        return 1
+
+
+if __name__ == "__main__":
+    tasmota.add_driver(Meter())
+"""
+    )
+    return tmp_path
+
+
+def test_bundle_keeps_reachable_code(project):
+    output_path, bundler = bundle_to_file(str(project / "main.py"))
+    expected_output = """
+def scale(value)
+    return value * 2
+end
+def label(value)
+    return string.format('value %s', value)
+end
+var KW = 1000
+class Meter
+    def init()
+        self.value = 0
+    end
+    def every_second()
+        self.value = scale(self.value) + KW
+        print(label(self.value))
+    end
+end
+tasmota.add_driver(Meter())"""
+    with open(output_path) as file:
+        assert file.read().strip() == expected_output.strip()
+    assert list(bundler.modules) == ["helpers", "lib.fmt", "lib.units", "main"]
+    assert sorted(bundler.dropped) == ["helpers.unused_helper", "lib.fmt.Unused", "lib.units.MW", "main.Meter.never_called"]
+
+    source_map = SourceMap.load(map_path(output_path))
+    assert source_map.lookup(1) == ("helpers.py", 2)
+    assert source_map.lookup(13) == ("main.py", 13)
+
+
+def test_conflicting_definitions_are_rejected(project):
+    (project / "helpers.py").write_text("class Meter:\n    pass\n")
+    (project / "main.py").write_text("from helpers import *\n\n\nclass Meter:\n    pass\n")
+    with pytest.raises(ValueError):
+        Bundler(str(project / "main.py")).bundle()
+
+
+def test_circular_imports_are_rejected(project):
+    (project / "helpers.py").write_text("import main\n")
+    with pytest.raises(ValueError):
+        Bundler(str(project / "main.py")).bundle()
+
+
+def test_cli_reports_dropped_definitions(project, capsys):
+    assert main([str(project / "main.py"), "-o", str(project / "out.be"), "--minify"]) == 0
+    output = capsys.readouterr().out
+    assert "dropped main.Meter.never_called" in output
+    assert "Kept 4 definition(s), dropped 4" in output
+
+
+def test_shadowed_aliases_are_not_rewritten(project):
+    (project / "main.py").write_text(
+        """
+from lib.fmt import label as make_label
+from lib import units
+
+
+def show(value, units):
+    for make_label in [str]:
+        print(make_label(value), units.KW)
+
+
+def report(value):
+    print(make_label(value), units.KW)
+
+
+show(1, units)
+report(2)
+"""
+    )
+    output_path, _ = bundle_to_file(str(project / "main.py"), source_map=False)
+    with open(output_path) as file:
+        output = file.read()
+    assert "print(make_label(value), units.KW)" in output
+    assert "def report(value)\n    print(label(value), KW)" in output
@@ -1,5 +1,8 @@
+import ast
+import io
 import pytest
-from berry_converter import PythonToBerryConverter
+from berry_converter import PythonToBerryConverter, BerryEmitter
+from berry_passes import NameRewriter, may_have_comprehensions
 
 
 @pytest.fixture
@@ -271,3 +274,596 @@ end
     berry_code = converter.convert(source_code)
     print(f"DEBUG: Berry code generated: {berry_code}")
     assert berry_code.strip() == expected_output.strip()
+
+
+def test_name_changes_only_rename_real_nodes(converter):
+    source_code = """
+floating = float(reading)
+data = json.loads(payload)
+message = "None of True or False"
+valid = data is not None
+"""
+    expected_output = """
+var floating = real(reading)
+var data = json.load(payload)
+var message = 'None of True or False'
+var valid = data != nil"""
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+
+
+def test_name_changes_are_extensible(converter):
+    converter.name_changes["persist.save"] = "persist.flush"
+    converter.name_changes["str"] = "tostring"
+    berry_code = converter.convert("persist.save()\nlabel = str(value)\n")
+    assert berry_code.strip() == "persist.flush()\nvar label = tostring(value)"
+
+
+def test_emitter_streams_with_bounded_buffer():
+    class RecordingSink:
+        def __init__(self):
+            self.writes = []
+
+        def write(self, text):
+            self.writes.append(text)
+
+    sink = RecordingSink()
+    emitter = BerryEmitter(sink, buffer_lines=2)
+    emitter.emit("def f(a)")
+    for index in range(6):
+        emitter.emit(f"    print({index})")
+        assert len(emitter.buffer) <= 2
+    assert sink.writes  # Written before close
+    emitter.emit("end")
+    emitter.close()
+    assert "".join(sink.writes) == "\n".join(["def f(a)"] + [f"    print({index})" for index in range(6)] + ["end"])
+    assert emitter.lines == 8
+
+
+def test_convert_to_stream_matches_convert(converter):
+    source_code = """
+class Driver:
+    def every_second(self, value: float):
+        if value is None:
+            return False
+        return True
+"""
+    sink = io.StringIO()
+    lines = PythonToBerryConverter().convert_to_stream(source_code, sink, buffer_lines=0)
+    assert sink.getvalue() == converter.convert(source_code)
+    assert lines == len(sink.getvalue().splitlines())
+
+
+def test_operator_and_expression_dispatch(converter):
+    assert converter.get_operator(ast.FloorDiv()) == "//"
+    assert converter.convert("x *= 2\n").strip() == "x *= 2"
+    assert converter.get_operator(ast.MatMult()) == ""
+    assert converter.get_node_value(ast.parse("a @ b", mode="eval").body.left) == "a"
+    assert converter.get_node_value(ast.Starred(value=ast.Name(id="a"))) == ""
+
+
+def test_minify_keeps_members_globals_and_callbacks():
+    source_code = """
+POLL_INTERVAL = 5
+
+class Driver:
+    count = None
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def mqtt_data(self, topic, idx, payload, data):
+        total = self.count * 2
+        self.count = (total + 1) * POLL_INTERVAL - (total - 3)
+        return True
+"""
+    expected_output = """
+var POLL_INTERVAL = 5
+class Driver
+var count = nil
+def init(a)
+self.interval = a
+end
+def mqtt_data(b, c, d, e)
+var f = self.count * 2
+self.count = (f + 1) * POLL_INTERVAL - (f - 3)
+return true
+end
+end"""
+    berry_code = PythonToBerryConverter(minify=True).convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+
+
+def test_minify_parentheses_follow_precedence():
+    converter = PythonToBerryConverter(minify=True)
+    assert converter.get_node_value(ast.parse("a + (b * c) - (d - e)", mode="eval").body) == "a + b * c - (d - e)"
+    assert converter.get_node_value(ast.parse("(a or b) and c == (d < e)", mode="eval").body) == "(a or b) and c == d < e"
+    assert converter.get_node_value(ast.parse("-(a + b).c", mode="eval").body) == "-(a + b).c"
+
+
+def test_minify_skips_functions_with_nested_scopes():
+    source_code = """
+def start(delay):
+    tasmota.set_timer(delay, lambda: print(delay))
+"""
+    berry_code = PythonToBerryConverter(minify=True).convert(source_code)
+    assert berry_code.splitlines()[0] == "def start(delay)"
+
+
+def test_fold_constants():
+    source_code = """
+DEBUG = False
+TIMEOUT = 60 * 1000
+NAME = "meter"
+
+def poll(x):
+    if DEBUG:
+        print("polling")
+    else:
+        print(f"{NAME} polling {x}")
+    tasmota.set_timer(TIMEOUT, poll)
+    return -7 / 2 + x ** 2
+"""
+    expected_output = """
+var DEBUG = false
+var TIMEOUT = 60000
+var NAME = 'meter'
+def poll(x)
+    print(string.format('meter polling %s', x))
+    tasmota.set_timer(60000, poll)
+    return -3 + (x ** 2)
+end"""
+    converter = PythonToBerryConverter(fold_constants=True)
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+    kinds = [entry["kind"] for entry in converter.optimization_report]
+    assert kinds.count("branch") == 1
+    assert {"line": 12, "kind": "fold", "before": "-7 / 2", "after": "-3"} in converter.optimization_report
+
+
+def test_fold_constants_leaves_rebound_names():
+    source_code = """
+LIMIT = 10
+def bump():
+    global LIMIT
+    LIMIT = LIMIT + 1
+    return LIMIT > 5
+"""
+    berry_code = PythonToBerryConverter(fold_constants=True).convert(source_code)
+    assert "return LIMIT > 5" in berry_code
+
+
+def test_fold_constants_prerenders_fstrings():
+    converter = PythonToBerryConverter(fold_constants=True)
+    berry_code = converter.convert('ENABLED = True\nlabel = f"enabled={ENABLED} slots={2 * 4}"\n')
+    assert berry_code.splitlines()[-1] == "var label = 'enabled=true slots=8'"
+
+
+def test_range_loops_use_native_ranges(converter):
+    source_code = """
+for i in range(count):
+    print(i)
+for i in range(2, 10):
+    print(i)
+"""
+    expected_output = """
+for i : 0 .. count - 1
+    print(i)
+end
+for i : 2 .. 9
+    print(i)
+end"""
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+
+
+def test_stepped_range_loop_becomes_while(converter):
+    source_code = """
+for j in range(10, 0, -2):
+    print(j)
+"""
+    expected_output = """
+var j = 10
+while j > 0
+    print(j)
+    j -= 2
+end"""
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+    with pytest.raises(ValueError):
+        PythonToBerryConverter().convert("for j in range(0, 10, 2):\n    if j:\n        continue\n")
+
+
+def test_list_and_map_iteration(converter):
+    source_code = """
+readings = []
+totals = {}
+for reading in readings:
+    print(reading)
+for name in totals:
+    print(name)
+for name, total in totals.items():
+    print(name, total)
+for index, reading in enumerate(readings):
+    print(index, reading)
+"""
+    expected_output = """
+var readings = []
+var totals = {}
+for reading : readings
+    print(reading)
+end
+for name : totals.keys()
+    print(name)
+end
+for name : totals.keys()
+    var total = totals[name]
+    print(name, total)
+end
+for index : 0 .. size(readings) - 1
+    var reading = readings[index]
+    print(index, reading)
+end"""
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+
+
+def test_for_else_is_rejected(converter):
+    with pytest.raises(ValueError):
+        converter.convert("for x in items:\n    pass\nelse:\n    print(x)\n")
+
+
+def test_pool_strings():
+    source_code = """
+class Meter:
+    def every_second(self):
+        mqtt.publish("tele/meter/SENSOR", "on")
+        mqtt.publish("tele/meter/SENSOR", f"power {self.power}")
+
+    def mqtt_data(self, topic):
+        return topic == "tele/meter/SENSOR"
+
+def read(data):
+    return data["ActivePowerTotal"]
+
+def check(data):
+    return "ActivePowerTotal" in data
+"""
+    expected_output = """
+var S0 = 'ActivePowerTotal'
+class Meter
+    static S1 = 'tele/meter/SENSOR'
+    def every_second()
+        mqtt.publish(self.S1, 'on')
+        mqtt.publish(self.S1, string.format('power %s', self.power))
+    end
+    def mqtt_data(topic)
+        return topic == self.S1
+    end
+end"""
+    converter = PythonToBerryConverter(pool_strings=2)
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip().startswith(expected_output.strip())
+    assert "'on'" in berry_code  # Used by one function only
+    pooled = {entry["after"]: entry for entry in converter.optimization_report}
+    assert pooled["self.S1"]["functions"] == 2 and pooled["self.S1"]["occurrences"] == 3
+    assert all(entry["kind"] == "pool" and entry["bytes_saved"] > 0 for entry in pooled.values())
+
+
+def test_pool_strings_threshold_and_size():
+    source_code = """
+def a():
+    return "shared literal"
+
+def b():
+    return "shared literal", "ok!!"
+
+def c():
+    return "ok!!"
+"""
+    assert "var S0" not in PythonToBerryConverter(pool_strings=3).convert(source_code)
+    berry_code = PythonToBerryConverter(pool_strings=2).convert(source_code)
+    assert "var S0 = 'shared literal'" in berry_code
+    assert "'ok!!'" in berry_code  # Pooling it would cost more than the copies
+
+
+def test_comprehensions_become_preallocated_loops(converter):
+    source_code = """
+def scale(readings):
+    squares = [i * i for i in range(1, 4)]
+    names = [r.name for r in readings]
+    active = [r for r in readings if r.on]
+    return {r.name: r.value for r in readings}
+"""
+    expected_output = """
+def scale(readings)
+    var squares = []
+    squares.resize(3)
+    for i : 1 .. 3
+        squares[i - 1] = i * i
+    end
+    var names = []
+    names.resize(size(readings))
+    var _index0 = 0
+    for r : readings
+        names[_index0] = r.name
+        _index0 += 1
+    end
+    var active = []
+    for r : readings
+        if r.on
+            active.push(r)
+        end
+    end
+    var _map1 = {}
+    for r : readings
+        _map1[r.name] = r.value
+    end
+    return _map1
+end"""
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+
+
+def test_aggregates_accumulate_without_lists(converter):
+    source_code = """
+def check(readings):
+    total = sum(r.power for r in readings)
+    if all(r.ok for r in readings):
+        print(any(r.power > total for r in readings))
+"""
+    expected_output = """
+def check(readings)
+    var total = 0
+    for r : readings
+        total += r.power
+    end
+    var _all1 = true
+    for r : readings
+        if not r.ok
+            _all1 = false
+            break
+        end
+    end
+    if _all1
+        var _any0 = false
+        for r : readings
+            if r.power > total
+                _any0 = true
+                break
+            end
+        end
+        print(_any0)
+    end
+end"""
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+
+
+@pytest.mark.parametrize(
+    "source_code",
+    ["f = lambda: [x for x in y]", "while [x for x in y]:\n    pass", "z = a or [x for x in y]", "s = {x for x in y}"],
+)
+def test_comprehensions_that_cannot_be_lowered(converter, source_code):
+    with pytest.raises(ValueError):
+        converter.convert(source_code)
+
+
+def test_name_rewriter_skips_modules_without_mapped_names():
+    source_code = "def check(value):\n    return compute(value, 0)\n"
+    tree = ast.parse(source_code)
+    rewriter = NameRewriter(source_code=source_code)
+    rewriter.generic_visit = None  # walking the module would fail
+    assert rewriter.visit(tree) is tree
+    assert rewriter.renames == 0
+
+    source_code = "def check(value, default=None):\n    return json.loads(value)\n"
+    rewriter = NameRewriter(source_code=source_code)
+    tree = rewriter.visit(ast.parse(source_code))
+    assert rewriter.renames == 2
+    assert ast.unparse(tree) == ast.unparse(NameRewriter().visit(ast.parse(source_code)))
+
+
+def test_converter_renames_constants_created_by_folding():
+    berry_code = PythonToBerryConverter(fold_constants=True).convert("ready = 1 == 1\n")
+    assert "ready = true" in berry_code
+
+
+@pytest.mark.parametrize(
+    "source_code, expected",
+    [
+        ("for x in y:\n    pass", False),
+        ("x = before\nfor_x = 'wait for it'", True),
+        ("for_x = before", False),
+        ("a = [x for x in y]", True),
+        ("for x in [a for a in b]:\n    pass", True),
+        ("v = [\n    x\n    for x in y\n]", True),
+        ("try:\n    pass\nexcept E:\n    for a in b:\n        pass", False),
+    ],
+)
+def test_comprehension_prescan(source_code, expected):
+    assert may_have_comprehensions(ast.parse(source_code), source_code) is expected
+
+
+def test_hoist_invariants():
+    source_code = """
+import string
+SCALE = 10
+
+class Meter:
+    def __init__(self):
+        self.json_response = {}
+        self.history = []
+
+    def parse(self, values):
+        for key in values.keys():
+            self.json_response[key] = values[key] / SCALE
+            self.history[key] = SCALE
+
+    def publish(self, values):
+        for key in values.keys():
+            self.history[key] = string.format("%.1f", values[key] / SCALE)
+"""
+    expected_output = """
+    def parse(values)
+        var _json_response = self.json_response
+        var _SCALE = SCALE
+        var _history = self.history
+        for key : values.keys()
+            _json_response[key] = values[key] / _SCALE
+            _history[key] = _SCALE
+        end
+    end
+    def publish(values)
+        var _string = string
+        var _SCALE2 = SCALE
+        for key : values.keys()
+            self.history[key] = _string.format('%.1f', values[key] / _SCALE2)
+        end
+    end"""
+    converter = PythonToBerryConverter(hoist_invariants=True)
+    berry_code = converter.convert(source_code)
+    assert expected_output.strip("\n") in berry_code
+    assert {"line": 11, "kind": "hoist", "before": "self.json_response", "after": "_json_response", "lookups": 1} in converter.optimization_report
+
+
+def test_hoist_invariants_keeps_lookups_that_may_change():
+    source_code = """
+LIMIT = 10
+
+def bump():
+    global LIMIT
+    LIMIT += 1
+
+class Meter:
+    def poll(self, values):
+        for value in values:
+            self.total = self.total + value
+            print(LIMIT)
+
+    def check(self, values):
+        while self.count < LIMIT:
+            self.step(values)
+"""
+    converter = PythonToBerryConverter(hoist_invariants=True)
+    berry_code = converter.convert(source_code)
+    assert "self.total = self.total + value" in berry_code
+    assert "while self.count < LIMIT" in berry_code
+    assert converter.optimization_report == []
+
+
+def test_hoist_invariants_keeps_polled_members():
+    source_code = """
+class Waiter:
+    def wait_ready(self):
+        while not self.ready:
+            tasmota.delay(10)
+
+    def drain(self, items):
+        for item in items:
+            if self.stop:
+                break
+            self.process(item)
+"""
+    converter = PythonToBerryConverter(hoist_invariants=True)
+    berry_code = converter.convert(source_code)
+    assert "while not self.ready\n" in berry_code
+    assert "if self.stop\n" in berry_code
+    assert "var _" not in berry_code
+    assert converter.optimization_report == []
+
+
+def test_concat_strings():
+    source_code = """
+def table(values):
+    html = "<table>"
+    for name in values:
+        if name:
+            html += f"<tr>{name}</tr>"
+    html += "</table>"
+    return html
+"""
+    expected_output = """
+def table(values)
+    var html = '<table>'
+    var _html_parts = [html]
+    for name : values
+        if name
+            _html_parts.push(string.format('<tr>%s</tr>', name))
+        end
+    end
+    html = _html_parts.concat()
+    html += '</table>'
+    return html
+end"""
+    converter = PythonToBerryConverter(concat_strings=True)
+    berry_code = converter.convert(source_code)
+    assert berry_code.strip() == expected_output.strip()
+    assert converter.optimization_report == [
+        {"line": 4, "kind": "concat", "before": "html +=", "after": "_html_parts.concat()", "appends": 1}
+    ]
+
+
+@pytest.mark.parametrize(
+    "source_code",
+    [
+        # Read inside the loop
+        "def f(items):\n    s = ''\n    for x in items:\n        s += x\n        print(s)\n    return s\n",
+        # Type unknown
+        "def f(items, s):\n    for x in items:\n        s += x\n    return s\n",
+        # Rebound to a non-string
+        "def f(items):\n    s = ''\n    s = items[0]\n    for x in items:\n        s += x\n    return s\n",
+        # Inside a try body
+        "def f(items):\n    s = ''\n    try:\n        for x in items:\n            s += x\n    except Exception:\n        print(s)\n",
+    ],
+)
+def test_concat_strings_leaves_unsafe_accumulators(source_code):
+    converter = PythonToBerryConverter(concat_strings=True)
+    assert "concat()" not in converter.convert(source_code)
+    assert converter.optimization_report == []
+
+
+def test_pool_strings_in_membership_tests():
+    source_code = """
+def first(key):
+    if key in "voltage,current,power,energy,frequency":
+        return 1
+
+def second(key):
+    if key in "voltage,current,power,energy,frequency":
+        return 2
+
+class Meter:
+    def check(self, key):
+        if key in "every_second,every_100ms,every_250ms,mqtt_data":
+            return True
+
+    def again(self, key):
+        if key in "every_second,every_100ms,every_250ms,mqtt_data":
+            return False
+"""
+    berry_code = PythonToBerryConverter(pool_strings=2).convert(source_code)
+    assert "if (S1.contains(key))" in berry_code
+    assert "if (self.S0.contains(key))" in berry_code
+
+
+def test_hoist_invariants_keeps_method_references():
+    source_code = """
+class Listener:
+    def __init__(self):
+        self.topics = []
+        self.handler = self.on_msg
+
+    def on_msg(self, topic, idx, data, databytes):
+        return True
+
+    def subscribe(self):
+        for topic in self.topics:
+            mqtt.subscribe(topic, self.on_msg)
+            mqtt.subscribe(topic, self.handler)
+"""
+    converter = PythonToBerryConverter(hoist_invariants=True)
+    berry_code = converter.convert(source_code)
+    assert "mqtt.subscribe(topic, /-> self.on_msg())" in berry_code
+    assert "mqtt.subscribe(topic, self.handler)" in berry_code
+    assert converter.optimization_report == []
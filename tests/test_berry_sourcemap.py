@@ -0,0 +1,51 @@
+import os
+from berry_converter import PythonToBerryConverter, ConversionCache, convert_file
+from berry_sourcemap import SourceMap, SourceMapResolver, rewrite_locations, aggregate_timings, map_path
+
+SOURCE = """
+class Meter:
+    def __init__(self):
+        self.total = 0
+
+    def every_second(self):
+        if self.total > 10:
+            self.total = 0
+        self.total += 1
+"""
+
+
+def test_source_map_points_at_python_statements():
+    source_map = SourceMap("meter.be", ["meter.py"])
+    berry_code = PythonToBerryConverter().convert(SOURCE, source_map=source_map)
+    lines = berry_code.splitlines()
+    assert lines[5] == "        if self.total > 10"
+    assert source_map.lookup(6) == ("meter.py", 7)
+    assert source_map.lookup(lines.index("        self.total += 1") + 1) == ("meter.py", 9)
+    assert source_map.dumps().startswith('{"version":1,"file":"meter.be","sources":["meter.py"],"runs":[[1,0,2],[2,0,3]')
+    assert SourceMap.from_dict(source_map.to_dict()).runs == source_map.runs
+
+
+def test_rewrite_traceback_and_timings(tmp_path):
+    input_file = tmp_path / "meter.py"
+    input_file.write_text(SOURCE)
+    output_file = convert_file(str(input_file))
+    assert os.path.exists(map_path(output_file))
+
+    resolver = SourceMapResolver([str(tmp_path)])
+    traceback = "stack traceback:\n\t<native>: in native function\n\t/meter.be:6: in function `every_second`"
+    assert rewrite_locations(traceback, resolver).splitlines()[-1] == "\tmeter.py:7 [meter.be:6]: in function `every_second`"
+    assert rewrite_locations("other.be:3: error", resolver) == "other.be:3: error"
+
+    timings = ["meter.be:6 1.5", "meter.be:7 2.0", "meter.be:9 0.5"]
+    assert aggregate_timings(timings, resolver) == [("meter.py:8", 2.0), ("meter.py:7", 1.5), ("meter.py:9", 0.5)]
+
+
+def test_cached_conversion_keeps_source_map(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    for name in ("first.py", "second.py"):
+        (tmp_path / name).write_text(SOURCE)
+        convert_file(str(tmp_path / name), cache=cache)
+    assert cache.hits == 1
+    source_map = SourceMap.load(map_path(str(tmp_path / "second.be")))
+    assert source_map.sources == ["second.py"]
+    assert source_map.lookup(6) == ("second.py", 7)
@@ -0,0 +1,55 @@
+import pytest
+import berry_converter
+from berry_converter import ConversionCache, convert_python_to_berry
+
+SOURCE = """
+value = None
+print(value)
+"""
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / "driver.py"
+    path.write_text(SOURCE)
+    return path
+
+
+def test_second_conversion_is_a_cache_hit(source_file, tmp_path, monkeypatch):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    first = convert_python_to_berry(str(source_file), cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    def fail_convert(self, source_code):
+        raise AssertionError("cached files must not be converted again")
+
+    monkeypatch.setattr(berry_converter.PythonToBerryConverter, "convert", fail_convert)
+    assert convert_python_to_berry(str(source_file), cache=cache) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (tmp_path / "driver.be").read_text() == first
+
+
+def test_changed_source_is_a_miss(source_file, tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    convert_python_to_berry(str(source_file), cache=cache)
+    source_file.write_text(SOURCE + "print(1)\n")
+    assert "print(1)" in convert_python_to_berry(str(source_file), cache=cache)
+    assert cache.misses == 2
+
+
+def test_entry_without_map_is_a_miss(source_file, tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    convert_python_to_berry(str(source_file), cache=cache)
+    for map_path in (tmp_path / "cache").rglob("*.be.map"):
+        map_path.unlink()
+    convert_python_to_berry(str(source_file), cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert list((tmp_path / "cache").rglob("*.be.map"))
+
+
+def test_key_depends_on_converter_version_and_options(monkeypatch):
+    cache = ConversionCache()
+    key = cache.key(SOURCE)
+    assert cache.key(SOURCE, {"minify": True}) != key
+    monkeypatch.setattr(berry_converter, "converter_version", lambda: "other")
+    assert cache.key(SOURCE) != key
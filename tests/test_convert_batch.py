@@ -0,0 +1,46 @@
+import pytest
+from convert_batch import main, collect_inputs, EXIT_OK, EXIT_CONVERSION_FAILED, EXIT_NO_INPUT
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "drivers").mkdir()
+    (tmp_path / "drivers" / "a.py").write_text("a = 1\n")
+    (tmp_path / "drivers" / "b.py").write_text("b = True\n")
+    (tmp_path / "drivers" / "notes.txt").write_text("not python\n")
+    (tmp_path / "main.py").write_text("print('main')\n")
+    return tmp_path
+
+
+def test_collect_inputs(tree):
+    inputs = collect_inputs([str(tree / "drivers"), str(tree / "*.py"), str(tree / "drivers" / "a.py")])
+    assert inputs == sorted([str(tree / "drivers" / "a.py"), str(tree / "drivers" / "b.py"), str(tree / "main.py")])
+
+
+def test_parallel_conversion(tree, capsys):
+    assert main([str(tree), "--jobs", "2", "--cache-dir", str(tree / "cache")]) == EXIT_OK
+    assert (tree / "drivers" / "b.be").read_text() == "var b = true"
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[1] for line in lines[:-1]] == collect_inputs([str(tree)])
+    assert lines[-1] == "3 converted, 0 failed, cache: 0 hit(s), 3 miss(es)"
+
+    main([str(tree), "--jobs", "2", "--cache-dir", str(tree / "cache")])
+    assert capsys.readouterr().out.splitlines()[-1] == "3 converted, 0 failed, cache: 3 hit(s), 0 miss(es)"
+
+
+def test_failures_are_reported_per_file(tree, capsys):
+    (tree / "drivers" / "broken.py").write_text("def broken(:\n")
+    assert main([str(tree), "--no-cache"]) == EXIT_CONVERSION_FAILED
+    output = capsys.readouterr().out
+    assert f"FAILED {tree / 'drivers' / 'broken.py'}: SyntaxError" in output
+    assert output.splitlines()[-1] == "3 converted, 1 failed"
+
+
+def test_no_input(tmp_path):
+    assert main([str(tmp_path / "missing*.py")]) == EXIT_NO_INPUT
+
+
+def test_minify_reports_sizes(tree, capsys):
+    assert main([str(tree / "drivers"), "--no-cache", "--minify"]) == EXIT_OK
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].endswith("a.be (9 -> 9 bytes, +0%)")
@@ -0,0 +1,70 @@
+import json
+import os
+import struct
+import pytest
+from adapters.device_profiles import RegisterCodec, DeviceProfile, ProfileDevice, load_profiles, load_devices
+
+DEVICES_JSON = os.path.join(os.path.dirname(__file__), "..", "autoexec", "filesystem", "devices.json")
+
+
+@pytest.mark.parametrize(
+    "byteorder, expected",
+    [
+        ("ABCD", [0x1234, 0x5678]),
+        ("CDAB", [0x5678, 0x1234]),
+        ("BADC", [0x3412, 0x7856]),
+        ("DCBA", [0x7856, 0x3412]),
+    ],
+)
+def test_uint32_byte_orders(byteorder, expected):
+    codec = RegisterCodec("uint32", 2, byteorder)
+    assert list(codec.encode([0x12345678])) == expected
+    assert codec.decode(expected) == [0x12345678]
+
+
+def test_int16_and_float32():
+    assert list(RegisterCodec("int16", 1).encode([-2, 3])) == [0xFFFE, 3]
+    words = RegisterCodec("float32", 2, "CDAB").encode([1.5])
+    high, low = struct.unpack(">HH", struct.pack(">f", 1.5))
+    assert list(words) == [low, high]
+
+
+def test_count_widens_type():
+    assert list(RegisterCodec("uint16", 2).encode([70000])) == [1, 70000 - 65536]
+
+
+def test_unsupported_register_definition():
+    with pytest.raises(ValueError):
+        RegisterCodec("int32", 1)
+    with pytest.raises(ValueError):
+        RegisterCodec("uint16", 1, "ACBD")
+
+
+def test_profile_device_encodes_values():
+    profile = DeviceProfile(
+        "TEST",
+        [
+            {"address": 100, "name": "energy", "type": "uint32", "count": 2, "scale": 0.1, "byteorder": "CDAB"},
+            {"address": 102, "name": "temperature", "type": "int16", "count": 1, "scale": 1.0},
+            {"address": 103, "name": "power", "type": "float32", "count": 2, "scale": 1.0},
+        ],
+    )
+    device = ProfileDevice("Test", profile, address=3, values={"energy": 6553.7, "temperature": -5, "power": 2.5})
+
+    assert device.get_register(100, 3) == [1, 1, 0xFFFB]
+    assert device.get_value("energy") == pytest.approx(6553.7)
+    assert device.get_value("power") == 2.5
+    device.set_value("temperature", 21)
+    assert device.get_register(102, 1) == [21]
+
+
+def test_load_deployed_profiles():
+    profiles = load_profiles(DEVICES_JSON)
+    devices = load_devices({"devices": [{"name": "Inverter 1", "type": "SOLIS_4G", "address": 1, "values": {"PV-Pf-value": 123456}}]}, profiles)
+
+    assert devices[0].address == 1
+    for request in profiles["SOLIS_4G"].requests:
+        assert len(devices[0].get_register(request["startaddress"], request["count"])) == request["count"]
+    assert devices[0].get_register(3005, 2) == [1, 123456 - 65536]
+    with open(DEVICES_JSON) as file:
+        assert set(profiles) == set(json.load(file))
@@ -0,0 +1,76 @@
+import pytest
+from adapters.modbus_device import ModbusDevice
+from adapters.modules.modbus_bus import RtuBus, character_bits
+from adapters.tasmota_adapter import TasmotaAdapter
+
+
+def test_character_bits():
+    assert character_bits(3) == 10  # 8N1
+    assert character_bits(11) == 11  # 8E1
+    assert character_bits(23) == 12  # 8O2
+
+
+def test_transaction_time_at_9600_8n1():
+    bus = RtuBus(9600, 3, turnaround=0)
+    character_time = 10 / 9600
+    expected = (8 + 3.5 + 5 + 2 * 40 + 3.5) * character_time
+    assert bus.transaction_time(4, 40) == pytest.approx(expected)
+    assert bus.registers_per_second(40) == pytest.approx(40 / expected)
+
+
+def test_fixed_silence_above_19200_baud():
+    assert RtuBus(115200, 3).frame_silence() == 0.00175
+
+
+def test_transactions_are_serialized():
+    bus = RtuBus(9600, 3)
+    duration = bus.transaction_time(4, 10)
+    assert bus.submit(0.0, 4, 10) == (0.0, pytest.approx(duration))
+    start, end = bus.submit(0.0, 4, 10)
+    assert start == pytest.approx(duration)
+    assert end == pytest.approx(2 * duration)
+    assert bus.stats["queue_time"] == pytest.approx(duration)
+    _, timeout_end = bus.submit(0.0, 4, 10, answered=False)
+    assert timeout_end - end == pytest.approx(bus.transaction_time(4, 10, answered=False))
+    assert bus.stats["timeouts"] == 1
+
+
+def test_bridge_responses_follow_bus_timing():
+    tasmota = TasmotaAdapter("EUI_BUS", simulated=True)
+    tasmota.add_device(ModbusDevice("TestDevice", "TestManufacturer", "TestPartNumber", {"100": {"sum": 1}}))
+    arrivals = []
+    tasmota.mqtt.subscribe(f"tele/{tasmota.EUI}/RESULT", lambda topic, message: arrivals.append(tasmota.clock()))
+    bridge = tasmota.command_modules["ModbusBridge"]
+
+    tasmota.cmd("ModbusBaudrate 19200")
+    tasmota.cmd("ModbusConfig 11")
+    for _ in range(3):
+        tasmota.cmd('ModbusSend {"deviceaddress": 1, "functioncode": 3, "startaddress": 100, "count": 10}')
+    tasmota.advance(1000)
+
+    duration = bridge.bus.transaction_time(3, 10)
+    assert arrivals == [pytest.approx(duration * index) for index in (1, 2, 3)]
+    assert bridge.bus.character_time() == 11 / 19200
+
+
+def test_bridge_routes_by_device_address():
+    tasmota = TasmotaAdapter("EUI_BUS", simulated=True)
+    for address in (1, 2):
+        tasmota.add_device(ModbusDevice(f"Device {address}", "TestManufacturer", "TestPartNumber", {"100": {"sum": address * 10}}, address=address))
+    received = []
+    tasmota.mqtt.subscribe(f"tele/{tasmota.EUI}/RESULT", lambda topic, message: received.append(message))
+
+    for address in (2, 1, 3):
+        tasmota.cmd(f'ModbusSend {{"deviceaddress": {address}, "functioncode": 4, "startaddress": 100, "count": 1}}')
+    tasmota.advance(1000)
+
+    assert len(received) == 2
+    assert '"DeviceAddress": 2' in received[0] and '"Values": [20]' in received[0]
+    assert '"DeviceAddress": 1' in received[1] and '"Values": [10]' in received[1]
+
+
+def test_duplicate_device_address():
+    tasmota = TasmotaAdapter("EUI_BUS", simulated=True)
+    tasmota.add_device(ModbusDevice("First", "TestManufacturer", "TestPartNumber", {}, address=1))
+    with pytest.raises(ValueError):
+        tasmota.add_device(ModbusDevice("Second", "TestManufacturer", "TestPartNumber", {}, address=1))
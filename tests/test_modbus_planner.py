@@ -0,0 +1,61 @@
+import os
+import pytest
+from adapters.device_profiles import load_profiles, load_devices
+from adapters.modules.modbus_planner import plan_reads, compare_plans, PollingSchedule
+from adapters.tasmota_adapter import TasmotaAdapter
+
+DEVICES_JSON = os.path.join(os.path.dirname(__file__), "..", "autoexec", "filesystem", "devices.json")
+
+
+def register(address, count=1, functioncode=4, interval=60):
+    return {"address": address, "name": f"R{address}", "functioncode": functioncode, "count": count, "interval": interval}
+
+
+def test_merges_near_adjacent_registers():
+    reads = plan_reads([register(10, 2), register(12), register(20), register(40)], 1, max_gap=7)
+    assert [(read.startaddress, read.count) for read in reads] == [(10, 11), (40, 1)]
+    assert reads[0].registers == ["R10", "R12", "R20"]
+
+
+def test_respects_read_limit():
+    reads = plan_reads([register(address, 2) for address in range(0, 200, 2)], 1)
+    assert [(read.startaddress, read.count) for read in reads] == [(0, 124), (124, 76)]
+
+
+def test_splits_function_codes_and_intervals():
+    reads = plan_reads([register(10, functioncode=3), register(11), register(12, interval=10)], 1)
+    assert [(read.functioncode, read.interval, read.startaddress) for read in reads] == [(3, 60, 10), (4, 10, 12), (4, 60, 11)]
+
+
+def test_register_larger_than_limit():
+    with pytest.raises(ValueError):
+        plan_reads([register(0, 126, functioncode=3)], 1)
+
+
+def test_compare_against_hand_written_plan():
+    profile = load_profiles(DEVICES_JSON)["SOLIS_4G"]
+    report = compare_plans(profile, 1)
+
+    assert report["planned"]["missing_registers"] == []
+    assert report["hand_written"]["missing_registers"] == []
+    assert report["planned"]["transactions_per_hour"] <= report["hand_written"]["transactions_per_hour"]
+    assert report["planned"]["bus_occupancy"] < report["hand_written"]["bus_occupancy"]
+    assert [(request["startaddress"], request["count"]) for request in report["requests"]] == [(3005, 33), (3283, 4)]
+
+
+def test_polling_schedule_drives_reads():
+    profiles = load_profiles(DEVICES_JSON)
+    tasmota = TasmotaAdapter("EUI_PLAN", simulated=True)
+    for device in load_devices({"devices": [{"name": "Inverter 1", "type": "SOLIS_4G", "address": 1}]}, profiles):
+        tasmota.add_device(device)
+    received = []
+    tasmota.mqtt.subscribe(f"tele/{tasmota.EUI}/RESULT", lambda topic, message: received.append(message))
+
+    reads = plan_reads(profiles["SOLIS_4G"].registers, 1)
+    schedule = PollingSchedule(tasmota, reads)
+    schedule.start()
+    tasmota.advance(125 * 1000)
+    schedule.stop()
+    tasmota.advance(60 * 1000)
+
+    assert len(received) == 3 * len(reads)
@@ -76,3 +76,48 @@ def test_no_match_subscription(mqtt, received_messages):
 
     assert ("test/one/another", message) not in received_messages
     assert ("another/test/subtopic", message) not in received_messages
+
+
+def test_multiple_callbacks_per_wildcard_subscription(mqtt, received_messages):
+    topic = "test/#"
+    message = "test message"
+
+    mqtt.subscribe(topic, lambda t, m: on_message(t, m, received_messages))
+    mqtt.subscribe(topic, lambda t, m: on_message(t, m, received_messages))
+    mqtt.publish("test/one", message)
+
+    assert received_messages == [("test/one", message), ("test/one", message)]
+
+
+def test_unsubscribe_wildcard_callback(mqtt, received_messages):
+    topic = "test/+"
+    message = "test message"
+
+    def first(t, m):
+        on_message(t, "first", received_messages)
+
+    def second(t, m):
+        on_message(t, "second", received_messages)
+
+    mqtt.subscribe(topic, first)
+    mqtt.subscribe(topic, second)
+    mqtt.unsubscribe(topic, first)
+    mqtt.publish("test/one", message)
+    mqtt.unsubscribe(topic)
+    mqtt.publish("test/two", message)
+
+    assert received_messages == [("test/one", "second")]
+
+
+def test_multilevel_wildcard_matches_parent_level(mqtt, received_messages):
+    mqtt.subscribe("test/#", lambda t, m: on_message(t, m, received_messages))
+    mqtt.publish("test", "test message")
+
+    assert ("test", "test message") in received_messages
+
+
+def test_invalid_wildcard_subscription(mqtt):
+    with pytest.raises(ValueError):
+        mqtt.subscribe("test/#/subtopic", lambda t, m: None)
+    with pytest.raises(ValueError):
+        mqtt.subscribe("test/sub+", lambda t, m: None)
@@ -1,18 +1,18 @@
+import json
 import pytest
 import os
+import threading
 from adapters.persist_adapter import PersistAdapter
+from adapters.tasmota_adapter import TasmotaAdapter
 
 
 @pytest.fixture
-def persist():
-    filename = "./_persist_test.json"
-    persist = PersistAdapter(filename)
+def persist(tmp_path):
+    persist = PersistAdapter(str(tmp_path / "_persist_test.json"))
     persist.zero()
     persist.save()
     yield persist
-    # Teardown code: remove the test file after each test
-    if os.path.exists(filename):
-        os.remove(filename)
+    persist.flush()
 
 
 def test_set_and_get_attribute(persist):
@@ -65,3 +65,138 @@ def test_zero(persist):
     persist.zero()
     assert persist.a is None
     assert persist.b is None
+
+
+def test_writes_are_coalesced(persist):
+    persist.store.flush_interval = 60 * 1000
+    for counter in range(20):
+        persist.counter = counter
+    assert PersistAdapter(persist.filename).counter is None
+
+    assert persist.flush() is True
+    assert persist.flush() is False
+    assert PersistAdapter(persist.filename).counter == 19
+    assert persist.store.stats["flushes_avoided"] == 19
+    assert persist.store.stats["bytes_avoided"] == 19 * len('{"counter": 19}')
+
+
+def test_write_through(persist):
+    persist.store.flush_interval = 0
+    persist.a = 1
+    assert PersistAdapter(persist.filename).a == 1
+
+
+def test_flush_replaces_file_atomically(persist):
+    persist.a = 1
+    persist.save()
+    assert os.listdir(os.path.dirname(persist.filename)) == [os.path.basename(persist.filename)]
+    assert PersistAdapter(persist.filename).a == 1
+
+
+def test_concurrent_atomic_writes_use_separate_temp_files(persist):
+    store = persist.store
+    threads = [threading.Thread(target=store._write_atomic, args=(persist.filename, json.dumps({"writer": index}))) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert os.listdir(os.path.dirname(persist.filename)) == [os.path.basename(persist.filename)]
+    assert "writer" in PersistAdapter(persist.filename).data
+
+
+def test_debounced_flush_on_adapter_timer(persist):
+    tasmota = TasmotaAdapter("EUI_PERSIST", simulated=True)
+    tasmota.persist = persist
+    persist.counter = 1
+    persist.counter = 2
+    tasmota.advance(persist.store.flush_interval - 1)
+    assert PersistAdapter(persist.filename).counter is None
+    tasmota.advance(1)
+    assert PersistAdapter(persist.filename).counter == 2
+
+
+def test_flush_on_adapter_stop(persist):
+    tasmota = TasmotaAdapter("EUI_PERSIST", simulated=True)
+    tasmota.persist = persist
+    persist.setmember("a", 1)
+    tasmota.stop()
+    assert PersistAdapter(persist.filename).a == 1
+
+
+@pytest.fixture
+def journal_persist(tmp_path):
+    persist = PersistAdapter(str(tmp_path / "_persist_journal_test.json"), flush_interval=0, journal=True)
+    yield persist
+    # Let a background compaction finish before tmp_path, rotated journal included, is removed
+    persist.compact(wait=True)
+
+
+def test_journal_appends_records(journal_persist):
+    journal_persist.setmember("a", 1)
+    journal_persist.b = 2
+    journal_persist.remove("a")
+
+    with open(journal_persist.store.journal_filename) as file:
+        assert file.read().splitlines() == ['["set", "a", 1]', '["set", "b", 2]', '["del", "a"]']
+    assert not os.path.exists(journal_persist.filename)
+
+
+def test_journal_replay(journal_persist):
+    journal_persist.a = 1
+    journal_persist.zero()
+    journal_persist.b = 2
+    journal_persist.c = 3
+    journal_persist.remove("c")
+
+    reloaded = PersistAdapter(journal_persist.filename, journal=True)
+    assert reloaded.data == {"b": 2}
+
+
+def test_journal_ignores_torn_record(journal_persist):
+    journal_persist.a = 1
+    with open(journal_persist.store.journal_filename, "a") as file:
+        file.write('["set", "b", ')
+
+    assert PersistAdapter(journal_persist.filename, journal=True).data == {"a": 1}
+
+
+def test_journal_compaction(journal_persist):
+    journal_persist.store.compact_threshold = 100
+    for counter in range(20):
+        journal_persist.setmember(f"key{counter}", counter)
+    journal_persist.compact(wait=True)
+
+    assert journal_persist.store.stats["compactions"] >= 1
+    journal_persist.last = True
+    reloaded = PersistAdapter(journal_persist.filename, journal=True)
+    assert reloaded.data == journal_persist.data
+    with open(journal_persist.filename) as file:
+        assert "key0" in file.read()
+
+
+def test_any_name_is_a_persisted_key(persist):
+    names = ["stats", "dirty", "journal", "set_timer", "flush_interval", "pending_writes", "compact_threshold", "_private", "_store"]
+    for index, name in enumerate(names):
+        setattr(persist, name, index)
+    assert [getattr(persist, name) for name in names] == list(range(len(names)))
+    assert persist.store.flush_interval == 1000
+    persist.save()
+    assert PersistAdapter(persist.filename).data == {name: index for index, name in enumerate(names)}
+
+
+def test_early_flush_removes_adapter_timer(persist):
+    tasmota = TasmotaAdapter("EUI_PERSIST", simulated=True)
+    tasmota.persist = persist
+    persist.counter = 1
+    assert tasmota.scheduler.pending() == 1
+    persist.flush()
+    assert tasmota.scheduler.pending() == 0
+
+
+def test_journal_does_not_count_avoided_bytes(journal_persist):
+    journal_persist.store.flush_interval = 60 * 1000
+    for counter in range(5):
+        journal_persist.counter = counter
+    journal_persist.flush()
+    assert journal_persist.store.stats["flushes_avoided"] == 4
+    assert journal_persist.store.stats["bytes_avoided"] == 0
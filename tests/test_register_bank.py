@@ -0,0 +1,53 @@
+import pytest
+from adapters.register_bank import RegisterBank
+from adapters.modbus_device import ModbusDevice
+
+
+@pytest.fixture
+def bank():
+    bank = RegisterBank(max_gap=4)
+    bank.load({100: 1, 101: 2, 104: 3, 200: 4})
+    return bank
+
+
+def test_segments_split_on_large_gaps(bank):
+    assert bank.starts == [100, 200]
+    assert list(bank.segments[0]) == [1, 2, 0, 0, 3]
+
+
+def test_read_within_segment(bank):
+    assert list(bank.read(100, 5)) == [1, 2, 0, 0, 3]
+
+
+def test_read_across_gaps(bank):
+    assert list(bank.read(98, 4)) == [0, 0, 1, 2]
+    assert list(bank.read(103, 100)) == [0, 3] + [0] * 95 + [4, 0, 0]
+    assert list(bank.read(300, 2)) == [0, 0]
+
+
+def test_write_inside_segment(bank):
+    bank.write(102, [7, 8])
+    assert list(bank.read(100, 5)) == [1, 2, 7, 8, 3]
+    assert bank.starts == [100, 200]
+
+
+def test_write_merges_segments(bank):
+    bank.write(106, [5])
+    bank.write(195, [6, 0x1FFFF])
+    assert bank.starts == [100, 195]
+    assert list(bank.read(195, 6)) == [6, 0xFFFF, 0, 0, 0, 4]
+    bank.write(50, [9])
+    assert bank.starts == [50, 100, 195]
+    assert list(bank.read(104, 3)) == [3, 0, 5]
+
+
+def test_device_reads_from_register_table():
+    device = ModbusDevice(
+        "TestDevice",
+        "TestManufacturer",
+        "TestPartNumber",
+        {"3034": {"name": "PV-V-A", "sum": 230}, "3037": {"name": "PV-A-A", "sum": 5}},
+    )
+    assert device.get_register("3034", 4) == [230, 0, 0, 5]
+    device.set_register(3035, [1, 2])
+    assert device.get_register(3034, 4) == [230, 1, 2, 5]
@@ -0,0 +1,139 @@
+import threading
+import time
+import pytest
+from adapters.persist_adapter import PersistAdapter
+from adapters.scheduler import Scheduler
+from adapters.tasmota_adapter import TasmotaAdapter
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_call_later(scheduler):
+    fired = threading.Event()
+    scheduler.call_later(0.02, fired.set)
+    assert fired.wait(1)
+
+
+def test_calls_run_in_deadline_order(scheduler):
+    order = []
+    done = threading.Event()
+    scheduler.call_later(0.06, lambda: (order.append("c"), done.set()))
+    scheduler.call_later(0.02, lambda: order.append("a"))
+    scheduler.call_later(0.04, lambda: order.append("b"))
+    assert done.wait(1)
+    assert order == ["a", "b", "c"]
+
+
+def test_cancel_by_name(scheduler):
+    fired = []
+    scheduler.call_later(0.05, lambda: fired.append("kept"))
+    scheduler.call_later(0.05, lambda: fired.append("removed"), name="timer")
+    assert scheduler.cancel("timer") == 1
+    time.sleep(0.1)
+    assert fired == ["kept"]
+
+
+def test_periodic_call_stays_on_absolute_grid(scheduler):
+    ticks = []
+    start = scheduler.clock()
+    scheduler.call_every(0.02, lambda: ticks.append(scheduler.clock()), first=start)
+    time.sleep(0.25)
+    scheduler.stop()
+    assert len(ticks) >= 10
+    # Each tick is late by a bounded amount that does not accumulate over time
+    lateness = [tick - (start + index * 0.02) for index, tick in enumerate(ticks)]
+    assert max(lateness) < 0.02
+
+
+def test_callback_errors_do_not_stop_the_loop(scheduler):
+    fired = threading.Event()
+
+    def failing():
+        raise RuntimeError("boom")
+
+    scheduler.call_later(0.01, failing)
+    scheduler.call_later(0.02, fired.set)
+    assert fired.wait(1)
+
+
+def test_periodic_callbacks_use_one_thread():
+    tasmota = TasmotaAdapter("EUI_SCHEDULER")
+    threads_before = threading.active_count()
+    tasmota.running = True
+    tasmota.run_periodic_callbacks()
+    time.sleep(0.3)
+    assert threading.active_count() <= threads_before + 1
+    tasmota.stop()
+
+
+def test_remove_timer():
+    tasmota = TasmotaAdapter("EUI_SCHEDULER")
+    tasmota.running = True
+    fired = []
+    tasmota.set_timer(50, lambda: fired.append("removed"), "status")
+    tasmota.set_timer(50, lambda: fired.append("kept"))
+    tasmota.remove_timer("status")
+    time.sleep(0.15)
+    assert fired == ["kept"]
+    tasmota.stop()
+
+
+def test_no_restart_after_stop(scheduler):
+    fired = []
+    scheduler.call_later(0.01, lambda: None)
+    scheduler.stop()
+    scheduler.call_later(0.01, lambda: fired.append("late"))
+    time.sleep(0.05)
+    assert not scheduler.is_running()
+    assert fired == []
+
+
+def test_set_timer_requires_running_adapter():
+    tasmota = TasmotaAdapter("EUI_SCHEDULER")
+    fired = []
+    tasmota.set_timer(10, lambda: fired.append("idle"))
+    tasmota.running = True
+    tasmota.set_timer(10, lambda: fired.append("running"))
+    time.sleep(0.1)
+    tasmota.stop()
+    tasmota.set_timer(10, lambda: fired.append("stopped"))
+    time.sleep(0.05)
+    assert fired == ["running"]
+    assert not tasmota.scheduler.is_running()
+
+
+def test_adapter_restarts_after_stop(tmp_path):
+    tasmota = TasmotaAdapter("EUI_SCHEDULER")
+    tasmota.persist = PersistAdapter(str(tmp_path / "persist.json"), flush_interval=10)
+
+    class Driver:
+        ticks = 0
+
+        def every_50ms(self):
+            self.ticks += 1
+
+    driver = Driver()
+    tasmota.add_driver(driver)
+    missing_autoexec = str(tmp_path / "autoexec.py")
+    tasmota.start(missing_autoexec)
+    time.sleep(0.2)
+    tasmota.stop()
+    first_run = driver.ticks
+    assert first_run > 0
+
+    # A flush queued while stopped runs once the adapter is started again
+    tasmota.persist.counter = 1
+    tasmota.start(missing_autoexec)
+    time.sleep(0.2)
+    assert tasmota.scheduler.is_running()
+    assert driver.ticks > first_run
+    assert PersistAdapter(tasmota.persist.filename).counter == 1
+    tasmota.persist.counter = 2
+    time.sleep(0.05)
+    assert PersistAdapter(tasmota.persist.filename).counter == 2
+    tasmota.stop()
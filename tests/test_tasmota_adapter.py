@@ -1,7 +1,6 @@
 import pytest
 import os
 import shutil
-import time
 import requests
 from adapters.tasmota_adapter import TasmotaAdapter
 from adapters.modbus_device import ModbusDevice
@@ -9,7 +8,7 @@ from adapters.modbus_device import ModbusDevice
 
 @pytest.fixture
 def tasmota_adapter():
-    tasmota = TasmotaAdapter("EUI53EF3GD")
+    tasmota = TasmotaAdapter("EUI53EF3GD", simulated=True)
     mqtt = tasmota.mqtt
     device = ModbusDevice(
         "TestDevice",
@@ -75,7 +74,7 @@ def test_error_rate(tasmota_adapter):
     for _ in range(attempts):
         tasmota.cmd(command)
 
-    time.sleep(0.15)  # Wait for all modbus responses
+    tasmota.advance(attempts * 300)  # Wait for all modbus responses, serialized on the bus
     observed_error_rate = 1 - (success_count / attempts)
     assert abs(observed_error_rate - error_rate) <= 0.05
 
@@ -177,7 +176,7 @@ def test_modbus_send(tasmota_adapter):
     command = 'ModbusSend {"deviceaddress": 2, "functioncode": 4, "startaddress": 33049, "count": 1}'
 
     tasmota.cmd(command)
-    time.sleep(0.2)  # Wait for the delayed response
+    tasmota.advance(200)  # Wait for the delayed response
     assert len(received_messages) > 1
     topic, message = received_messages[-1]
     assert topic == f"tele/{tasmota.EUI}/RESULT"
@@ -198,3 +197,96 @@ def test_modbus_set_config(tasmota_adapter):
 
     response = tasmota.cmd(command)
     assert response == {"ModbusConfig": 3}
+
+
+def test_modbus_response_is_delayed(tasmota_adapter):
+    tasmota, _, _, received_messages = tasmota_adapter
+    command = 'ModbusSend {"deviceaddress": 2, "functioncode": 4, "startaddress": 33049, "count": 1}'
+
+    tasmota.cmd(command)
+    tasmota.advance(20)
+    assert not any("ModbusReceived" in message for _, message in received_messages)
+    tasmota.advance(200)
+    assert "ModbusReceived" in received_messages[-1][1]
+
+
+def test_millis_and_time_reached(tasmota_adapter):
+    tasmota, _, _, _ = tasmota_adapter
+    deadline = tasmota.millis(500)
+    assert not tasmota.time_reached(deadline)
+    tasmota.advance(499)
+    assert not tasmota.time_reached(deadline)
+    tasmota.advance(1)
+    assert tasmota.time_reached(deadline)
+    assert tasmota.millis() == 500
+
+
+def test_simulated_run_is_deterministic():
+    def simulate():
+        tasmota = TasmotaAdapter("EUI_SIM", simulated=True, seed=7)
+
+        class Driver:
+            def __init__(self):
+                self.seconds = 0
+                self.timer_fired_at = []
+
+            def every_second(self):
+                self.seconds += 1
+                if self.seconds % 3600 == 0:
+                    tasmota.set_timer(tasmota.rng.randint(1, 1000), lambda: self.timer_fired_at.append(tasmota.millis()))
+
+        driver = Driver()
+        tasmota.add_driver(driver)
+        tasmota.running = True
+        tasmota.run_periodic_callbacks()
+        tasmota.advance(6 * 3600 * 1000)
+        tasmota.stop()
+        return driver.seconds, driver.timer_fired_at, tasmota.time_module.time()
+
+    seconds, fired_at, wall_time = simulate()
+    assert seconds == 6 * 3600 + 1
+    assert len(fired_at) == 6
+    assert simulate() == (seconds, fired_at, wall_time)
+
+
+def test_raising_driver_callback_does_not_repeat_tick():
+    tasmota = TasmotaAdapter("EUI_TICK", simulated=True)
+
+    class Driver:
+        def every_50ms(self):
+            raise RuntimeError("boom")
+
+    tasmota.add_driver(Driver())
+    tasmota.running = True
+    tasmota.run_periodic_callbacks()
+    tasmota.advance(2000)
+    tasmota.stop()
+    assert tasmota.tick_count == 2000 // 50 + 1
+
+
+def test_raising_driver_does_not_skip_other_drivers():
+    tasmota = TasmotaAdapter("EUI_TICK", simulated=True)
+
+    class Failing:
+        def every_50ms(self):
+            raise RuntimeError("boom")
+
+    class Counting:
+        def __init__(self):
+            self.ticks = 0
+            self.seconds = 0
+
+        def every_50ms(self):
+            self.ticks += 1
+
+        def every_second(self):
+            self.seconds += 1
+
+    driver = Counting()
+    tasmota.add_driver(Failing())
+    tasmota.add_driver(driver)
+    tasmota.running = True
+    tasmota.run_periodic_callbacks()
+    tasmota.advance(2000)
+    tasmota.stop()
+    assert (driver.ticks, driver.seconds) == (2000 // 50 + 1, 3)